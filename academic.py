@@ -8,6 +8,7 @@ import numpy as np
 import joblib
 import os
 import sys
+from backend.categorical_encoding import compile_label_encoders
 
 # Color codes for better UI
 class Colors:
@@ -142,7 +143,8 @@ def load_models():
         academic_model = joblib.load('students_models/academic_performance_model.joblib')
         addiction_model = joblib.load('students_models/addiction_score_model.joblib')
         scaler = joblib.load('students_models/feature_scaler.joblib')
-        encoders = joblib.load('students_models/label_encoders.joblib')
+        # Compile the label encoders into lookup tables, unseen values encode to 0
+        encoders = compile_label_encoders(joblib.load('students_models/label_encoders.joblib'), fallback_code=0)
         feature_columns = joblib.load('students_models/feature_columns.joblib')
         
         return academic_model, addiction_model, scaler, encoders, feature_columns
@@ -157,13 +159,11 @@ def load_models():
         print("- feature_columns.joblib")
         sys.exit(1)
 
-def safe_transform(encoder, value, default_value=0):
-    """Safely transform a value, returning default if not found"""
-    try:
-        return encoder.transform([value])[0]
-    except ValueError:
+def safe_transform(encoder, value):
+    """Safely encode a value, falling back to the default code if not found"""
+    if value not in encoder:
         print_colored(f"⚠️ Warning: '{value}' not found in training data, using default encoding", Colors.WARNING)
-        return default_value
+    return encoder.encode(value)
 
 def make_predictions(user_data, academic_model, addiction_model, scaler, encoders):
     """Make predictions based on user data"""
@@ -1,18 +1,29 @@
+# Imported first so the startup report times every other import
+from fast_start import ModelLoader, StartupReport, lazy_import
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 import logging
 from datetime import datetime, timedelta
-import joblib
-import numpy as np
-import pandas as pd
-from sklearn.preprocessing import StandardScaler, LabelEncoder
 from bson import ObjectId
+import db_indexes
+import json_provider
+import metrics
+import mongo_pool
+import service_supervisor
+import write_behind
+from pagination import InvalidCursorError, fetch_page, iter_rows, parse_limit
+from streaming import HISTORY_STREAM_BATCH_SIZE, ndjson_response, wants_stream
+from model_registry import registry
 import warnings
 warnings.filterwarnings('ignore')
 
+# Numeric stack is only imported when the models load
+np = lazy_import('numpy')
+categorical_encoding = lazy_import('categorical_encoding')
+tree_compiler = lazy_import('tree_compiler')
+
 # Load environment variables
 load_dotenv()
 
@@ -22,6 +33,7 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000"])
+json_provider.init_app(app)
 
 # Global variables for database
 client = None
@@ -33,28 +45,45 @@ academic_model = None
 addiction_model = None
 scaler = None
 label_encoders = None
+compiled_encoders = None
 feature_columns = None
 
+# Fallback category used when a request carries a value unseen during training
+CATEGORICAL_FALLBACKS = {
+    'Gender': 'Other',
+    'Academic_Level': 'Undergraduate',
+    'Country': 'Other',
+    'Most_Used_Platform': 'Other',
+    'Relationship_Status': 'Single'
+}
+
+# Request field -> label encoder, for rejecting unknown categories during validation
+CATEGORICAL_FIELDS = {
+    'gender': 'Gender',
+    'academic_level': 'Academic_Level',
+    'country': 'Country',
+    'most_used_platform': 'Most_Used_Platform',
+    'relationship_status': 'Relationship_Status'
+}
+
+# Upper bound on records accepted by the batch prediction endpoint
+MAX_BATCH_RECORDS = int(os.getenv('ACADEMIC_BATCH_MAX_RECORDS', 5000))
+
 def initialize_database():
     """Initialize database connection with error handling"""
     global client, db, students_collection
     
     try:
-        mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
-        db_name = os.getenv('DB_NAME', 'mentoradb')
-        
-        logger.info(f"Connecting to MongoDB: {mongo_uri}")
-        logger.info(f"Database Name: {db_name}")
-        
-        client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+        logger.info(f"Connecting to MongoDB: {mongo_pool.MONGO_URI}")
+        logger.info(f"Database Name: {mongo_pool.DB_NAME}")
         
-        # Test the connection
-        client.admin.command('ping')
+        # Shared, pooled client; pings so a down server fails fast
+        client, db = mongo_pool.connect()
         
-        db = client[db_name]
         students_collection = db['students']
+        db_indexes.bootstrap_indexes(db, ['students'])
         
-        logger.info(f"Successfully connected to MongoDB: {db_name}")
+        logger.info(f"Successfully connected to MongoDB: {mongo_pool.DB_NAME}")
         return True
         
     except Exception as e:
@@ -63,15 +92,19 @@ def initialize_database():
 
 def load_ml_models():
     """Load the trained ML models and preprocessing objects"""
-    global academic_model, addiction_model, scaler, label_encoders, feature_columns
+    global academic_model, addiction_model, scaler, label_encoders, compiled_encoders, feature_columns
     
     try:
         # Load models and preprocessing objects
-        academic_model = joblib.load('students_models/academic_performance_model.joblib')
-        addiction_model = joblib.load('students_models/addiction_score_model.joblib')
-        scaler = joblib.load('students_models/feature_scaler.joblib')
-        label_encoders = joblib.load('students_models/label_encoders.joblib')
-        feature_columns = joblib.load('students_models/feature_columns.joblib')
+        # Tree ensembles and the scaler are compiled to flat arrays (sklearn is kept if unsupported)
+        academic_model = tree_compiler.compile_model(registry.load('students', 'academic_performance_model'))
+        addiction_model = tree_compiler.compile_model(registry.load('students', 'addiction_score_model'))
+        scaler = tree_compiler.compile_scaler(registry.load('students', 'feature_scaler'))
+        label_encoders = registry.load('students', 'label_encoders')
+        feature_columns = registry.load('students', 'feature_columns')
+        
+        # Compile the label encoders into lookup tables once
+        compiled_encoders = categorical_encoding.compile_label_encoders(label_encoders, CATEGORICAL_FALLBACKS)
         
         logger.info("Successfully loaded ML models and preprocessing objects")
         return True
@@ -80,6 +113,24 @@ def load_ml_models():
         logger.error(f"Error loading ML models: {e}")
         return False
 
+# Boot timeline and on-demand model loading (see fast_start.py)
+startup_report = StartupReport('academic', families=('students',))
+model_loader = ModelLoader(load_ml_models, startup_report, name='academic models')
+
+# Endpoints that need the models; everything else is served without loading them
+MODEL_ENDPOINTS = {'predict_academic_performance', 'predict_academic_performance_batch'}
+
+# Background probe of the database / models (see service_supervisor.py)
+supervisor = service_supervisor.ServiceSupervisor(
+    'academic', initialize_database, lambda: students_collection is not None, model_loader
+)
+service_supervisor.add_probe_routes(app, supervisor)
+metrics.add_metrics_route(app, 'academic')
+
+# Endpoints served even while the database is down
+UNGATED_ENDPOINTS = {'home', 'health_check'} | service_supervisor.PROBE_ENDPOINTS | metrics.METRICS_ENDPOINTS
+
+@metrics.timed('academic', 'validate')
 def validate_prediction_data(data):
     """Server-side validation for prediction data"""
     errors = {}
@@ -145,8 +196,67 @@ def validate_prediction_data(data):
         except (ValueError, TypeError):
             errors['local_timestamp'] = 'Invalid timestamp format'
     
+    # Categories the model can't encode (no fallback), so a batch reports them per record
+    if compiled_encoders is not None:
+        for field, encoder_name in CATEGORICAL_FIELDS.items():
+            if field not in errors and field in data and not compiled_encoders[encoder_name].accepts(data[field]):
+                errors[field] = f'{field.replace("_", " ").title()} is not a recognized value'
+    
     return errors
 
+def build_feature_row(age, gender, academic_level, country, avg_daily_usage,
+                      platform, sleep_hours, mental_health_score,
+                      relationship_status, conflicts):
+    """Build one model input row in feature_columns order"""
+    return [
+        float(age),
+        compiled_encoders['Gender'].encode(gender),
+        compiled_encoders['Academic_Level'].encode(academic_level),
+        compiled_encoders['Country'].encode(country),
+        float(avg_daily_usage),
+        compiled_encoders['Most_Used_Platform'].encode(platform),
+        float(sleep_hours),
+        int(mental_health_score),
+        compiled_encoders['Relationship_Status'].encode(relationship_status),
+        int(conflicts)
+    ]
+
+def build_feature_matrix(records):
+    """Build an (N, 10) model input matrix from validated request records, column by column"""
+    input_data = np.empty((len(records), 10), dtype=float)
+    
+    input_data[:, 0] = [float(record['age']) for record in records]
+    input_data[:, 1] = compiled_encoders['Gender'].encode_column([record['gender'] for record in records])
+    input_data[:, 2] = compiled_encoders['Academic_Level'].encode_column([record['academic_level'] for record in records])
+    input_data[:, 3] = compiled_encoders['Country'].encode_column([record['country'] for record in records])
+    input_data[:, 4] = [float(record['avg_daily_usage_hours']) for record in records]
+    input_data[:, 5] = compiled_encoders['Most_Used_Platform'].encode_column([record['most_used_platform'] for record in records])
+    input_data[:, 6] = [float(record['sleep_hours_per_night']) for record in records]
+    input_data[:, 7] = [int(record['mental_health_score']) for record in records]
+    input_data[:, 8] = compiled_encoders['Relationship_Status'].encode_column([record['relationship_status'] for record in records])
+    input_data[:, 9] = [int(record['conflicts_over_social_media']) for record in records]
+    
+    return input_data
+
+def score_feature_matrix(input_data):
+    """
+    Scale an (N, 10) feature matrix and run both models over it in one call each.
+    Returns (academic_results, addiction_scores) in row order.
+    """
+    # Scale the features
+    input_scaled = scaler.transform(input_data)
+    
+    # Make predictions
+    academic_predictions = academic_model.predict(input_scaled)
+    addiction_predictions = addiction_model.predict(input_scaled)
+    
+    # Convert academic predictions to Yes/No and round addiction scores
+    academic_results = ["Yes" if prediction == 1 else "No" for prediction in academic_predictions]
+    addiction_scores = [int(round(prediction)) for prediction in addiction_predictions]
+    
+    return academic_results, addiction_scores
+
+@metrics.timed('academic', 'inference')
 def predict_social_media_impact(age, gender, academic_level, country, avg_daily_usage, 
                                platform, sleep_hours, mental_health_score, 
                                relationship_status, conflicts):
@@ -154,40 +264,14 @@ def predict_social_media_impact(age, gender, academic_level, country, avg_daily_
     Function to predict both academic performance impact and addiction score
     """
     try:
-        # Create input array with fallback for unknown categories
-        def safe_transform(encoder, value, fallback):
-            try:
-                return encoder.transform([value])[0]
-            except ValueError:
-                logger.warning(f"Unknown value '{value}' in {encoder.classes_}. Using fallback: {fallback}")
-                return encoder.transform([fallback])[0]
-                
         # Create input array
-        input_data = np.array([[
-            float(age),
-            safe_transform(label_encoders['Gender'], gender, 'Other'),
-            safe_transform(label_encoders['Academic_Level'], academic_level, 'Undergraduate'),
-            safe_transform(label_encoders['Country'], country, 'Other'),
-            float(avg_daily_usage),
-            safe_transform(label_encoders['Most_Used_Platform'], platform, 'Other'),
-            float(sleep_hours),
-            int(mental_health_score),
-            safe_transform(label_encoders['Relationship_Status'], relationship_status, 'Single'),
-            int(conflicts)
-        ]])
-        
-        # Scale the features
-        input_scaled = scaler.transform(input_data)
-        
-        # Make predictions
-        academic_prediction = academic_model.predict(input_scaled)[0]
-        addiction_prediction = addiction_model.predict(input_scaled)[0]
-        
-        # Convert academic prediction to Yes/No
-        academic_result = "Yes" if academic_prediction == 1 else "No"
-        
-        # Round addiction score to nearest integer
-        addiction_score = int(round(addiction_prediction))
+        input_data = np.array([build_feature_row(
+            age, gender, academic_level, country, avg_daily_usage,
+            platform, sleep_hours, mental_health_score, relationship_status, conflicts
+        )])
+        
+        academic_results, addiction_scores = score_feature_matrix(input_data)
+        academic_result, addiction_score = academic_results[0], addiction_scores[0]
         
         logger.info(f"Prediction successful: Academic={academic_result}, Addiction={addiction_score}")
         
@@ -197,6 +281,26 @@ def predict_social_media_impact(age, gender, academic_level, country, avg_daily_
         logger.error(f"Prediction error: {str(e)}")
         raise e
 
+@metrics.timed('academic', 'inference')
+def predict_social_media_impact_batch(records):
+    """
+    Batch variant of predict_social_media_impact for validated request records.
+    Builds a single (N, 10) matrix so scaling and each model run once per batch.
+    """
+    try:
+        input_data = build_feature_matrix(records)
+        
+        academic_results, addiction_scores = score_feature_matrix(input_data)
+        
+        logger.info(f"Batch prediction successful: {len(records)} records")
+        
+        return academic_results, addiction_scores
+        
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        raise e
+
+@metrics.timed('academic', 'tips')
 def generate_personalized_tips(academic_result, addiction_score, input_data):
     """Generate personalized tips based on predictions and user data"""
     tips = []
@@ -252,18 +356,70 @@ def generate_personalized_tips(academic_result, addiction_score, input_data):
     
     return tips[:5]  # Return top 5 most relevant tips
 
+def build_tips_input(data):
+    """Extract the numeric fields generate_personalized_tips looks at"""
+    return {
+        'sleep_hours_per_night': float(data['sleep_hours_per_night']),
+        'mental_health_score': int(data['mental_health_score']),
+        'avg_daily_usage_hours': float(data['avg_daily_usage_hours']),
+        'conflicts_over_social_media': int(data['conflicts_over_social_media'])
+    }
+
+def build_prediction_document(data, academic_result, addiction_score, tips, timestamp):
+    """Prepare the MongoDB document for one prediction"""
+    user_id = data.get('user_id')  # Optional user_id from session/auth
+    
+    return {
+        'user_id': ObjectId(user_id) if ObjectId.is_valid(user_id) else user_id,
+        'input_data': {
+            'age': float(data['age']),
+            'gender': data['gender'],
+            'academic_level': data['academic_level'],
+            'country': data['country'],
+            'avg_daily_usage_hours': float(data['avg_daily_usage_hours']),
+            'most_used_platform': data['most_used_platform'],
+            'sleep_hours_per_night': float(data['sleep_hours_per_night']),
+            'mental_health_score': int(data['mental_health_score']),
+            'relationship_status': data['relationship_status'],
+            'conflicts_over_social_media': int(data['conflicts_over_social_media']),
+            'local_timestamp': data['local_timestamp']  # Store local timestamp from frontend
+        },
+        'predictions': {
+            'affects_academic_performance': academic_result,
+            'addiction_score': addiction_score
+        },
+        'personalized_tips': tips,  # Store tips in database
+        'timestamp': timestamp  # Server's UTC timestamp
+    }
+
+def build_prediction_response(prediction_id, academic_result, addiction_score, tips, local_timestamp):
+    """Build the response payload for one saved prediction"""
+    # Generate interpretation messages
+    addiction_level = "High" if addiction_score >= 7 else "Moderate" if addiction_score >= 4 else "Low"
+    
+    return {
+        'prediction_id': str(prediction_id),
+        'results': {
+            'affects_academic_performance': academic_result,
+            'addiction_score': addiction_score
+        },
+        'interpretation': {
+            'academic_impact': f"Social media {'does' if academic_result == 'Yes' else 'does not'} significantly affect academic performance",
+            'addiction_level': f"Addiction score: {addiction_score}/10 - {addiction_level} risk"
+        },
+        'personalized_tips': tips,  # Send tips in response
+        'local_timestamp': local_timestamp  # Return local timestamp to frontend
+    }
+
 @app.before_request
 def check_connections():
-    """Check database and model connections before each request"""
-    global students_collection, academic_model
-    
-    if students_collection is None:
-        if not initialize_database():
-            return jsonify({'message': 'Database connection error'}), 500
+    """Fail fast with 503 while the supervisor reports the database or models unavailable"""
+    if request.endpoint is None or request.endpoint in UNGATED_ENDPOINTS or request.method == 'OPTIONS':
+        return None
     
-    if academic_model is None:
-        if not load_ml_models():
-            return jsonify({'message': 'ML models loading error'}), 500
+    problem = supervisor.check(needs_models=request.endpoint in MODEL_ENDPOINTS)
+    if problem:
+        return jsonify({'message': problem}), 503, {'Retry-After': str(supervisor.retry_after())}
 
 @app.route('/')
 def home():
@@ -273,6 +429,7 @@ def home():
         'status': 'Server is running',
         'endpoints': {
             'predict': '/predictacademicperformance (POST)',
+            'predict_batch': '/predictacademicperformance/batch (POST)',
             'health': '/health (GET)',
             'get_today_prediction': '/get_today_prediction (GET)'
         }
@@ -348,8 +505,6 @@ def predict_academic_performance():
         mental_health_score = data['mental_health_score']
         relationship_status = data['relationship_status']
         conflicts = data['conflicts_over_social_media']
-        user_id = data.get('user_id')  # Optional user_id from session/auth
-        local_timestamp = data['local_timestamp']  # New field from frontend
         
         # Make prediction
         academic_result, addiction_score = predict_social_media_impact(
@@ -358,64 +513,25 @@ def predict_academic_performance():
         )
         
         # Generate personalized tips
-        tips = generate_personalized_tips(
-            academic_result,
-            addiction_score,
-            {
-                'sleep_hours_per_night': float(sleep_hours),
-                'mental_health_score': int(mental_health_score),
-                'avg_daily_usage_hours': float(avg_daily_usage),
-                'conflicts_over_social_media': int(conflicts)
-            }
-        )
+        tips = generate_personalized_tips(academic_result, addiction_score, build_tips_input(data))
         
         # Prepare document for MongoDB
-        prediction_document = {
-            'user_id': ObjectId(user_id) if ObjectId.is_valid(user_id) else user_id,
-            'input_data': {
-                'age': float(age),
-                'gender': gender,
-                'academic_level': academic_level,
-                'country': country,
-                'avg_daily_usage_hours': float(avg_daily_usage),
-                'most_used_platform': platform,
-                'sleep_hours_per_night': float(sleep_hours),
-                'mental_health_score': int(mental_health_score),
-                'relationship_status': relationship_status,
-                'conflicts_over_social_media': int(conflicts),
-                'local_timestamp': local_timestamp  # Store local timestamp from frontend
-            },
-            'predictions': {
-                'affects_academic_performance': academic_result,
-                'addiction_score': addiction_score
-            },
-            'personalized_tips': tips,  # Store tips in database
-            'timestamp': datetime.utcnow()  # Server's UTC timestamp
-        }
+        prediction_document = build_prediction_document(
+            data, academic_result, addiction_score, tips, datetime.utcnow()
+        )
         
-        # Save to MongoDB
-        result = students_collection.insert_one(prediction_document)
+        # Save to MongoDB (queued when write-behind is on)
+        with metrics.stage('academic', 'db_write'):
+            inserted_id = write_behind.insert_document(students_collection, prediction_document)
         
-        if result.inserted_id:
-            logger.info(f"Prediction saved successfully: {str(result.inserted_id)}")
-            
-            # Generate interpretation messages
-            addiction_level = "High" if addiction_score >= 7 else "Moderate" if addiction_score >= 4 else "Low"
+        if inserted_id:
+            logger.info(f"Prediction saved successfully: {str(inserted_id)}")
             
-            return jsonify({
-                'message': 'Prediction completed successfully',
-                'prediction_id': str(result.inserted_id),
-                'results': {
-                    'affects_academic_performance': academic_result,
-                    'addiction_score': addiction_score
-                },
-                'interpretation': {
-                    'academic_impact': f"Social media {'does' if academic_result == 'Yes' else 'does not'} significantly affect academic performance",
-                    'addiction_level': f"Addiction score: {addiction_score}/10 - {addiction_level} risk"
-                },
-                'personalized_tips': tips,  # Send tips in response
-                'local_timestamp': local_timestamp  # Return local timestamp to frontend
-            }), 200
+            response = {'message': 'Prediction completed successfully'}
+            response.update(build_prediction_response(
+                inserted_id, academic_result, addiction_score, tips, data['local_timestamp']
+            ))
+            return jsonify(response), 200
         else:
             logger.error("Failed to save prediction to database")
             return jsonify({'message': 'Failed to save prediction. Please try again.'}), 500
@@ -435,6 +551,114 @@ def predict_academic_performance():
         logger.error(f"Prediction error: {str(e)}")
         return jsonify({'message': 'Internal server error during prediction'}), 500
 
+@app.route('/predictacademicperformance/batch', methods=['POST'])
+def predict_academic_performance_batch():
+    """Score many student records in one request and save them with a single insert"""
+    try:
+        data = request.get_json()
+        
+        # Accept either a bare list of records or {"records": [...]}
+        records = data.get('records') if isinstance(data, dict) else data
+        logger.info(f"Batch prediction request received")
+        
+        if not records or not isinstance(records, list):
+            logger.warning("No records provided in batch prediction request")
+            return jsonify({'message': 'No records provided'}), 400
+        
+        if len(records) > MAX_BATCH_RECORDS:
+            return jsonify({'message': f'Batch size exceeds the limit of {MAX_BATCH_RECORDS} records'}), 400
+        
+        # Server-side validation, keyed by record position
+        validation_errors = {}
+        for index, record in enumerate(records):
+            record_errors = validate_prediction_data(record) if isinstance(record, dict) else {'general': 'Record must be an object'}
+            if record_errors:
+                validation_errors[str(index)] = record_errors
+        
+        if validation_errors:
+            logger.warning(f"Batch validation errors in {len(validation_errors)} records")
+            return jsonify({'errors': validation_errors}), 400
+        
+        # Make predictions for the whole batch
+        academic_results, addiction_scores = predict_social_media_impact_batch(records)
+        
+        # Prepare documents for MongoDB, sharing one server timestamp
+        timestamp = datetime.utcnow()
+        tips_per_record = []
+        prediction_documents = []
+        for record, academic_result, addiction_score in zip(records, academic_results, addiction_scores):
+            tips = generate_personalized_tips(academic_result, addiction_score, build_tips_input(record))
+            tips_per_record.append(tips)
+            prediction_documents.append(
+                build_prediction_document(record, academic_result, addiction_score, tips, timestamp)
+            )
+        
+        # Save to MongoDB (queued when write-behind is on); ids come back in record order
+        with metrics.stage('academic', 'db_write'):
+            inserted_ids = write_behind.insert_documents(students_collection, prediction_documents)
+        
+        if len(inserted_ids) != len(records):
+            logger.error("Failed to save batch predictions to database")
+            return jsonify({'message': 'Failed to save predictions. Please try again.'}), 500
+        
+        logger.info(f"Batch predictions saved successfully: {len(inserted_ids)} records")
+        
+        results = []
+        for index, record in enumerate(records):
+            entry = {'index': index}
+            entry.update(build_prediction_response(
+                inserted_ids[index], academic_results[index], addiction_scores[index],
+                tips_per_record[index], record['local_timestamp']
+            ))
+            results.append(entry)
+        
+        return jsonify({
+            'message': 'Batch prediction completed successfully',
+            'count': len(results),
+            'results': results
+        }), 200
+        
+    except ValueError as e:
+        if "not in list" in str(e):
+            logger.error(f"Invalid category value in batch: {str(e)}")
+            return jsonify({
+                'message': 'Invalid input value provided. Please check your selections.',
+                'error': 'One or more input values are not recognized by the model'
+            }), 400
+        else:
+            logger.error(f"Batch prediction validation error: {str(e)}")
+            return jsonify({'message': 'Invalid input data'}), 400
+        
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        return jsonify({'message': 'Internal server error during batch prediction'}), 500
+
+# Only the fields format_history_entry reads
+HISTORY_PROJECTION = {
+    'timestamp': 1,
+    'input_data.local_timestamp': 1,
+    'input_data.avg_daily_usage_hours': 1,
+    'input_data.sleep_hours_per_night': 1,
+    'input_data.mental_health_score': 1,
+    'input_data.work_study_hours': 1,
+    'predictions.affects_academic_performance': 1,
+    'predictions.addiction_score': 1
+}
+
+def format_history_entry(doc):
+    """One /academichistory row from a students document"""
+    return {
+        'prediction_id': doc['_id'],
+        'timestamp': doc['timestamp'],
+        'local_timestamp': doc['input_data'].get('local_timestamp', ''),
+        'academic_impact': doc['predictions']['affects_academic_performance'],
+        'addiction_score': doc['predictions']['addiction_score'],
+        'avg_daily_usage': doc['input_data']['avg_daily_usage_hours'],
+        'sleep_hours': doc['input_data']['sleep_hours_per_night'],
+        'mental_health_score': doc['input_data']['mental_health_score'],
+        'work_study_hours': doc['input_data'].get('work_study_hours', 0)
+    }
+
 @app.route('/academichistory', methods=['GET'])
 def get_academic_history():
     """Get prediction history for a user with optional filters"""
@@ -445,6 +669,13 @@ def get_academic_history():
         to_date = request.args.get('to_date')
         addiction_score_min = request.args.get('addiction_score_min')
         addiction_score_max = request.args.get('addiction_score_max')
+        cursor = request.args.get('cursor')
+        
+        # Page size; without limit or cursor the whole history is returned as before
+        try:
+            limit = parse_limit(request.args.get('limit')) if request.args.get('limit') or cursor else None
+        except ValueError:
+            return jsonify({'message': 'Limit must be an integer'}), 400
         
         # Validate required user_id
         if not user_id:
@@ -483,30 +714,27 @@ def get_academic_history():
             except ValueError:
                 return jsonify({'message': 'Addiction scores must be integers'}), 400
         
-        # Fetch history from MongoDB
-        history = students_collection.find(query).sort('timestamp', -1)
+        # Stream every matching row (or up to limit) as NDJSON when asked
+        if wants_stream(request):
+            rows = iter_rows(students_collection, query, 'timestamp', -1, cursor=cursor,
+                             projection=HISTORY_PROJECTION, batch_size=HISTORY_STREAM_BATCH_SIZE,
+                             limit=limit if request.args.get('limit') else None)
+            return ndjson_response(rows, format_history_entry)
         
-        # Format results
-        results = []
-        for doc in history:
-            results.append({
-                'prediction_id': str(doc['_id']),
-                'timestamp': doc['timestamp'].isoformat(),
-                'local_timestamp': doc['input_data'].get('local_timestamp', ''),
-                'academic_impact': doc['predictions']['affects_academic_performance'],
-                'addiction_score': doc['predictions']['addiction_score'],
-                'avg_daily_usage': doc['input_data']['avg_daily_usage_hours'],
-                'sleep_hours': doc['input_data']['sleep_hours_per_night'],
-                'mental_health_score': doc['input_data']['mental_health_score'],
-                'work_study_hours': doc['input_data'].get('work_study_hours', 0)
-            })
+        # Fetch history from MongoDB, seeking past the cursor when given
+        history, next_cursor = fetch_page(students_collection, query, 'timestamp', -1, limit, cursor=cursor,
+                                          projection=HISTORY_PROJECTION)
+        results = [format_history_entry(doc) for doc in history]
         
         return jsonify({
             'user_id': user_id,
             'count': len(results),
-            'history': results
+            'history': results,
+            'next_cursor': next_cursor
         }), 200
         
+    except InvalidCursorError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         logger.error(f"Error fetching academic history: {str(e)}")
         return jsonify({'message': 'Error fetching history data'}), 500
@@ -515,12 +743,8 @@ def get_academic_history():
 def health_check():
     """Health check endpoint"""
     try:
-        # Test database connection
-        if students_collection is not None:
-            students_collection.find_one()
-            db_status = 'Connected'
-        else:
-            db_status = 'Disconnected'
+        # Database state as last probed by the supervisor (no query per health check)
+        db_status = 'Connected' if supervisor.database_up else 'Disconnected'
         
         # Test model loading
         model_status = 'Loaded' if academic_model is not None else 'Not Loaded'
@@ -529,6 +753,10 @@ def health_check():
             'status': 'Server is running',
             'database': db_status,
             'ml_models': model_status,
+            'supervisor': supervisor.status(),
+            'startup': startup_report.summary(),
+            'mongo_pool': mongo_pool.pool_stats(),
+            'write_behind': write_behind.write_behind_stats(),
             'timestamp': datetime.utcnow().isoformat()
         }), 200
     except Exception as e:
@@ -555,16 +783,28 @@ if __name__ == '__main__':
     print("="*50)
     
     # Initialize database connection
-    if initialize_database():
+    with startup_report.phase('database'):
+        database_ready = initialize_database()
+    # Start the write-behind flusher (if enabled) on the main thread so SIGTERM flushes it
+    write_behind.get_write_queue()
+    if database_ready:
         print(f"✓ Database connection established")
     else:
         print("✗ Failed to connect to database")
     
-    # Load ML models
-    if load_ml_models():
+    # Load ML models (deferred to first use / background warm-up with FAST_START=true)
+    if not model_loader.boot():
+        print("✗ Failed to load ML models")
+    elif model_loader.loaded:
         print(f"✓ ML models loaded successfully")
     else:
-        print("✗ Failed to load ML models")
+        print(f"✓ Fast start: ML models load on first use")
+    
+    # Reconnect / retry failed loads in the background from here on
+    supervisor.start()
+    
+    startup_report.ready()
+    startup_report.log()
     
     print(f"✓ Server will run on: http://localhost:5004")
     print(f"✓ Server will run on: http://127.0.0.1:5004")
@@ -0,0 +1,115 @@
+"""
+Compiled categorical encoding tables.
+
+Fitted sklearn LabelEncoders are turned into plain dict/array lookup tables once,
+at model load time, so request handlers can encode and decode categories without
+going through LabelEncoder.transform / inverse_transform for every value.
+"""
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledLabelEncoder:
+    """Lookup-table replacement for a fitted LabelEncoder"""
+
+    def __init__(self, classes, name=None, fallback=None, fallback_code=None):
+        self.name = name
+        self.classes_ = np.asarray(classes)
+        self.class_list = self.classes_.tolist()
+        self.codes = {value: code for code, value in enumerate(self.class_list)}
+
+        # Sorted view of the classes for vectorized column encoding; string classes are
+        # held as a fixed-width unicode array so comparisons stay in C
+        self._string_classes = all(isinstance(value, str) for value in self.class_list)
+        search_classes = self.classes_.astype(str) if self._string_classes else self.classes_
+        self._sort_order = np.argsort(search_classes, kind='stable')
+        self._sorted_classes = search_classes[self._sort_order]
+
+        # Explicit fallback code for unseen categories (None means unseen values are rejected)
+        if fallback_code is not None:
+            self.fallback_code = int(fallback_code)
+        elif fallback is not None and fallback in self.codes:
+            self.fallback_code = self.codes[fallback]
+        else:
+            if fallback is not None:
+                logger.debug(f"Fallback '{fallback}' is not a known {name} category; unseen values will be rejected")
+            self.fallback_code = None
+
+        self.unknown_count = 0
+
+    def __contains__(self, value):
+        return value in self.codes
+
+    def __len__(self):
+        return len(self.class_list)
+
+    def accepts(self, value):
+        """Whether encode / encode_column would succeed for value (known, or covered by the fallback)"""
+        if self.fallback_code is not None or value in self.codes:
+            return True
+        # encode_column compares string classes as strings
+        return self._string_classes and str(value) in self.codes
+
+    def _unknown(self, value):
+        """Resolve an unseen category to the fallback code or reject it"""
+        self.unknown_count += 1
+        if self.fallback_code is None:
+            raise ValueError(f"'{value}' not in list of known {self.name or 'label'} categories")
+        return self.fallback_code
+
+    def encode(self, value):
+        """Encode a single category to its integer code"""
+        code = self.codes.get(value)
+        if code is None:
+            return self._unknown(value)
+        return code
+
+    def encode_column(self, values):
+        """Encode a whole column of categories to an int array in one vectorized pass"""
+        values = np.asarray(values, dtype=object)
+        if self._string_classes:
+            values = values.astype(str)
+        if values.size == 0 or len(self.class_list) == 0:
+            return np.array([self._unknown(value) for value in values.tolist()], dtype=np.int64)
+
+        positions = np.searchsorted(self._sorted_classes, values)
+        positions = np.minimum(positions, len(self._sorted_classes) - 1)
+        known = self._sorted_classes[positions] == values
+        codes = self._sort_order[positions]
+
+        if not known.all():
+            unknown_values = values[~known].tolist()
+            # Raises for the first unseen value when there is no fallback
+            fallback_codes = [self._unknown(value) for value in unknown_values]
+            codes = codes.copy()
+            codes[~known] = fallback_codes
+
+        return codes.astype(np.int64, copy=False)
+
+    def decode(self, code):
+        """Decode a single integer code back to its category"""
+        return self.class_list[int(code)]
+
+    def decode_column(self, codes):
+        """Decode an array of integer codes back to categories"""
+        return self.classes_.take(np.asarray(codes, dtype=np.int64))
+
+
+def compile_label_encoder(encoder, name=None, fallback=None, fallback_code=None):
+    """Compile one fitted LabelEncoder into lookup tables"""
+    return CompiledLabelEncoder(encoder.classes_, name=name, fallback=fallback, fallback_code=fallback_code)
+
+
+def compile_label_encoders(encoders, fallbacks=None, fallback_code=None):
+    """
+    Compile a dict of fitted LabelEncoders.
+    fallbacks maps column name -> fallback category; fallback_code applies to every column.
+    """
+    fallbacks = fallbacks or {}
+    return {
+        name: compile_label_encoder(encoder, name=name, fallback=fallbacks.get(name), fallback_code=fallback_code)
+        for name, encoder in encoders.items()
+    }
@@ -0,0 +1,213 @@
+"""
+Declarative MongoDB index manifest.
+
+INDEX_MANIFEST lists the indexes each collection's queries need. Every service
+calls bootstrap_indexes() for the collections it owns right after connecting;
+missing indexes are created (idempotently, once per process) and anything the
+manifest doesn't explain is reported:
+
+    missing      in the manifest but not on the collection (created unless dry_run)
+    conflicting  same keys as a manifest index but different options (e.g. not unique)
+    redundant    a non-unique index whose keys are a prefix of another index
+    unlisted     any other index that isn't in the manifest
+
+Redundant indexes are only dropped when asked (drop_redundant=True / --drop-redundant).
+Set MONGO_INDEX_BOOTSTRAP=false to skip the startup step entirely.
+
+Usage:
+    python db_indexes.py [--dry-run] [--drop-redundant] [collection ...]
+"""
+
+import logging
+import os
+import sys
+import threading
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+INDEX_BOOTSTRAP_ENABLED = os.getenv('MONGO_INDEX_BOOTSTRAP', 'true').lower() in ('1', 'true', 'yes')
+
+# Collection -> indexes its queries need. Option keys are passed to IndexModel.
+INDEX_MANIFEST = {
+    'users': [
+        # signup duplicate check and login lookup
+        {'keys': [('email', ASCENDING)], 'unique': True}
+    ],
+    'students': [
+        # get_today_prediction (user_id + timestamp range) and /academichistory (keyset on timestamp, _id)
+        {'keys': [('user_id', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)]}
+    ],
+    'mobile_addiction': [
+        # get_today_prediction_from_db (user_id + date, newest created_at)
+        {'keys': [('user_id', ASCENDING), ('date', ASCENDING), ('created_at', DESCENDING)]},
+        # /get_user_history (keyset on created_at, _id)
+        {'keys': [('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)]},
+        # today's prediction count in /health
+        {'keys': [('date', ASCENDING)]}
+    ],
+    'mental_health': [
+        # /mentalhistory and /user/<user_id>/history (keyset on timestamp, _id)
+        {'keys': [('user_id', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)]}
+    ],
+    'stress_predictions': [
+        # /predictions/history, /stresshistory (keyset on timestamp, _id) and /stats
+        {'keys': [('user_id', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)]},
+        # /predictions/<prediction_id>
+        {'keys': [('prediction_id', ASCENDING)], 'unique': True, 'sparse': True}
+    ]
+}
+
+# Options that change what an index does; anything else (v, ns, background) is ignored
+_SEMANTIC_OPTIONS = ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds', 'collation')
+
+_bootstrapped = set()
+_bootstrap_lock = threading.Lock()
+
+
+def _normalize_keys(keys):
+    """Key pattern as a tuple of (field, direction) with numeric directions as ints"""
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in keys)
+
+
+def index_name(keys):
+    """MongoDB's default index name, e.g. user_id_1_timestamp_-1"""
+    return '_'.join(f'{field}_{direction}' for field, direction in _normalize_keys(keys))
+
+
+def _options(index):
+    return {option: index[option] for option in _SEMANTIC_OPTIONS if index.get(option) not in (None, False)}
+
+
+def _is_prefix(shorter, longer):
+    return len(shorter) < len(longer) and longer[:len(shorter)] == shorter
+
+
+def plan_indexes(existing, specs):
+    """
+    Compare a collection's index_information() with its manifest entries.
+    Returns {'missing', 'present', 'conflicting', 'redundant', 'unlisted'}.
+    """
+    existing = {name: info for name, info in existing.items() if name != '_id_'}
+    existing_keys = {name: _normalize_keys(info['key']) for name, info in existing.items()}
+
+    plan = {'missing': [], 'present': [], 'conflicting': [], 'redundant': [], 'unlisted': []}
+    matched = set()
+    for spec in specs:
+        keys = _normalize_keys(spec['keys'])
+        same_keys = [name for name, existing_key in existing_keys.items() if existing_key == keys]
+        if not same_keys:
+            plan['missing'].append(spec)
+            continue
+        wanted = _options(spec)
+        exact = [name for name in same_keys if _options(existing[name]) == wanted]
+        if exact:
+            plan['present'].append(exact[0])
+            matched.add(exact[0])
+        else:
+            plan['conflicting'].append({'name': same_keys[0], 'wanted': wanted,
+                                        'actual': _options(existing[same_keys[0]])})
+            matched.add(same_keys[0])
+
+    # Key patterns that will exist once the missing indexes are built
+    all_keys = list(existing_keys.values()) + [_normalize_keys(spec['keys']) for spec in plan['missing']]
+    for name, keys in existing_keys.items():
+        if name in matched:
+            continue
+        covered = any(_is_prefix(keys, other) for other in all_keys)
+        duplicate = sum(1 for other in existing_keys.values() if other == keys) > 1
+        if (covered or duplicate) and not _options(existing[name]):
+            plan['redundant'].append(name)
+        else:
+            plan['unlisted'].append(name)
+    return plan
+
+
+def ensure_collection_indexes(collection, specs, dry_run=False, drop_redundant=False):
+    """Create a collection's missing manifest indexes; returns the plan with what was done"""
+    plan = plan_indexes(collection.index_information(), specs)
+
+    plan['created'] = []
+    if plan['missing'] and not dry_run:
+        models = [
+            IndexModel(spec['keys'], name=spec.get('name') or index_name(spec['keys']),
+                       **{option: value for option, value in spec.items() if option not in ('keys', 'name')})
+            for spec in plan['missing']
+        ]
+        plan['created'] = collection.create_indexes(models)
+
+    plan['dropped'] = []
+    if drop_redundant and not dry_run:
+        for name in plan['redundant']:
+            collection.drop_index(name)
+            plan['dropped'].append(name)
+
+    plan['missing'] = [spec.get('name') or index_name(spec['keys']) for spec in plan['missing']]
+    return plan
+
+
+def _log_plan(collection_name, plan):
+    if plan['created']:
+        logger.info(f"Created indexes on {collection_name}: {', '.join(plan['created'])}")
+    if plan['dropped']:
+        logger.info(f"Dropped redundant indexes on {collection_name}: {', '.join(plan['dropped'])}")
+    for conflict in plan['conflicting']:
+        logger.warning(f"Index {conflict['name']} on {collection_name} has options {conflict['actual']}, "
+                       f"manifest wants {conflict['wanted']}")
+    undropped = [name for name in plan['redundant'] if name not in plan['dropped']]
+    if undropped:
+        logger.warning(f"Redundant indexes on {collection_name}: {', '.join(undropped)}")
+    if plan['unlisted']:
+        logger.info(f"Indexes on {collection_name} not in the manifest: {', '.join(plan['unlisted'])}")
+
+
+def ensure_indexes(db, collections=None, dry_run=False, drop_redundant=False):
+    """Apply the manifest to some (default: all) collections; returns {collection: plan}"""
+    report = {}
+    for collection_name in collections or INDEX_MANIFEST:
+        try:
+            plan = ensure_collection_indexes(db[collection_name], INDEX_MANIFEST[collection_name],
+                                             dry_run=dry_run, drop_redundant=drop_redundant)
+        except Exception as e:
+            # e.g. duplicate emails blocking the unique index; the service still starts
+            logger.error(f"Index bootstrap for {collection_name} failed: {e}")
+            plan = {'error': str(e)}
+        else:
+            _log_plan(collection_name, plan)
+        report[collection_name] = plan
+    return report
+
+
+def bootstrap_indexes(db, collections):
+    """Startup hook: ensure the given collections' indexes once per process"""
+    if not INDEX_BOOTSTRAP_ENABLED:
+        return {}
+    with _bootstrap_lock:
+        pending = [name for name in collections if name not in _bootstrapped]
+        if not pending:
+            return {}
+        report = ensure_indexes(db, pending)
+        _bootstrapped.update(name for name, plan in report.items() if 'error' not in plan)
+        return report
+
+
+if __name__ == '__main__':
+    import json
+    import mongo_pool
+
+    logging.basicConfig(level=logging.INFO)
+    arguments = sys.argv[1:]
+    dry_run = '--dry-run' in arguments
+    drop_redundant = '--drop-redundant' in arguments
+    collections = [argument for argument in arguments if not argument.startswith('--')]
+
+    unknown = [name for name in collections if name not in INDEX_MANIFEST]
+    if unknown:
+        print(f"Unknown collections: {', '.join(unknown)}. Known: {', '.join(INDEX_MANIFEST)}")
+        sys.exit(2)
+
+    _, db = mongo_pool.connect()
+    report = ensure_indexes(db, collections or None, dry_run=dry_run, drop_redundant=drop_redundant)
+    print(json.dumps(report, indent=2, default=str))
+    sys.exit(1 if any('error' in plan or plan['missing'] and dry_run for plan in report.values()) else 0)
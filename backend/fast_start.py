@@ -0,0 +1,222 @@
+"""
+Fast-start support shared by every service.
+
+Import this module before anything else in a service: from then on the first
+import of every top-level package is timed, through a builtins.__import__
+wrapper that StartupReport.ready() removes. Code that embeds the services
+without marking a report ready (prefork.py, loadtest.py) calls
+stop_import_timing() itself once they are loaded. Heavy numeric modules (numpy, pandas,
+sklearn, joblib and the compiler modules built on them) are bound through
+lazy_import(), so they are only imported when a model is actually loaded.
+
+With FAST_START=true a service doesn't load its models at boot. They are loaded
+(together with the heavy imports) by the first model-dependent request, or by a
+background warm-up started right after boot when FAST_START_WARMUP=true. Either
+way every service logs a StartupReport at boot with per-module import times,
+phase times and, once loaded, per-artifact load times.
+"""
+
+import builtins
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Skip model loading at boot; load on first use (or in a background warm-up)
+FAST_START_ENABLED = os.getenv('FAST_START', 'false').lower() in ('1', 'true', 'yes')
+FAST_START_WARMUP = os.getenv('FAST_START_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+
+# Reference point for every startup timing: as close to process start as we get
+PROCESS_STARTED = time.perf_counter()
+
+# Top-level package -> seconds spent on its first import (including its own imports)
+import_times = OrderedDict()
+_import_state = threading.local()
+_original_import = builtins.__import__
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """builtins.__import__ wrapper recording the outermost first-time import of a package"""
+    if level or name in sys.modules or getattr(_import_state, 'depth', 0):
+        return _original_import(name, globals, locals, fromlist, level)
+
+    _import_state.depth = 1
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _import_state.depth = 0
+        package = name.partition('.')[0]
+        import_times[package] = import_times.get(package, 0.0) + time.perf_counter() - started
+
+
+def start_import_timing():
+    builtins.__import__ = _timed_import
+
+
+def stop_import_timing():
+    if builtins.__import__ is _timed_import:
+        builtins.__import__ = _original_import
+
+
+start_import_timing()
+
+
+class LazyModule:
+    """Module stand-in that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        self.__dict__['_lazy_name'] = name
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            name = self.__dict__['_lazy_name']
+            started = time.perf_counter()
+            module = importlib.import_module(name)
+            elapsed = time.perf_counter() - started
+            if elapsed > 0.001:
+                import_times[name] = import_times.get(name, 0.0) + elapsed
+                logger.info(f"Lazily imported {name} in {elapsed * 1000:.1f} ms")
+            self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attribute):
+        value = getattr(self._load(), attribute)
+        # Cache on the proxy so later lookups never reach __getattr__
+        self.__dict__[attribute] = value
+        return value
+
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__dict__['_lazy_name']}' ({state})>"
+
+
+def lazy_import(name):
+    """The module itself if it's already imported, else a LazyModule for it"""
+    return sys.modules[name] if name in sys.modules else LazyModule(name)
+
+
+class StartupReport:
+    """Boot timeline of one service: imports, phases and artifact loads"""
+
+    def __init__(self, service, families=()):
+        self.service = service
+        self.families = tuple(families)
+        self.phases = OrderedDict()
+        self.ready_seconds = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Time a startup phase, e.g. 'database' or 'models'"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - started)
+
+    def record_phase(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def ready(self):
+        """Mark the service ready to accept traffic"""
+        self.ready_seconds = time.perf_counter() - PROCESS_STARTED
+        stop_import_timing()
+
+    def artifact_times(self):
+        """Load time of every loaded artifact of this service's model families"""
+        from model_registry import registry
+        return {
+            entry['name']: entry['load_ms']
+            for entry in registry.info()
+            if entry['loaded'] and entry['name'].split('/')[0] in self.families
+        }
+
+    def summary(self):
+        """Report for logs and health endpoints (times in ms)"""
+        with self._lock:
+            phases = {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+        return {
+            'service': self.service,
+            'fast_start': FAST_START_ENABLED,
+            'ready_ms': round(self.ready_seconds * 1000, 1) if self.ready_seconds is not None else None,
+            'imports_ms': {
+                name: round(seconds * 1000, 1)
+                for name, seconds in sorted(import_times.items(), key=lambda item: -item[1])
+            },
+            'phases_ms': phases,
+            'artifacts_ms': self.artifact_times() if self.families else {}
+        }
+
+    def log(self):
+        """Log the report; slowest imports first"""
+        summary = self.summary()
+        lines = [f"Startup report for {self.service} (fast_start={summary['fast_start']}): "
+                 f"ready in {summary['ready_ms']} ms"]
+        lines += [f"  import {name:<28} {ms:>9.1f} ms" for name, ms in summary['imports_ms'].items() if ms >= 1.0]
+        lines += [f"  phase  {name:<28} {ms:>9.1f} ms" for name, ms in summary['phases_ms'].items()]
+        lines += [f"  load   {name:<28} {ms:>9.1f} ms" for name, ms in summary['artifacts_ms'].items() if ms is not None]
+        logger.info('\n'.join(lines))
+        return summary
+
+
+class ModelLoader:
+    """Runs a service's model-loading function once, at boot or on first use"""
+
+    def __init__(self, load_fn, report, name='models'):
+        self.load_fn = load_fn
+        self.report = report
+        self.name = name
+        self.loaded = False
+        # True after an attempt that failed (service_supervisor retries it in the background)
+        self.failed = False
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    def ensure(self, trigger='request'):
+        """Load the models unless they're already loaded; returns whether they are"""
+        if self.loaded:
+            return True
+        with self._lock:
+            if not self.loaded:
+                started = time.perf_counter()
+                self.loaded = bool(self.load_fn())
+                self.failed = not self.loaded
+                elapsed = time.perf_counter() - started
+                self.report.record_phase(f'{self.name} ({trigger})', elapsed)
+                if self.loaded:
+                    logger.info(f"Loaded {self.name} on {trigger} in {elapsed * 1000:.1f} ms")
+        return self.loaded
+
+    def warm_up(self, background=True):
+        """Load the models now, or in a daemon thread so the server can start listening first"""
+        if not background:
+            return self.ensure(trigger='warm-up')
+        if self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(
+                target=self.ensure, kwargs={'trigger': 'warm-up'}, name=f'{self.name}-warm-up', daemon=True
+            )
+            self._warmup_thread.start()
+        return self.loaded
+
+    def boot(self):
+        """Boot-time entry point honouring FAST_START / FAST_START_WARMUP"""
+        if not FAST_START_ENABLED:
+            return self.ensure(trigger='boot')
+        if FAST_START_WARMUP:
+            self.warm_up(background=True)
+        else:
+            logger.info(f"Fast start: {self.name} will load on the first request that needs them")
+        return True
@@ -0,0 +1,165 @@
+"""
+Single-process gateway hosting all five Mentora APIs.
+
+Each service's Flask app is mounted under a path prefix of one WSGI
+application, so one interpreter serves every route:
+
+    /register/...   register.py  (standalone: port 5000)
+    /stress/...     stress.py    (port 5001)
+    /mental/...     mental.py    (port 5002)
+    /mobile/...     mobile.py    (port 5003)
+    /academic/...   academic.py  (port 5004)
+
+e.g. POST /stress/predict is stress.py's POST /predict. The services keep
+their own before_request gates, error handlers and CORS settings, and share
+what is process-wide: one MongoDB client and pool (mongo_pool.py), one model
+registry (model_registry.py) and one copy of numpy / pandas / sklearn.
+The latency histograms (metrics.py) are process-wide too: GET /metrics and
+each service's own /metrics report every mounted service.
+
+GATEWAY_SERVICES picks the services to mount (comma-separated, default all).
+With GATEWAY_LEGACY_PORTS=true the same process also answers each service on
+its old port without a prefix, so clients can move over gradually.
+
+Usage:
+    python gateway.py               (GATEWAY_HOST / GATEWAY_PORT, default 0.0.0.0:8000)
+
+Under another WSGI server (e.g. gunicorn gateway:app) call boot() from its
+post-fork hook; otherwise each service connects and loads its models on first
+use.
+"""
+
+import importlib
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from flask import Flask, jsonify
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+from werkzeug.serving import make_server, run_simple
+import json_provider
+import metrics
+import mongo_pool
+import write_behind
+from model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+# Path prefix -> (service module, standalone port)
+SERVICE_MOUNTS = {
+    '/register': ('register', 5000),
+    '/stress': ('stress', 5001),
+    '/mental': ('mental', 5002),
+    '/mobile': ('mobile', 5003),
+    '/academic': ('academic', 5004)
+}
+
+GATEWAY_HOST = os.getenv('GATEWAY_HOST', '0.0.0.0')
+GATEWAY_PORT = int(os.getenv('GATEWAY_PORT', 8000))
+GATEWAY_SERVICES = [name.strip() for name in os.getenv('GATEWAY_SERVICES', '').split(',') if name.strip()]
+GATEWAY_LEGACY_PORTS = os.getenv('GATEWAY_LEGACY_PORTS', 'false').lower() in ('1', 'true', 'yes')
+
+
+def load_services(names=None):
+    """Import the service modules to mount; returns {prefix: module}"""
+    names = names or [module_name for module_name, _ in SERVICE_MOUNTS.values()]
+    known = {module_name for module_name, _ in SERVICE_MOUNTS.values()}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown services: {', '.join(unknown)}. Known: {', '.join(sorted(known))}")
+
+    return {
+        prefix: importlib.import_module(module_name)
+        for prefix, (module_name, _) in SERVICE_MOUNTS.items() if module_name in names
+    }
+
+
+def boot(services):
+    """Boot every mounted service the way its standalone __main__ does, without exiting on failures"""
+    # Start the write-behind flusher (if enabled) on the main thread so SIGTERM flushes it
+    write_behind.get_write_queue()
+
+    for prefix, module in services.items():
+        report = module.startup_report
+        loader = getattr(module, 'model_loader', None)
+        # Models load at boot (or on first use / warm-up with FAST_START=true); a failed
+        # load leaves that service answering 503 while its supervisor retries
+        if loader is not None and not loader.boot():
+            logger.warning(f"⚠️ {prefix}: models not loaded, its model endpoints will return 503")
+        # The supervisor's first probe connects to the database
+        module.supervisor.start()
+        report.ready()
+        report.log()
+
+
+def create_gateway_app(services):
+    """Index / health app answering the paths no service is mounted under"""
+    gateway_app = Flask(__name__)
+    json_provider.init_app(gateway_app)
+    metrics.add_metrics_route(gateway_app, 'gateway')
+
+    @gateway_app.route('/')
+    def home():
+        return jsonify({
+            'message': 'Mentora API gateway',
+            'services': {prefix: f'{prefix}/' for prefix in services}
+        })
+
+    @gateway_app.route('/health', methods=['GET'])
+    def health_check():
+        statuses = {prefix: module.supervisor.status() for prefix, module in services.items()}
+        ready = all(status['ready'] for status in statuses.values())
+        return jsonify({
+            'status': 'healthy' if ready else 'degraded',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'services': statuses,
+            'mongo_pool': mongo_pool.pool_stats(),
+            'model_registry': registry.info()
+        }), 200 if ready else 503
+
+    @gateway_app.errorhandler(404)
+    def not_found(error):
+        return jsonify({
+            'success': False,
+            'error': 'Endpoint not found'
+        }), 404
+
+    return gateway_app
+
+
+def create_app(services):
+    """WSGI app dispatching each prefix to its service's Flask app"""
+    return DispatcherMiddleware(
+        create_gateway_app(services),
+        {prefix: module.app for prefix, module in services.items()}
+    )
+
+
+def serve_legacy_ports(services, host=GATEWAY_HOST):
+    """Also answer each service unprefixed on its standalone port (background threads)"""
+    for prefix, module in services.items():
+        port = SERVICE_MOUNTS[prefix][1]
+        server = make_server(host, port, module.app, threaded=True)
+        threading.Thread(target=server.serve_forever, name=f'gateway{prefix.replace("/", "-")}',
+                         daemon=True).start()
+        logger.info(f"✓ {prefix[1:]} also served on port {port}")
+
+
+services = load_services(GATEWAY_SERVICES)
+app = create_app(services)
+
+
+if __name__ == '__main__':
+    print("="*60)
+    print("MENTORA API GATEWAY")
+    print("="*60)
+
+    boot(services)
+    if GATEWAY_LEGACY_PORTS:
+        serve_legacy_ports(services)
+
+    for prefix in services:
+        print(f"✓ {prefix[1:]}: http://localhost:{GATEWAY_PORT}{prefix}/")
+    print("="*60)
+
+    run_simple(GATEWAY_HOST, GATEWAY_PORT, app, threaded=True, use_reloader=False)
@@ -0,0 +1,106 @@
+"""
+Fast JSON for the services' responses and request bodies.
+
+init_app(app) installs the provider on a Flask app, so jsonify,
+request.get_json and the NDJSON history streams (streaming.py) go through
+orjson. Without orjson installed the stdlib json module is used with the same
+output, only slower. Both encode the types that reach responses directly, so
+handlers don't convert them by hand:
+
+- datetime as ISO 8601; naive datetimes (datetime.utcnow(), or read back from
+  MongoDB) are UTC and get a +00:00 offset
+- ObjectId as its hex string
+- numpy scalars and arrays as numbers and lists
+- Decimal as a string, as Flask's default provider does
+
+Keys are sorted like Flask's default provider's. Unlike it, datetimes and dates
+are ISO 8601 instead of HTTP dates.
+
+dumps() / loads() are the same encoder on bytes, for code outside Flask
+(stress_asgi.py).
+"""
+
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = (orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+                      | orjson.OPT_SORT_KEYS)
+
+
+def default(value):
+    """Encode the types json / orjson don't handle themselves"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        # Only reached on the stdlib path; orjson encodes datetimes itself
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    # numpy scalars and arrays (orjson only falls back here for the dtypes it can't encode)
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    # UUIDs, dataclasses and __html__ objects as Flask encodes them
+    return DefaultJSONProvider.default(value)
+
+
+def dumps(obj):
+    """obj as compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS)
+    return json.dumps(obj, default=default, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def loads(data):
+    """Parse JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson"""
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        # Callers asking for stdlib options (indent, ...) get the stdlib encoder
+        if kwargs:
+            kwargs.setdefault('default', default)
+            return json.dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=default, option=ORJSON_OPTIONS) + b'\n', mimetype=self.mimetype
+        )
+
+
+class StdlibProvider(DefaultJSONProvider):
+    """Flask's default provider with the same type handling as OrjsonProvider"""
+
+    default = staticmethod(default)
+
+
+def init_app(app):
+    """Use the fastest available provider for app's JSON"""
+    app.json = OrjsonProvider(app) if orjson is not None else StdlibProvider(app)
+    return app.json
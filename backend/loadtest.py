@@ -0,0 +1,335 @@
+"""
+Load-testing harness for the prediction endpoints.
+
+Replays rows of the bundled datasets (data/*.csv) as request payloads against
+the services' Flask apps in-process, with MongoDB replaced by the in-memory
+stand-in (memory_mongo.py), and reports throughput and latency percentiles per
+endpoint as JSON so runs can be compared:
+
+    python loadtest.py [--endpoints academic,stress,mental,mobile] [--requests 500]
+                       [--concurrency 8] [--rate 0] [--warmup 20] [--output run.json]
+    python loadtest.py compare baseline.json run.json
+
+Endpoints and their datasets:
+
+    academic  POST /predictacademicperformance  Students Social Media Addiction.csv
+    stress    POST /predict                     Sleep_health_and_lifestyle_dataset.csv
+    mental    POST /predictmentalhealth         mental_health_dataset.csv
+    mobile    POST /analyze_mobile_usage        mobile_addiction.csv
+
+Stress and mental read the user's profile, so one user per dataset row is
+seeded from the row's age / gender / occupation. Mobile gets a fresh user id
+per request so every request runs the model instead of returning the day's
+earlier result.
+
+Endpoints run one after another, each with --concurrency client threads.
+Without --rate every thread sends its next request as soon as the previous one
+returns (closed loop, measures capacity). With --rate requests are scheduled at
+that many per second in total and latency is measured from each request's
+scheduled time, so queueing behind a slow server shows up in the percentiles.
+Dataset rows an endpoint rejects (e.g. mobile rows with stress_level 0) are
+sent anyway and show up as 400s in status_counts. An endpoint whose service
+can't serve (e.g. its models are missing) is reported as skipped.
+"""
+
+import argparse
+import csv
+import importlib
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+import fast_start
+import mongo_pool
+from memory_mongo import MEMORY_URI_SCHEME, MemoryClient
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('LOADTEST_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+
+
+def _number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def academic_payload(row, index, user_id):
+    return {
+        'age': int(row['Age']),
+        'gender': row['Gender'],
+        'academic_level': row['Academic_Level'],
+        'country': row['Country'],
+        'avg_daily_usage_hours': float(row['Avg_Daily_Usage_Hours']),
+        'most_used_platform': row['Most_Used_Platform'],
+        'sleep_hours_per_night': float(row['Sleep_Hours_Per_Night']),
+        'mental_health_score': int(row['Mental_Health_Score']),
+        'relationship_status': row['Relationship_Status'],
+        'conflicts_over_social_media': int(row['Conflicts_Over_Social_Media']),
+        'local_timestamp': datetime.now().isoformat()
+    }
+
+
+def stress_user(row):
+    return {'age': int(row['Age']), 'gender': row['Gender'], 'occupation_or_academic_level': row['Occupation']}
+
+
+def stress_payload(row, index, user_id):
+    systolic_bp, diastolic_bp = row['Blood Pressure'].split('/')
+    return {
+        'user_id': user_id,
+        'sleep_duration': float(row['Sleep Duration']),
+        'quality_of_sleep': int(row['Quality of Sleep']),
+        'physical_activity_level': int(row['Physical Activity Level']),
+        'bmi_category': row['BMI Category'],
+        'heart_rate': int(row['Heart Rate']),
+        'daily_steps': int(row['Daily Steps']),
+        'systolic_bp': int(systolic_bp),
+        'diastolic_bp': int(diastolic_bp),
+        'has_sleep_disorder': row['Sleep Disorder'] != 'None'
+    }
+
+
+def mental_user(row):
+    return {'age': int(row['Age']), 'gender': row['Gender'], 'occupation_or_academic_level': row['Employment_Status']}
+
+
+def mental_payload(row, index, user_id):
+    return {
+        'user_id': user_id,
+        'sleep_hours': float(row['Sleep_Duration_hours_per_night']),
+        'sleep_quality': round(float(row['Sleep_Quality_1_to_10'])),
+        'mood_rating': round(float(row['Mood_Rating_1_to_10'])),
+        'stress_level': row['Stress_Level'],
+        'smoking_habits': row['Smoking_Habits'],
+        'drinking_habits': row['Drinking_Habits'],
+        'social_interaction_level': row['Social_Interaction_Level'],
+        'screen_time': float(row['Screen_Time_hours_per_day']),
+        'physical_activity': float(row['Physical_Activity_hours_per_week']),
+        'diet_quality': round(float(row['Diet_Quality_1_to_10'])),
+        'work_study_hours': float(row['Work_Study_Hours_per_day']),
+        'employment_status': row['Employment_Status'],
+        'chronic_health_issues': row['Chronic_Health_Issues'],
+        # The dataset has the total; the endpoint adds it up from drinks (95 mg per coffee)
+        'drinks': [{'type': 'Coffee', 'quantity': round(float(row['Caffeine_Intake_mg_per_day']) / 95)}]
+    }
+
+
+def mobile_payload(row, index, user_id):
+    payload = {column: _number(value) for column, value in row.items() if column not in ('user_id', 'addicted')}
+    payload['user_id'] = f'loadtest-{index}'
+    return payload
+
+
+# name -> (service module, path, dataset, payload builder, profile of the user seeded per row)
+ENDPOINTS = {
+    'academic': ('academic', '/predictacademicperformance', 'Students Social Media Addiction.csv', academic_payload, None),
+    'stress': ('stress', '/predict', 'Sleep_health_and_lifestyle_dataset.csv', stress_payload, stress_user),
+    'mental': ('mental', '/predictmentalhealth', 'mental_health_dataset.csv', mental_payload, mental_user),
+    'mobile': ('mobile', '/analyze_mobile_usage', 'mobile_addiction.csv', mobile_payload, None)
+}
+
+
+def use_memory_store():
+    """Point mongo_pool at the in-memory stand-in before any service connects"""
+    os.environ['MONGO_URI'] = MEMORY_URI_SCHEME
+    mongo_pool.MONGO_URI = MEMORY_URI_SCHEME
+    if not isinstance(mongo_pool.get_client(), MemoryClient):
+        raise RuntimeError("A MongoDB client already exists; run the load test in a fresh process")
+
+
+def read_rows(dataset, limit=None):
+    with open(os.path.join(DATA_DIR, dataset), newline='', encoding='utf-8') as f:
+        return list(itertools.islice(csv.DictReader(f), limit))
+
+
+def seed_users(rows, make_user):
+    """One user per dataset row; returns their ids (as strings) in row order"""
+    if make_user is None:
+        return [None] * len(rows)
+    users = [make_user(row) for row in rows]
+    result = mongo_pool.get_database()['users'].insert_many(users)
+    return [str(user_id) for user_id in result.inserted_ids]
+
+
+def start_service(module):
+    """Connect the service and load its models; returns why it can't serve, or None"""
+    module.supervisor.start()
+    return module.supervisor.check(needs_models=True)
+
+
+def _percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] if samples else 0.0
+
+
+def summarize(latencies, statuses, duration):
+    """Throughput and latency percentiles (ms) of one endpoint run"""
+    latencies = sorted(latencies)
+    total = len(latencies)
+    ok = sum(count for status, count in statuses.items() if 200 <= status < 300)
+    return {
+        'requests': total,
+        'ok': ok,
+        'errors': total - ok,
+        'status_counts': {str(status): count for status, count in sorted(statuses.items())},
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(total / duration, 2) if duration else 0.0,
+        'latency_ms': {
+            'mean': round(sum(latencies) / total * 1000, 3) if total else 0.0,
+            'p50': round(_percentile(latencies, 0.50) * 1000, 3),
+            'p95': round(_percentile(latencies, 0.95) * 1000, 3),
+            'p99': round(_percentile(latencies, 0.99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3) if total else 0.0
+        }
+    }
+
+
+def drive(app, path, make_payload, requests, concurrency, rate=None, warmup=0):
+    """POST requests payloads to app from concurrency threads; returns the run's summary"""
+    client = app.test_client()
+    for index in range(warmup):
+        client.post(path, json=make_payload(-1 - index))
+
+    indexes = iter(range(requests))
+    lock = threading.Lock()
+    latencies = []
+    statuses = {}
+    interval = 1.0 / rate if rate else 0.0
+
+    def worker():
+        worker_client = app.test_client()
+        while True:
+            with lock:
+                index = next(indexes, None)
+            if index is None:
+                return
+            payload = make_payload(index)
+            if rate:
+                scheduled = started + index * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                request_started = scheduled
+            else:
+                request_started = time.perf_counter()
+            response = worker_client.post(path, json=payload)
+            latency = time.perf_counter() - request_started
+            with lock:
+                latencies.append(latency)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=worker, name=f'loadtest-{i}', daemon=True) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+def run_load_test(endpoints=tuple(ENDPOINTS), requests=500, concurrency=8, rate=None, warmup=20, rows=None):
+    """Run every endpoint in turn; returns the JSON-serializable report"""
+    use_memory_store()
+    # Services imported below would otherwise keep the import-timing hook installed for the whole run
+    fast_start.stop_import_timing()
+    report = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'config': {'endpoints': list(endpoints), 'requests': requests, 'concurrency': concurrency,
+                   'rate': rate, 'warmup': warmup, 'rows': rows},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpu_count': os.cpu_count()},
+        'endpoints': {}
+    }
+
+    for name in endpoints:
+        module_name, path, dataset, make_payload, make_user = ENDPOINTS[name]
+        module = importlib.import_module(module_name)
+        # The services log every request (and every rejected row); that would dominate the timings
+        logging.getLogger().setLevel(logging.ERROR)
+        logger.setLevel(logging.INFO)
+
+        problem = start_service(module)
+        if problem:
+            logger.warning(f"Skipping {name}: {problem}")
+            report['endpoints'][name] = {'path': path, 'skipped': problem}
+            continue
+
+        dataset_rows = read_rows(dataset, rows)
+        user_ids = seed_users(dataset_rows, make_user)
+
+        def payload_for(index, dataset_rows=dataset_rows, user_ids=user_ids, make_payload=make_payload):
+            position = index % len(dataset_rows)
+            return make_payload(dataset_rows[position], index, user_ids[position])
+
+        result = drive(module.app, path, payload_for, requests, concurrency, rate, warmup)
+        report['endpoints'][name] = {'path': path, 'dataset': dataset, 'rows': len(dataset_rows), **result}
+        logger.info(f"{name}: {result['throughput_rps']} req/s, p50 {result['latency_ms']['p50']} ms, "
+                       f"p99 {result['latency_ms']['p99']} ms, {result['errors']} errors")
+    return report
+
+
+def _change(before, after):
+    return round((after - before) / before * 100, 1) if before else None
+
+
+def compare(baseline, current):
+    """Per-endpoint percentage changes in throughput and latency between two reports"""
+    changes = {}
+    for name, after in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if not before or 'skipped' in before or 'skipped' in after:
+            continue
+        changes[name] = {
+            'throughput_rps_pct': _change(before['throughput_rps'], after['throughput_rps']),
+            **{f'{key}_ms_pct': _change(before['latency_ms'][key], after['latency_ms'][key])
+               for key in ('p50', 'p95', 'p99')},
+            'errors': {'before': before['errors'], 'after': after['errors']}
+        }
+    return changes
+
+
+def main(argv):
+    if argv[:1] == ['compare']:
+        if len(argv) != 3:
+            print(__doc__)
+            return 2
+        with open(argv[1]) as f:
+            baseline = json.load(f)
+        with open(argv[2]) as f:
+            current = json.load(f)
+        print(json.dumps(compare(baseline, current), indent=2))
+        return 0
+
+    parser = argparse.ArgumentParser(description='In-process load test of the prediction endpoints')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help=f"comma-separated subset of {', '.join(ENDPOINTS)}")
+    parser.add_argument('--requests', type=int, default=500, help='timed requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--rate', type=float, default=None, help='requests per second (default: as fast as possible)')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed requests per endpoint before timing')
+    parser.add_argument('--rows', type=int, default=None, help='use only the first N rows of each dataset')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = [name for name in endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    report = run_load_test(endpoints, args.requests, max(1, args.concurrency), args.rate, args.warmup, args.rows)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,554 @@
+"""
+In-process MongoDB stand-in.
+
+With MONGO_URI=memory:// mongo_pool hands out a MemoryClient instead of a
+MongoClient, so the services (and their supervisors, index bootstrap and
+profile cache) run unchanged against process-local collections. Used by the
+load-test harness (loadtest.py) and the stress ASGI app's in-memory store to
+run and measure the services without a database server.
+
+It implements the subset of the pymongo API the services use: insert / find /
+count / update / replace / delete, sort / skip / limit cursors, projections,
+comparison and logical query operators, and $set / $unset / $inc / $min /
+$max / $setOnInsert updates. Unique indexes (with sparse and
+partialFilterExpression) are enforced on every write: a clash raises
+DuplicateKeyError, or BulkWriteError from insert_many, with the keyPattern and
+keyValue a server reports. Anything else (aggregation, pipeline updates,
+change streams) raises NotImplementedError or OperationFailure as a real
+standalone server without that feature would. Data is not shared between
+processes and not persisted.
+"""
+
+import copy
+import threading
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+MEMORY_URI_SCHEME = 'memory://'
+
+_MISSING = object()
+
+
+def is_memory_uri(uri):
+    return uri.startswith(MEMORY_URI_SCHEME)
+
+
+def _to_bson(value):
+    """A deep copy of value as a BSON round trip returns it (aware datetimes become naive UTC)"""
+    if isinstance(value, dict):
+        return {key: _to_bson(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_bson(item) for item in value]
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None, microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, datetime):
+        # BSON dates have millisecond precision
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return copy.deepcopy(value)
+
+
+def _get_path(doc, path):
+    """Value at a dotted path, or _MISSING"""
+    value = doc
+    for part in path.split('.'):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+    return value
+
+
+def _set_path(doc, path, value):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc, path):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _compare(value, operand, predicate):
+    if value is _MISSING or value is None or operand is None:
+        return False
+    try:
+        return predicate(value, operand)
+    except TypeError:
+        # MongoDB never matches across incomparable BSON types
+        return False
+
+
+def _equals(value, operand):
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return (None if value is _MISSING else value) == operand
+
+
+_QUERY_OPERATORS = {
+    '$eq': _equals,
+    '$ne': lambda value, operand: not _equals(value, operand),
+    '$gt': lambda value, operand: _compare(value, operand, lambda a, b: a > b),
+    '$gte': lambda value, operand: _compare(value, operand, lambda a, b: a >= b),
+    '$lt': lambda value, operand: _compare(value, operand, lambda a, b: a < b),
+    '$lte': lambda value, operand: _compare(value, operand, lambda a, b: a <= b),
+    '$in': lambda value, operand: any(_equals(value, item) for item in operand),
+    '$nin': lambda value, operand: not any(_equals(value, item) for item in operand),
+    '$exists': lambda value, operand: (value is not _MISSING) == bool(operand)
+}
+
+
+def matches(doc, query_filter):
+    """Whether a document satisfies a query filter"""
+    for field, condition in (query_filter or {}).items():
+        if field == '$and':
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif field == '$or':
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif field == '$nor':
+            if any(matches(doc, clause) for clause in condition):
+                return False
+        elif field.startswith('$'):
+            raise NotImplementedError(f"Query operator {field} is not supported by the in-memory store")
+        else:
+            value = _get_path(doc, field)
+            if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+                for operator, operand in condition.items():
+                    if operator not in _QUERY_OPERATORS:
+                        raise NotImplementedError(f"Query operator {operator} is not supported by the in-memory store")
+                    if not _QUERY_OPERATORS[operator](value, operand):
+                        return False
+            elif not _equals(value, condition):
+                return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = bool(projection.get('_id', 1))
+    fields = {field: value for field, value in projection.items() if field != '_id'}
+
+    if any(fields.values()):
+        result = {}
+        for field in fields:
+            value = _get_path(doc, field)
+            if value is not _MISSING:
+                _set_path(result, field, copy.deepcopy(value))
+    else:
+        result = copy.deepcopy(doc)
+        for field in fields:
+            _unset_path(result, field)
+    if include_id and '_id' in doc:
+        result['_id'] = doc['_id']
+    else:
+        result.pop('_id', None)
+    return result
+
+
+def _sort_key(value):
+    # Missing / null sort first, then numbers, strings, ids and dates as MongoDB orders them
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (5, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, ObjectId):
+        return (4, value)
+    return (6, value)
+
+
+def _sort(docs, sort):
+    for field, direction in reversed(sort):
+        docs.sort(key=lambda doc: _sort_key(_get_path(doc, field)), reverse=direction < 0)
+    return docs
+
+
+def _apply_update(doc, update, inserting=False):
+    """Apply an update document in place; returns whether doc changed"""
+    if isinstance(update, list):
+        raise NotImplementedError("Pipeline updates are not supported by the in-memory store")
+    before = copy.deepcopy(doc)
+    for operator, fields in _to_bson(update).items():
+        for path, operand in fields.items():
+            current = _get_path(doc, path)
+            if operator == '$set' or (operator == '$setOnInsert' and inserting):
+                _set_path(doc, path, operand)
+            elif operator == '$setOnInsert':
+                continue
+            elif operator == '$unset':
+                _unset_path(doc, path)
+            elif operator == '$inc':
+                _set_path(doc, path, (0 if current is _MISSING else current) + operand)
+            elif operator == '$min':
+                if current is _MISSING or operand < current:
+                    _set_path(doc, path, operand)
+            elif operator == '$max':
+                if current is _MISSING or operand > current:
+                    _set_path(doc, path, operand)
+            else:
+                raise NotImplementedError(f"Update operator {operator} is not supported by the in-memory store")
+    return doc != before
+
+
+def _hashable(value):
+    if isinstance(value, (dict, list)):
+        return repr(value)
+    return value
+
+
+def _index_key(doc, spec):
+    """doc's entry in an index as a hashable tuple, or None when the index doesn't cover doc"""
+    if 'partialFilterExpression' in spec and not matches(doc, spec['partialFilterExpression']):
+        return None
+    values = [_get_path(doc, field) for field, _ in spec['key']]
+    if spec.get('sparse') and all(value is _MISSING for value in values):
+        return None
+    return tuple(_hashable(None if value is _MISSING else value) for value in values)
+
+
+def _duplicate_key_error(collection, name, spec, doc):
+    key_pattern = dict(spec['key'])
+    key_value = {field: _get_path(doc, field) for field in key_pattern}
+    key_value = {field: (None if value is _MISSING else value) for field, value in key_value.items()}
+    message = (f"E11000 duplicate key error collection: {collection.full_name} index: {name} "
+               f"dup key: {key_value}")
+    return DuplicateKeyError(message, code=11000, details={
+        'code': 11000, 'errmsg': message, 'keyPattern': key_pattern, 'keyValue': key_value
+    })
+
+
+def _upsert_seed(query_filter):
+    """Equality fields of a filter, copied into a document created by an upsert"""
+    seed = {}
+    for field, condition in query_filter.items():
+        if not field.startswith('$') and not (isinstance(condition, dict) and any(key.startswith('$') for key in condition)):
+            _set_path(seed, field, _to_bson(condition))
+    return seed
+
+
+class MemoryCursor:
+    """Lazily evaluated find() result supporting sort / skip / limit chaining"""
+
+    def __init__(self, collection, query_filter, projection):
+        self._collection = collection
+        self._filter = query_filter
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key_or_list, direction=1):
+        self._sort = [(key_or_list, direction)] if isinstance(key_or_list, str) else list(key_or_list)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _evaluate(self):
+        if self._results is None:
+            docs = self._collection._select(self._filter, self._sort)
+            docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:abs(self._limit)]
+            self._results = iter([_project(doc, self._projection) for doc in docs])
+        return self._results
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._evaluate())
+
+    def close(self):
+        self._results = iter(())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MemoryCollection:
+    """One collection of the in-memory store (thread-safe)"""
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._docs = {}
+        self._indexes = {'_id_': {'key': [('_id', 1)]}}
+        # Unique index name -> {index key: _id of the document holding it}
+        self._unique = {}
+        self._lock = threading.RLock()
+
+    @property
+    def full_name(self):
+        return f'{self.database.name}.{self.name}'
+
+    def _select(self, query_filter, sort=None):
+        query_filter = _to_bson(query_filter)
+        with self._lock:
+            docs = [doc for doc in self._docs.values() if matches(doc, query_filter)]
+        return _sort(docs, sort) if sort else docs
+
+    def _claim(self, doc, previous=None):
+        """Record doc's unique index keys (replacing previous's); raises DuplicateKeyError. Lock held."""
+        keys = {}
+        for name, entries in self._unique.items():
+            key = _index_key(doc, self._indexes[name])
+            if key is None:
+                continue
+            holder = entries.get(key, _MISSING)
+            if holder is not _MISSING and holder != doc['_id']:
+                raise _duplicate_key_error(self, name, self._indexes[name], doc)
+            keys[name] = key
+        if previous is not None:
+            self._release(previous)
+        for name, key in keys.items():
+            self._unique[name][key] = doc['_id']
+
+    def _release(self, doc):
+        for name, entries in self._unique.items():
+            key = _index_key(doc, self._indexes[name])
+            if key is not None and entries.get(key) == doc['_id']:
+                del entries[key]
+
+    def _store(self, doc, previous=None):
+        """Insert or replace a document after checking the unique indexes. Lock held."""
+        if previous is None and doc['_id'] in self._docs:
+            raise _duplicate_key_error(self, '_id_', self._indexes['_id_'], doc)
+        self._claim(doc, previous)
+        self._docs[doc['_id']] = doc
+
+    def insert_one(self, document, *args, **kwargs):
+        document.setdefault('_id', ObjectId())
+        with self._lock:
+            self._store(_to_bson(document))
+        return InsertOneResult(document['_id'], True)
+
+    def insert_many(self, documents, ordered=True, *args, **kwargs):
+        inserted_ids = []
+        errors = []
+        for index, document in enumerate(documents):
+            try:
+                inserted_ids.append(self.insert_one(document).inserted_id)
+            except DuplicateKeyError as e:
+                errors.append(dict(e.details, index=index, op=document))
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({
+                'writeErrors': errors, 'writeConcernErrors': [], 'nInserted': len(inserted_ids),
+                'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []
+            })
+        return InsertManyResult(inserted_ids, True)
+
+    def find(self, filter=None, projection=None, *args, **kwargs):
+        cursor = MemoryCursor(self, filter or {}, projection)
+        if kwargs.get('sort'):
+            cursor.sort(kwargs['sort'])
+        if kwargs.get('limit'):
+            cursor.limit(kwargs['limit'])
+        return cursor
+
+    def find_one(self, filter=None, projection=None, *args, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        return next(self.find(filter, projection, sort=kwargs.get('sort'), limit=1), None)
+
+    def count_documents(self, filter, skip=0, limit=0, **kwargs):
+        count = max(0, len(self._select(filter)) - skip)
+        return min(count, limit) if limit else count
+
+    def estimated_document_count(self, **kwargs):
+        return len(self._docs)
+
+    def _update(self, filter, update, upsert, many):
+        with self._lock:
+            targets = self._select(filter)
+            if not many:
+                targets = targets[:1]
+            modified = 0
+            for doc in targets:
+                updated = copy.deepcopy(doc)
+                if _apply_update(updated, update):
+                    self._store(updated, previous=doc)
+                    modified += 1
+            if targets or not upsert:
+                return UpdateResult({'n': len(targets), 'nModified': modified}, True)
+
+            doc = _upsert_seed(filter)
+            _apply_update(doc, update, inserting=True)
+            doc.setdefault('_id', ObjectId())
+            self._store(doc)
+            return UpdateResult({'n': 1, 'nModified': 0, 'upserted': doc['_id']}, True)
+
+    def update_one(self, filter, update, upsert=False, *args, **kwargs):
+        return self._update(filter, update, upsert, many=False)
+
+    def update_many(self, filter, update, upsert=False, *args, **kwargs):
+        return self._update(filter, update, upsert, many=True)
+
+    def replace_one(self, filter, replacement, upsert=False, *args, **kwargs):
+        with self._lock:
+            targets = self._select(filter)[:1]
+            if targets:
+                replacement = dict(_to_bson(replacement), _id=targets[0]['_id'])
+                self._store(replacement, previous=targets[0])
+                return UpdateResult({'n': 1, 'nModified': 1}, True)
+            if not upsert:
+                return UpdateResult({'n': 0, 'nModified': 0}, True)
+            replacement = dict(_upsert_seed(filter), **_to_bson(replacement))
+            replacement.setdefault('_id', ObjectId())
+            self._store(replacement)
+            return UpdateResult({'n': 1, 'nModified': 0, 'upserted': replacement['_id']}, True)
+
+    def _delete(self, filter, many):
+        with self._lock:
+            targets = self._select(filter)
+            if not many:
+                targets = targets[:1]
+            for doc in targets:
+                self._release(doc)
+                del self._docs[doc['_id']]
+        return DeleteResult({'n': len(targets)}, True)
+
+    def delete_one(self, filter, *args, **kwargs):
+        return self._delete(filter, many=False)
+
+    def delete_many(self, filter, *args, **kwargs):
+        return self._delete(filter, many=True)
+
+    def index_information(self):
+        return copy.deepcopy(self._indexes)
+
+    def create_indexes(self, indexes, *args, **kwargs):
+        names = []
+        for index in indexes:
+            document = dict(index.document)
+            keys = list(document.pop('key').items())
+            name = document.pop('name')
+            spec = {'key': keys, **document}
+            with self._lock:
+                if spec.get('unique') and name != '_id_':
+                    # Like a server's index build, fail on documents that already clash
+                    entries = {}
+                    for doc in self._docs.values():
+                        key = _index_key(doc, spec)
+                        if key is None:
+                            continue
+                        if key in entries:
+                            raise _duplicate_key_error(self, name, spec, doc)
+                        entries[key] = doc['_id']
+                    self._unique[name] = entries
+                self._indexes[name] = spec
+            names.append(name)
+        return names
+
+    def create_index(self, keys, **kwargs):
+        from pymongo import IndexModel
+        return self.create_indexes([IndexModel(keys, **kwargs)])[0]
+
+    def drop_index(self, name, *args, **kwargs):
+        with self._lock:
+            self._indexes.pop(name, None)
+            self._unique.pop(name, None)
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        raise NotImplementedError("Aggregation is not supported by the in-memory store")
+
+    def find_one_and_update(self, *args, **kwargs):
+        raise NotImplementedError("find_one_and_update is not supported by the in-memory store")
+
+    def bulk_write(self, *args, **kwargs):
+        raise NotImplementedError("bulk_write is not supported by the in-memory store")
+
+    def watch(self, *args, **kwargs):
+        # Like a standalone server: change streams need a replica set
+        raise OperationFailure("The in-memory store does not support change streams", code=40573)
+
+
+class MemoryDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(self, name)
+            return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name, *args, **kwargs):
+        return self[name]
+
+    def list_collection_names(self, *args, **kwargs):
+        return list(self._collections)
+
+    def drop_collection(self, name, *args, **kwargs):
+        with self._lock:
+            self._collections.pop(name, None)
+
+    def command(self, command, *args, **kwargs):
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == 'ping':
+            return {'ok': 1.0}
+        raise OperationFailure(f"Command {name} is not supported by the in-memory store")
+
+
+class MemoryClient:
+    """Drop-in for the MongoClient mongo_pool shares (MONGO_URI=memory://)"""
+
+    def __init__(self, uri=MEMORY_URI_SCHEME, *args, **kwargs):
+        self.uri = uri
+        self._databases = {}
+        self._lock = threading.Lock()
+        self.admin = self['admin']
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._databases:
+                self._databases[name] = MemoryDatabase(self, name)
+            return self._databases[name]
+
+    def get_database(self, name, *args, **kwargs):
+        return self[name]
+
+    def list_database_names(self):
+        return list(self._databases)
+
+    def close(self):
+        pass
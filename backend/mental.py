@@ -1,22 +1,33 @@
+# Imported first so the startup report times every other import
+from fast_start import ModelLoader, StartupReport, lazy_import
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from pymongo import MongoClient
 from bson import ObjectId
-import pandas as pd
-import numpy as np
-import joblib
-import os
+import db_indexes
+import json_provider
+import metrics
+import mongo_pool
+import service_supervisor
+import write_behind
+from profile_cache import profile_cache
+from pagination import InvalidCursorError, fetch_page, iter_rows, parse_limit
+from streaming import HISTORY_STREAM_BATCH_SIZE, ndjson_response, wants_stream
 from datetime import datetime
 import logging
+from model_registry import registry
 import warnings
 warnings.filterwarnings('ignore')
 
+# pandas / sklearn come in with the pipeline compiler, only when the models load
+pipeline_compiler = lazy_import('pipeline_compiler')
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000", "http://localhost:5000"])
+json_provider.init_app(app)
 
 # Global variables for database and models
 client = None
@@ -28,6 +39,7 @@ best_mh_model = None
 best_dep_model = None
 best_anx_model = None
 X_features = None
+compiled_models = None
 
 # Feature definitions
 numerical_features = ['Age', 'Screen_Time_hours_per_day', 'Sleep_Duration_hours_per_night', 
@@ -53,18 +65,15 @@ def initialize_database():
     global client, db, users_collection, mental_health_collection
     
     try:
-        mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
-        db_name = os.getenv('DB_NAME', 'mentoradb')
-        
-        logger.info(f"Connecting to MongoDB: {mongo_uri}")
-        client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+        logger.info(f"Connecting to MongoDB: {mongo_pool.MONGO_URI}")
         
-        # Test connection
-        client.admin.command('ping')
+        # Shared, pooled client; pings so a down server fails fast
+        client, db = mongo_pool.connect()
         
-        db = client[db_name]
         users_collection = db['users']
         mental_health_collection = db['mental_health']
+        db_indexes.bootstrap_indexes(db, ['mental_health'])
+        profile_cache.watch(users_collection)
         
         logger.info("Successfully connected to MongoDB")
         return True
@@ -75,21 +84,28 @@ def initialize_database():
 
 def load_models():
     """Load the pre-trained ML models"""
-    global models_loaded, best_mh_model, best_dep_model, best_anx_model, X_features
+    global models_loaded, best_mh_model, best_dep_model, best_anx_model, X_features, compiled_models
     
     try:
-        model_dir = "mental_health_models"
+        model_dir = registry.family_dir('mental_health')
         
         # Check if model directory exists
-        if not os.path.exists(model_dir):
+        if not registry.exists('mental_health'):
             logger.error(f"Model directory '{model_dir}' not found")
             return False
             
         # Load models
-        best_mh_model = joblib.load(os.path.join(model_dir, 'mental_health_model.joblib'))
-        best_dep_model = joblib.load(os.path.join(model_dir, 'depression_model.joblib'))
-        best_anx_model = joblib.load(os.path.join(model_dir, 'anxiety_model.joblib'))
-        X_features = joblib.load(os.path.join(model_dir, 'feature_names.joblib'))
+        best_mh_model = registry.load('mental_health', 'mental_health_model')
+        best_dep_model = registry.load('mental_health', 'depression_model')
+        best_anx_model = registry.load('mental_health', 'anxiety_model')
+        X_features = registry.load('mental_health', 'feature_names')
+        
+        # Compile the pipelines for the DataFrame-free inference path
+        compiled_models = {
+            'mental_health': pipeline_compiler.CompiledClassifier(best_mh_model, name='mental_health'),
+            'depression': pipeline_compiler.CompiledClassifier(best_dep_model, name='depression'),
+            'anxiety': pipeline_compiler.CompiledClassifier(best_anx_model, name='anxiety')
+        }
         
         logger.info("Successfully loaded pre-trained models")
         models_loaded = True
@@ -99,6 +115,24 @@ def load_models():
         logger.error(f"Error loading models: {e}")
         return False
 
+# Boot timeline and on-demand model loading (see fast_start.py)
+startup_report = StartupReport('mental', families=('mental_health',))
+model_loader = ModelLoader(load_models, startup_report, name='mental health models')
+
+# Endpoints that need the models; everything else is served without loading them
+MODEL_ENDPOINTS = {'predict_mental_health_endpoint'}
+
+# Background probe of the database / models (see service_supervisor.py)
+supervisor = service_supervisor.ServiceSupervisor(
+    'mental', initialize_database,
+    lambda: users_collection is not None and mental_health_collection is not None, model_loader
+)
+service_supervisor.add_probe_routes(app, supervisor)
+metrics.add_metrics_route(app, 'mental')
+
+# Endpoints served even while the database is down
+UNGATED_ENDPOINTS = {'home', 'health_check'} | service_supervisor.PROBE_ENDPOINTS | metrics.METRICS_ENDPOINTS
+
 def calculate_caffeine_intake(drinks_data):
     """Calculate total caffeine intake from drinks list"""
     total_caffeine = 0
@@ -118,12 +152,12 @@ def calculate_caffeine_intake(drinks_data):
     return total_caffeine
 
 def get_user_data(user_id):
-    """Fetch user data from MongoDB"""
+    """Fetch the user's profile fields (age, gender, occupation) through the shared profile cache"""
     try:
         if not ObjectId.is_valid(user_id):
             return None
             
-        user = users_collection.find_one({'_id': ObjectId(user_id)})
+        user = profile_cache.get(users_collection, user_id)
         return user
         
     except Exception as e:
@@ -132,36 +166,41 @@ def get_user_data(user_id):
 
 def predict_mental_health(input_data):
     """Make predictions using the loaded ML models"""
+    return predict_mental_health_batch([input_data])[0]
+
+@metrics.timed('mental', 'inference')
+def predict_mental_health_batch(input_rows):
+    """
+    Make predictions for many inputs at once.
+    Each input is encoded once and each model runs a single predict_proba;
+    labels are the argmax over the model's classes_.
+    """
     try:
         if not models_loaded:
             raise Exception("Models not loaded")
         
-        # Convert input to DataFrame
-        input_df = pd.DataFrame([input_data])
-        
-        # Make predictions
-        mh_pred = best_mh_model.predict(input_df[X_features])[0]
-        dep_pred = best_dep_model.predict(input_df[X_features])[0]
-        anx_pred = best_anx_model.predict(input_df[X_features])[0]
-        
-        # Get prediction probabilities
-        mh_prob = best_mh_model.predict_proba(input_df[X_features])[0].max()
-        dep_prob = best_dep_model.predict_proba(input_df[X_features])[0].max()
-        anx_prob = best_anx_model.predict_proba(input_df[X_features])[0].max()
-        
-        return {
-            'mental_health_status': mh_pred,
-            'depression_level': dep_pred,
-            'anxiety_presence': anx_pred,
-            'mental_health_confidence': float(mh_prob),
-            'depression_confidence': float(dep_prob),
-            'anxiety_confidence': float(anx_prob)
-        }
+        results = pipeline_compiler.predict_classifiers(compiled_models, input_rows, X_features)
+        mh_labels, mh_probs = results['mental_health']
+        dep_labels, dep_probs = results['depression']
+        anx_labels, anx_probs = results['anxiety']
+        
+        return [
+            {
+                'mental_health_status': mh_labels[i],
+                'depression_level': dep_labels[i],
+                'anxiety_presence': anx_labels[i],
+                'mental_health_confidence': float(mh_probs[i]),
+                'depression_confidence': float(dep_probs[i]),
+                'anxiety_confidence': float(anx_probs[i])
+            }
+            for i in range(len(input_rows))
+        ]
         
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         raise
 
+@metrics.timed('mental', 'tips')
 def generate_recommendations(prediction_results, caffeine_intake):
     """Generate recommendations based on prediction results and input data"""
     recommendations = []
@@ -212,6 +251,7 @@ def generate_recommendations(prediction_results, caffeine_intake):
     
     return recommendations_unique
 
+@metrics.timed('mental', 'db_write')
 def store_prediction_result(user_id, input_data, prediction_results, recommendations):
     """Store prediction results in MongoDB"""
     try:
@@ -224,8 +264,8 @@ def store_prediction_result(user_id, input_data, prediction_results, recommendat
             'created_at': datetime.utcnow()
         }
         
-        result = mental_health_collection.insert_one(document)
-        return str(result.inserted_id)
+        # Queued when write-behind is on
+        return str(write_behind.insert_document(mental_health_collection, document))
         
     except Exception as e:
         logger.error(f"Error storing prediction result: {e}")
@@ -233,14 +273,13 @@ def store_prediction_result(user_id, input_data, prediction_results, recommendat
 
 @app.before_request
 def check_connections():
-    """Check database and model connections before each request"""
-    if users_collection is None or mental_health_collection is None:
-        if not initialize_database():
-            return jsonify({'error': 'Database connection failed'}), 500
+    """Fail fast with 503 while the supervisor reports the database or models unavailable"""
+    if request.endpoint is None or request.endpoint in UNGATED_ENDPOINTS or request.method == 'OPTIONS':
+        return None
     
-    if not models_loaded:
-        if not load_models():
-            return jsonify({'error': 'Model loading failed. Please ensure models are in mental_health_models directory'}), 500
+    problem = supervisor.check(needs_models=request.endpoint in MODEL_ENDPOINTS)
+    if problem:
+        return jsonify({'error': problem}), 503, {'Retry-After': str(supervisor.retry_after())}
 
 @app.route('/')
 def home():
@@ -382,13 +421,7 @@ def get_user_history(user_id):
             {'_id': 0, 'user_id': 0}
         ).sort('timestamp', -1).limit(10))
         
-        # Convert datetime objects to ISO format
-        for record in history:
-            if 'timestamp' in record:
-                record['timestamp'] = record['timestamp'].isoformat()
-            if 'created_at' in record:
-                record['created_at'] = record['created_at'].isoformat()
-        
+        # Datetimes are written as ISO 8601 by the JSON provider
         return jsonify({
             'user_id': user_id,
             'history_count': len(history),
@@ -403,20 +436,22 @@ def get_user_history(user_id):
 def health_check():
     """Health check endpoint"""
     try:
-        db_status = 'Connected' if users_collection is not None else 'Disconnected'
+        # Database state as last probed by the supervisor (no query per health check)
+        db_status = 'Connected' if supervisor.database_up else 'Disconnected'
         models_status = 'Loaded' if models_loaded else 'Not Loaded'
         
-        # Test database connection
-        if users_collection is not None:
-            users_collection.find_one()
-        
         return jsonify({
             'status': 'Server is running',
             'port': 5002,
             'database': db_status,
             'models': models_status,
+            'supervisor': supervisor.status(),
             'timestamp': datetime.utcnow().isoformat(),
-            'features_count': len(X_features) if X_features else 0
+            'features_count': len(X_features) if X_features else 0,
+            'startup': startup_report.summary(),
+            'mongo_pool': mongo_pool.pool_stats(),
+            'profile_cache': profile_cache.stats(),
+            'write_behind': write_behind.write_behind_stats()
         }), 200
         
     except Exception as e:
@@ -427,15 +462,21 @@ def health_check():
         }), 200
 
 
+def format_history_record(record):
+    """A mental_health document as returned by /mentalhistory (no _id; datetimes are left to the JSON provider)"""
+    record.pop('_id', None)
+    return record
+
 @app.route('/mentalhistory', methods=['GET'])
 def get_mental_history():
     """Get mental health history for a user with filtering options"""
     try:
         # Get query parameters
         user_id = request.args.get('user_id')
-        limit = int(request.args.get('limit', 10))
+        limit = parse_limit(request.args.get('limit'))
         skip = int(request.args.get('skip', 0))
-        sort_direction = int(request.args.get('sort', -1))  
+        sort_direction = -1 if int(request.args.get('sort', -1)) < 0 else 1
+        cursor = request.args.get('cursor')
         from_date = request.args.get('from_date')
         to_date = request.args.get('to_date')
         
@@ -461,21 +502,24 @@ def get_mental_history():
             except ValueError:
                 return jsonify({'error': 'Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'}), 400
         
+        # Stream every matching record (or up to an explicit limit) as NDJSON when asked
+        if wants_stream(request):
+            rows = iter_rows(
+                mental_health_collection, query_filter, 'timestamp', sort_direction, cursor=cursor,
+                projection={'_id': 0, 'user_id': 0}, batch_size=HISTORY_STREAM_BATCH_SIZE,
+                limit=limit if request.args.get('limit') else None, skip=skip
+            )
+            return ndjson_response(rows, format_history_record)
+        
         # Get total count of records
         total_count = mental_health_collection.count_documents(query_filter)
         
-        # Get paginated results
-        history = list(mental_health_collection.find(
-            query_filter,
-            {'_id': 0, 'user_id': 0}
-        ).sort('timestamp', sort_direction).skip(skip).limit(limit))
-        
-        # Convert datetime objects to ISO format
-        for record in history:
-            if 'timestamp' in record:
-                record['timestamp'] = record['timestamp'].isoformat()
-            if 'created_at' in record:
-                record['created_at'] = record['created_at'].isoformat()
+        # Get paginated results, seeking past the cursor when given
+        history, next_cursor = fetch_page(
+            mental_health_collection, query_filter, 'timestamp', sort_direction, limit,
+            cursor=cursor, projection={'_id': 0, 'user_id': 0}, skip=skip
+        )
+        history = [format_history_record(record) for record in history]
         
         return jsonify({
             'user_id': user_id,
@@ -485,10 +529,13 @@ def get_mental_history():
                 'returned': len(history),
                 'limit': limit,
                 'skip': skip,
-                'sort_direction': sort_direction
+                'sort_direction': sort_direction,
+                'next_cursor': next_cursor
             }
         }), 200
         
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Mental history endpoint error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -510,17 +557,29 @@ if __name__ == '__main__':
     print("="*60)
     
     # Initialize database
-    if initialize_database():
+    with startup_report.phase('database'):
+        database_ready = initialize_database()
+    # Start the write-behind flusher (if enabled) on the main thread so SIGTERM flushes it
+    write_behind.get_write_queue()
+    if database_ready:
         print("✓ Database connection established")
     else:
         print("✗ Database connection failed - using mock data")
     
-    # Load models
-    if load_models():
-        print("✓ ML models loaded successfully")
-    else:
+    # Load models (deferred to first use / background warm-up with FAST_START=true)
+    if not model_loader.boot():
         print("✗ Model loading failed - please ensure models are in 'mental_health_models' directory")
         exit(1)
+    elif model_loader.loaded:
+        print("✓ ML models loaded successfully")
+    else:
+        print("✓ Fast start: ML models load on first use")
+    
+    # Reconnect / retry failed loads in the background from here on
+    supervisor.start()
+    
+    startup_report.ready()
+    startup_report.log()
     
     print(f"✓ Server starting on: http://localhost:5002")
     print(f"✓ Prediction endpoint: http://localhost:5002/predictmentalhealth")
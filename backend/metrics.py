@@ -0,0 +1,226 @@
+"""
+Prometheus-style latency histograms for the services.
+
+Two histograms, served on each app's GET /metrics in the text exposition
+format (0.0.4):
+
+- mentora_stage_duration_seconds{service, endpoint, stage}: time spent in one
+  internal stage of a request, so a regression can be pinned on the model, the
+  database or the Python around them. Stages:
+    validate    validate_prediction_data / validate_input_data
+    preprocess  building the feature vector (preprocess_input)
+    inference   model scoring (including any micro-batch wait)
+    tips        tip / recommendation generation
+    db_write    the MongoDB write (the enqueue when write-behind is on)
+- mentora_request_duration_seconds{service, endpoint, status}: before_request
+  to the response object; for streamed responses this excludes the body
+
+Stages are timed with the timed() decorator or the stage() context manager;
+the endpoint label is the Flask endpoint of the current request, or the one
+set with endpoint_label() outside Flask (e.g. stress_asgi.py), else 'none'.
+
+Observations never take a lock: each thread writes only to its own cells
+(bucket counts and the sum) and a scrape adds the threads' cells up. The lock
+is taken once per thread and label set, and by the scrape; cells of threads
+that have exited (werkzeug's per-request threads) are folded into a running
+total. A scrape racing an observation may see its bucket before its sum.
+
+The histograms are per process: in the gateway every mounted app's /metrics
+shows all services, and under prefork.py each worker reports only its own
+requests.
+
+METRICS_ENABLED=false turns timed() into a no-op and leaves /metrics out.
+METRICS_BUCKETS overrides the bucket upper bounds (seconds, comma-separated).
+"""
+
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, g, has_request_context, request
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# The Prometheus client defaults with finer steps below 5 ms, where most stages land
+METRICS_BUCKETS = tuple(sorted(
+    float(bound) for bound in
+    os.getenv('METRICS_BUCKETS', '0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10').split(',')
+))
+
+# Endpoint name of the route added by add_metrics_route
+METRICS_ENDPOINTS = {'metrics'}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Fold exited threads' cells after this many new registrations
+_SWEEP_EVERY = 256
+
+_endpoint = contextvars.ContextVar('metrics_endpoint', default='none')
+
+
+class Histogram:
+    """Cumulative histogram with per-thread cells, so observe() never takes a lock"""
+
+    def __init__(self, name, documentation, labelnames, buckets=METRICS_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # (thread, labels, cells) per thread and label set; cells are the
+        # bucket counts, the +Inf count and the sum
+        self._shards = []
+        # labels -> cells of threads that have exited
+        self._retired = {}
+        self._registered = 0
+
+    def observe(self, labels, value):
+        """Record one value (seconds) under a tuple of label values"""
+        try:
+            cells = self._local.cells[labels]
+        except AttributeError:
+            self._local.cells = {}
+            cells = self._register(labels)
+        except KeyError:
+            cells = self._register(labels)
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def _register(self, labels):
+        cells = [0] * (len(self.buckets) + 1) + [0.0]
+        self._local.cells[labels] = cells
+        with self._lock:
+            self._shards.append((threading.current_thread(), labels, cells))
+            self._registered += 1
+            if self._registered >= _SWEEP_EVERY:
+                self._sweep()
+        return cells
+
+    def _sweep(self):
+        # Called with the lock held
+        live = []
+        for thread, labels, cells in self._shards:
+            if thread.is_alive():
+                live.append((thread, labels, cells))
+            else:
+                _add_cells(self._retired.setdefault(labels, [0] * len(cells)), cells)
+        self._shards = live
+        self._registered = 0
+
+    def collect(self):
+        """{labels: cells} summed over all threads"""
+        with self._lock:
+            self._sweep()
+            totals = {labels: list(cells) for labels, cells in self._retired.items()}
+            for _, labels, cells in self._shards:
+                _add_cells(totals.setdefault(labels, [0] * len(cells)), cells)
+        return totals
+
+    def exposition(self):
+        """This histogram in the text exposition format"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, cells in sorted(self.collect().items()):
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), cells):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {repr(float(cells[-1]))}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _add_cells(total, cells):
+    for index, value in enumerate(cells):
+        total[index] += value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+STAGE_SECONDS = Histogram(
+    'mentora_stage_duration_seconds', 'Time spent in one stage of a request.', ('service', 'endpoint', 'stage')
+)
+REQUEST_SECONDS = Histogram(
+    'mentora_request_duration_seconds', 'Time from before_request to the response.', ('service', 'endpoint', 'status')
+)
+HISTOGRAMS = (STAGE_SECONDS, REQUEST_SECONDS)
+
+
+def current_endpoint():
+    """Endpoint label for the current request"""
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return _endpoint.get()
+
+
+@contextmanager
+def endpoint_label(endpoint):
+    """Label stages timed in this context (and contexts copied from it) with endpoint"""
+    token = _endpoint.set(endpoint)
+    try:
+        yield
+    finally:
+        _endpoint.reset(token)
+
+
+@contextmanager
+def stage(service, name):
+    """Time the body of a with block as one stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if METRICS_ENABLED:
+            STAGE_SECONDS.observe((service, current_endpoint(), name), time.perf_counter() - started)
+
+
+def timed(service, name):
+    """Decorator timing every call of a function as one stage"""
+    def decorator(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe((service, current_endpoint(), name), time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def exposition():
+    """All histograms in the text exposition format"""
+    return ''.join(histogram.exposition() for histogram in HISTOGRAMS)
+
+
+def add_metrics_route(app, service):
+    """GET /metrics, plus the request duration histogram for every request to app"""
+    if not METRICS_ENABLED:
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            REQUEST_SECONDS.observe(
+                (service, request.endpoint or 'unmatched', str(response.status_code)),
+                time.perf_counter() - started
+            )
+        return response
+
+    @app.route('/metrics', methods=['GET'], endpoint='metrics')
+    def metrics():
+        return Response(exposition(), content_type=CONTENT_TYPE)
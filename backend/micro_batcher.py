@@ -0,0 +1,184 @@
+"""
+Micro-batching inference scheduler.
+
+Request threads submit single preprocessed feature vectors; one inference thread
+collects them for up to a short window (or until a row limit is reached), runs a
+single predict over the stacked matrix and hands each row's result back through a
+Future. This amortises sklearn's per-call validation across concurrent requests.
+
+Waits are bounded: a request gives up after submit_timeout_ms when the queue
+stays full, or after result_timeout_ms when its batch hasn't come back (e.g. a
+hung predict), and predict() raises MicroBatcherBusyError so the caller can
+score the row itself instead of blocking its thread forever.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from fast_start import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcherBusyError(RuntimeError):
+    """The batcher couldn't take a row or return its prediction in time"""
+
+
+class MicroBatcher:
+    """Collects concurrent single-row predictions into batched predict calls"""
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0, max_queue_size=10000,
+                 submit_timeout_ms=100, result_timeout_ms=2000, name='micro-batcher'):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.submit_timeout = max(0.0, float(submit_timeout_ms)) / 1000.0
+        self.result_timeout = max(0.0, float(result_timeout_ms)) / 1000.0
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._running = False
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        # Counters for health endpoints
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.queue_full = 0
+        self.timeouts = 0
+
+    def start(self):
+        """Start the inference thread (again in a forked child)"""
+        with self._start_lock:
+            if self._running and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Inherited across fork(): the parent's thread (and anyone waiting on its queue) isn't here
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._running = True
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        logger.info(f"{self.name} started (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait * 1000:g})")
+
+    def stop(self, timeout=5.0):
+        """Stop the inference thread after draining queued rows"""
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        logger.info(f"{self.name} stopped")
+
+    @property
+    def running(self):
+        return self._running
+
+    def submit(self, feature_vector):
+        """
+        Queue one feature vector; returns a Future resolving to its prediction.
+        Raises MicroBatcherBusyError if the queue stays full for submit_timeout.
+        """
+        if not self._running:
+            raise RuntimeError(f"{self.name} is not running")
+        if self._pid != os.getpid():
+            self.start()
+        future = Future()
+        try:
+            self._queue.put((feature_vector, future), timeout=self.submit_timeout)
+        except queue.Full:
+            self.queue_full += 1
+            raise MicroBatcherBusyError(f"{self.name} queue is full") from None
+        return future
+
+    def predict(self, feature_vector, timeout=None):
+        """
+        Submit one feature vector and wait for its prediction, at most timeout
+        seconds (default result_timeout); raises MicroBatcherBusyError when
+        either wait runs out.
+        """
+        future = self.submit(feature_vector)
+        try:
+            return future.result(self.result_timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            # A cancelled row is skipped when its batch finally resolves
+            future.cancel()
+            self.timeouts += 1
+            raise MicroBatcherBusyError(f"{self.name} prediction timed out") from None
+
+    def _collect(self, first):
+        """Gather rows until the batch is full or the window closes"""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Stop sentinel: finish this batch, then exit
+                self._running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                if not self._running:
+                    break
+                continue
+            batch = self._collect(item)
+            self._execute(batch)
+            if not self._running and self._queue.empty():
+                break
+
+        # Fail anything that raced in after shutdown
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and not item[1].done():
+                item[1].set_exception(RuntimeError(f"{self.name} stopped"))
+
+    def _execute(self, batch):
+        """Run one predict over the stacked batch and resolve every future"""
+        futures = [future for _, future in batch]
+        try:
+            matrix = np.asarray([feature_vector for feature_vector, _ in batch], dtype=float)
+            predictions = self.predict_fn(matrix)
+            for future, prediction in zip(futures, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(batch)} failed: {e}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+
+        self.batches += 1
+        self.rows += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        """Batching counters for health endpoints"""
+        return {
+            'running': self._running,
+            'batches': self.batches,
+            'rows': self.rows,
+            'avg_batch_size': round(self.rows / self.batches, 2) if self.batches else 0,
+            'largest_batch': self.largest_batch,
+            'queued': self._queue.qsize(),
+            'queue_full': self.queue_full,
+            'timeouts': self.timeouts
+        }
@@ -1,86 +1,116 @@
+# Imported first so the startup report times every other import
+from fast_start import ModelLoader, StartupReport, lazy_import
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import joblib
-import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
 import logging
 import os
 import traceback
-from pymongo import MongoClient
 from bson import ObjectId
+import db_indexes
+import json_provider
+import metrics
+import mongo_pool
+import service_supervisor
+import write_behind
+from pagination import InvalidCursorError, fetch_page, iter_rows, parse_limit
+from streaming import HISTORY_STREAM_BATCH_SIZE, ndjson_response, wants_stream
 import json
 import re  # Added for date format validation
+from model_registry import registry
+from prediction_cache import PredictionCache
+
+# Numeric stack is only imported when the models load
+np = lazy_import('numpy')
+categorical_encoding = lazy_import('categorical_encoding')
+tree_compiler = lazy_import('tree_compiler')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000"])
+CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000"], expose_headers=["X-Next-Cursor"])
+json_provider.init_app(app)
+
+# Boot timeline (see fast_start.py)
+startup_report = StartupReport('mobile', families=('mobile',))
 
-# MongoDB connection - FIXED IMPLEMENTATION
+# MongoDB connection (shared, pooled client from mongo_pool)
+client = None
+db = None
 mobile_collection = None
-try:
-    client = MongoClient('mongodb://localhost:27017/', serverSelectionTimeoutMS=5000)
-    db = client['mentoradb']
-    mobile_collection = db['mobile_addiction'] 
-    client.server_info()  # Force connection check
-    logger.info("Connected to MongoDB successfully")
-except Exception as e:
-    logger.error(f"Failed to connect to MongoDB: {e}")
-    mobile_collection = None
+
+def initialize_database():
+    """Connect to MongoDB through the shared pool"""
+    global client, db, mobile_collection
+    
+    try:
+        client, db = mongo_pool.connect()
+        mobile_collection = db['mobile_addiction']
+        db_indexes.bootstrap_indexes(db, ['mobile_addiction'])
+        logger.info("Connected to MongoDB successfully")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to connect to MongoDB: {e}")
+        mobile_collection = None
+        return False
 
 # Global variables for model components
 model = None
 scaler = None
 label_encoder = None
+target_decoder = None
 feature_columns = None
 model_metadata = None
+model_version = None
+
+# Cache of model outputs keyed on the canonical feature vector and model version
+prediction_cache = PredictionCache(
+    max_size=int(os.getenv('MOBILE_PREDICTION_CACHE_SIZE', 4096)),
+    ttl_seconds=float(os.getenv('MOBILE_PREDICTION_CACHE_TTL', 3600))
+)
 
 def load_model_components():
     """Load all model components on startup"""
-    global model, scaler, label_encoder, feature_columns, model_metadata
+    global model, scaler, label_encoder, target_decoder, feature_columns, model_metadata, model_version
     
     try:
-        models_dir = 'mobile_models'
+        models_dir = registry.family_dir('mobile')
         
         # Check if models directory exists
-        if not os.path.exists(models_dir):
+        if not registry.exists('mobile'):
             logger.error(f"Models directory '{models_dir}' not found!")
             return False
         
         # Load model metadata
-        metadata_path = os.path.join(models_dir, 'model_metadata.joblib')
-        if os.path.exists(metadata_path):
-            model_metadata = joblib.load(metadata_path)
+        if registry.exists('mobile', 'model_metadata'):
+            model_metadata = registry.load('mobile', 'model_metadata')
             logger.info(f"Loaded model metadata: {model_metadata['best_model_name']}")
         else:
             logger.error("Model metadata not found!")
             return False
         
         # Load the trained model
-        model_path = os.path.join(models_dir, 'best_model.joblib')
-        if os.path.exists(model_path):
-            model = joblib.load(model_path)
+        if registry.exists('mobile', 'best_model'):
+            model = tree_compiler.compile_model(registry.load('mobile', 'best_model'))
             logger.info(f"Loaded model: {model_metadata['best_model_name']}")
         else:
             logger.error("Model file not found!")
             return False
         
         # Load label encoder
-        le_path = os.path.join(models_dir, 'label_encoder.joblib')
-        if os.path.exists(le_path):
-            label_encoder = joblib.load(le_path)
+        if registry.exists('mobile', 'label_encoder'):
+            label_encoder = registry.load('mobile', 'label_encoder')
+            target_decoder = categorical_encoding.compile_label_encoder(label_encoder, name='target')
             logger.info("Loaded label encoder")
         else:
             logger.error("Label encoder not found!")
             return False
         
         # Load feature columns
-        features_path = os.path.join(models_dir, 'feature_columns.joblib')
-        if os.path.exists(features_path):
-            feature_columns = joblib.load(features_path)
+        if registry.exists('mobile', 'feature_columns'):
+            feature_columns = registry.load('mobile', 'feature_columns')
             logger.info(f"Loaded feature columns: {len(feature_columns)} features")
         else:
             logger.error("Feature columns not found!")
@@ -88,9 +118,8 @@ def load_model_components():
         
         # Load scaler if required
         if model_metadata.get('requires_scaling', False):
-            scaler_path = os.path.join(models_dir, 'scaler.joblib')
-            if os.path.exists(scaler_path):
-                scaler = joblib.load(scaler_path)
+            if registry.exists('mobile', 'scaler'):
+                scaler = tree_compiler.compile_scaler(registry.load('mobile', 'scaler'))
                 logger.info("Loaded feature scaler")
             else:
                 logger.error("Scaler required but not found!")
@@ -98,6 +127,13 @@ def load_model_components():
         else:
             logger.info("Model doesn't require scaling")
         
+        # Version of everything that shapes a prediction, used in cache keys
+        model_version = '+'.join(
+            str(registry.current_version(f'mobile/{artifact}'))
+            for artifact in ('best_model', 'scaler', 'label_encoder', 'feature_columns')
+        )
+        prediction_cache.clear()
+        
         logger.info("All model components loaded successfully!")
         return True
         
@@ -106,6 +142,10 @@ def load_model_components():
         logger.error(traceback.format_exc())
         return False
 
+# Loads the model components at boot, or on first use with FAST_START=true
+model_loader = ModelLoader(load_model_components, startup_report, name='mobile models')
+
+@metrics.timed('mobile', 'validate')
 def validate_input_data(data):
     """Validate input data for mobile usage analysis"""
     errors = {}
@@ -142,6 +182,7 @@ def validate_input_data(data):
     
     return errors
 
+@metrics.timed('mobile', 'tips')
 def generate_personalized_tips(input_data, prediction):
     """Generate personalized tips based on user input and prediction"""
     tips = []
@@ -215,9 +256,55 @@ def generate_personalized_tips(input_data, prediction):
     
     return tips[:8]  # Return maximum 8 tips
 
+@metrics.timed('mobile', 'inference')
+def run_model(features):
+    """Scale, predict and decode one ordered feature vector; returns (prediction, confidence)"""
+    # Convert to numpy array and reshape for prediction
+    features_array = np.array(features).reshape(1, -1)
+    
+    # Apply scaling if required
+    if model_metadata.get('requires_scaling', False) and scaler is not None:
+        features_array = scaler.transform(features_array)
+    
+    # Make prediction
+    prediction_encoded = model.predict(features_array)[0]
+    
+    # Get prediction probabilities if available
+    prediction_proba = None
+    if hasattr(model, 'predict_proba'):
+        prediction_proba = model.predict_proba(features_array)[0]
+    
+    # Decode prediction
+    prediction = target_decoder.decode(prediction_encoded)
+    
+    # Calculate confidence
+    if prediction_proba is not None:
+        confidence_value = max(prediction_proba) * 100
+        confidence = f"{confidence_value:.1f}%"
+    else:
+        confidence = "N/A"
+    
+    return prediction, confidence
+
+def predict_with_cache(features):
+    """run_model behind the prediction cache"""
+    cache_key = prediction_cache.make_key(features, model_version)
+    cached = prediction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    result = run_model(features)
+    prediction_cache.put(cache_key, result)
+    return result
+
+def database_available():
+    """Whether MongoDB is connected and was up at the supervisor's last probe"""
+    return mobile_collection is not None and supervisor.database_up
+
+@metrics.timed('mobile', 'db_write')
 def save_to_mongodb(user_id, input_data, prediction_result):
     """Save prediction result to MongoDB"""
-    if mobile_collection is None:
+    if not database_available():
         logger.error("MongoDB collection not available")
         return False
     
@@ -231,9 +318,9 @@ def save_to_mongodb(user_id, input_data, prediction_result):
             'date': datetime.utcnow().strftime('%Y-%m-%d')  # Changed to UTC
         }
         
-        # Insert document
-        result = mobile_collection.insert_one(document)
-        logger.info(f"Saved prediction to MongoDB with ID: {result.inserted_id}")
+        # Insert document (queued when write-behind is on)
+        inserted_id = write_behind.insert_document(mobile_collection, document)
+        logger.info(f"Saved prediction to MongoDB with ID: {inserted_id}")
         return True
         
     except Exception as e:
@@ -243,7 +330,7 @@ def save_to_mongodb(user_id, input_data, prediction_result):
     
 def get_today_prediction_from_db(user_id):
     """Get today's prediction from MongoDB"""
-    if mobile_collection is None:
+    if not database_available():
         return None
     
     try:
@@ -267,11 +354,27 @@ def get_today_prediction_from_db(user_id):
         logger.error(f"Error retrieving from MongoDB: {str(e)}")
         return None
 
+# Background probe of the database / models (see service_supervisor.py)
+supervisor = service_supervisor.ServiceSupervisor(
+    'mobile', initialize_database, lambda: mobile_collection is not None, model_loader
+)
+service_supervisor.add_probe_routes(app, supervisor)
+metrics.add_metrics_route(app, 'mobile')
+
+# Endpoints that only read from MongoDB; analysis still works (unsaved) without it
+DATABASE_ENDPOINTS = {'get_today_prediction', 'get_user_history'}
+MODEL_ENDPOINTS = {'analyze_mobile_usage'}
+
 @app.before_request
 def check_model_loaded():
-    """Check if model is loaded before processing requests"""
-    if model is None or feature_columns is None or label_encoder is None:
-        return jsonify({'error': 'Model not loaded. Please check server logs.'}), 500
+    """Fail fast with 503 while the supervisor reports the models or database unavailable"""
+    if request.endpoint not in DATABASE_ENDPOINTS | MODEL_ENDPOINTS or request.method == 'OPTIONS':
+        return None
+    
+    problem = supervisor.check(needs_models=request.endpoint in MODEL_ENDPOINTS,
+                               needs_database=request.endpoint in DATABASE_ENDPOINTS)
+    if problem:
+        return jsonify({'error': problem}), 503, {'Retry-After': str(supervisor.retry_after())}
 
 @app.route('/')
 def home():
@@ -328,30 +431,8 @@ def analyze_mobile_usage():
                 else:
                     features.append(float(data[feature]))
             
-            # Convert to numpy array and reshape for prediction
-            features_array = np.array(features).reshape(1, -1)
-            
-            # Apply scaling if required
-            if model_metadata.get('requires_scaling', False) and scaler is not None:
-                features_array = scaler.transform(features_array)
-            
-            # Make prediction
-            prediction_encoded = model.predict(features_array)[0]
-            
-            # Get prediction probabilities if available
-            prediction_proba = None
-            if hasattr(model, 'predict_proba'):
-                prediction_proba = model.predict_proba(features_array)[0]
-            
-            # Decode prediction
-            prediction = label_encoder.inverse_transform([prediction_encoded])[0]
-            
-            # Calculate confidence
-            if prediction_proba is not None:
-                confidence_value = max(prediction_proba) * 100
-                confidence = f"{confidence_value:.1f}%"
-            else:
-                confidence = "N/A"
+            # Make prediction, reusing the model output for identical submissions
+            prediction, confidence = predict_with_cache(features)
             
             # Generate personalized tips
             personalized_tips = generate_personalized_tips(data, prediction)
@@ -422,12 +503,27 @@ def get_today_prediction():
         logger.error(f"Error retrieving today's prediction: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+HISTORY_PROJECTION = {'_id': 0, 'prediction_result': 1, 'input_data': 1, 'date': 1, 'created_at': 1}
+
+def format_history_entry(item):
+    """One /get_user_history row; created_at as an ISO string with 'Z' for UTC"""
+    return {
+        "created_at": item['created_at'].isoformat() + 'Z',
+        "date": item['date'],
+        "input_data": item['input_data'],
+        "prediction_result": item['prediction_result']
+    }
+
 @app.route('/get_user_history', methods=['GET'])
 def get_user_history():
     """Get user's prediction history with optional date filtering"""
     try:
         user_id = request.args.get('user_id')
-        limit = int(request.args.get('limit', 10))
+        try:
+            limit = parse_limit(request.args.get('limit'))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        cursor = request.args.get('cursor')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
@@ -453,26 +549,29 @@ def get_user_history():
         if mobile_collection is None:
             return jsonify({'error': 'Database not available'}), 500
         
-        # Get user's prediction history
-        history = list(mobile_collection.find(
-            query,
-            {'_id': 0, 'prediction_result': 1, 'input_data': 1, 'date': 1, 'created_at': 1}
-        ).sort('created_at', -1).limit(limit))
-        
-        # Convert created_at to ISO string with 'Z' for UTC
-        formatted_history = []
-        for item in history:
-            entry = {
-                "created_at": item['created_at'].isoformat() + 'Z',
-                "date": item['date'],
-                "input_data": item['input_data'],
-                "prediction_result": item['prediction_result']
-            }
-            formatted_history.append(entry)
+        # Stream the whole history (or up to an explicit limit) as NDJSON when asked
+        if wants_stream(request):
+            rows = iter_rows(
+                mobile_collection, query, 'created_at', -1, cursor=cursor, projection=HISTORY_PROJECTION,
+                batch_size=HISTORY_STREAM_BATCH_SIZE, limit=limit if request.args.get('limit') else None
+            )
+            return ndjson_response(rows, format_history_entry)
+        
+        # Get user's prediction history, seeking past the cursor when given
+        history, next_cursor = fetch_page(mobile_collection, query, 'created_at', -1, limit, cursor=cursor,
+                                          projection=HISTORY_PROJECTION)
+        formatted_history = [format_history_entry(item) for item in history]
         
         logger.info(f"Retrieved {len(formatted_history)} predictions for user: {user_id}")
-        return jsonify(formatted_history), 200
         
+        # The body stays a plain list for existing clients; the cursor travels in a header
+        response = jsonify(formatted_history)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
+        
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error retrieving user history: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -482,11 +581,11 @@ def health_check():
     """Health check endpoint"""
     try:
         model_status = 'Loaded' if model is not None else 'Not Loaded'
-        scaler_status = 'Loaded' if scaler is not None else ('Not Required' if not model_metadata.get('requires_scaling', False) else 'Not Loaded')
+        scaler_status = 'Loaded' if scaler is not None else ('Not Required' if model_metadata and not model_metadata.get('requires_scaling', False) else 'Not Loaded')
         
-        # Count today's predictions
+        # Count today's predictions (skipped while the supervisor reports MongoDB down)
         today_count = 0
-        if mobile_collection is not None:
+        if database_available():
             today = datetime.utcnow().strftime('%Y-%m-%d')  # Changed to UTC
             today_count = mobile_collection.count_documents({'date': today})
         
@@ -494,13 +593,19 @@ def health_check():
             'status': 'Server is running',
             'model_status': model_status,
             'scaler_status': scaler_status,
-            'mongodb_status': 'Connected' if mobile_collection is not None else 'Not Connected',
+            'mongodb_status': 'Connected' if database_available() else 'Not Connected',
+            'supervisor': supervisor.status(),
             'features_loaded': len(feature_columns) if feature_columns else 0,
             'model_info': {
                 'name': model_metadata.get('best_model_name', 'Unknown') if model_metadata else 'Unknown',
                 'accuracy': model_metadata.get('best_accuracy', 0) if model_metadata else 0
             },
             'active_predictions_today': today_count,
+            'model_version': model_version,
+            'prediction_cache': prediction_cache.stats(),
+            'startup': startup_report.summary(),
+            'mongo_pool': mongo_pool.pool_stats(),
+            'write_behind': write_behind.write_behind_stats(),
             'timestamp': datetime.utcnow().isoformat() + 'Z'  # Changed to UTC with 'Z'
         }), 200
     except Exception as e:
@@ -525,18 +630,33 @@ if __name__ == '__main__':
     print("MOBILE USAGE ANALYSIS API SERVER")
     print("="*60)
     
-    # Load model components
-    if load_model_components():
-        print("✓ All model components loaded successfully")
-        print(f"✓ Model: {model_metadata.get('best_model_name', 'Unknown')}")
-        print(f"✓ Accuracy: {model_metadata.get('best_accuracy', 0):.4f}")
-        print(f"✓ Features: {len(feature_columns)}")
-        print(f"✓ Scaling Required: {model_metadata.get('requires_scaling', False)}")
+    # Initialize database connection
+    with startup_report.phase('database'):
+        initialize_database()
+    # Start the write-behind flusher (if enabled) on the main thread so SIGTERM flushes it
+    write_behind.get_write_queue()
+    
+    # Load model components (deferred to first use / background warm-up with FAST_START=true)
+    if model_loader.boot():
+        if model_loader.loaded:
+            print("✓ All model components loaded successfully")
+            print(f"✓ Model: {model_metadata.get('best_model_name', 'Unknown')}")
+            print(f"✓ Accuracy: {model_metadata.get('best_accuracy', 0):.4f}")
+            print(f"✓ Features: {len(feature_columns)}")
+            print(f"✓ Scaling Required: {model_metadata.get('requires_scaling', False)}")
+        else:
+            print("✓ Fast start: model components load on first use")
         print(f"✓ MongoDB: {'Connected' if mobile_collection is not None else 'Not Connected'}")
         print(f"✓ Server will run on: http://localhost:5003")
         print(f"✓ Server will run on: http://127.0.0.1:5003")
         print("="*60)
         
+        # Reconnect / retry failed loads in the background from here on
+        supervisor.start()
+        
+        startup_report.ready()
+        startup_report.log()
+        
         # Run the Flask app
         app.run(
             debug=False,
@@ -0,0 +1,373 @@
+"""
+Single-file model bundles.
+
+A bundle packs every artifact of one model family (e.g. students_models/) into one
+file:
+
+    MAGIC (8 bytes) | format version (uint32) | manifest length (uint64) | manifest JSON
+    | padding | 64-byte aligned data sections
+
+The manifest is plain JSON: bundle version, content hash and one entry per artifact
+with its kind, section offset/length and SHA-256. Metadata, feature lists and label
+encoders are stored as plain JSON; tree ensembles and scalers are stored as their
+compiled NumPy arrays (see tree_compiler) and are memory-mapped straight out of the
+file. Anything else falls back to a pickle section.
+
+Loading a bundle only parses the manifest; objects are built lazily on first use.
+verify() checks every hash without unpickling anything.
+
+Usage:
+    python model_bundle.py convert [family ...]
+    python model_bundle.py verify <bundle> [...]
+    python model_bundle.py inspect <bundle>
+"""
+
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import sys
+import threading
+from datetime import datetime, timezone
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_MAGIC = b'MNTRBNDL'
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_SUFFIX = '.bundle'
+SECTION_ALIGNMENT = 64
+
+_HEADER = struct.Struct('<8sIQ')
+
+
+class BundleError(Exception):
+    """Raised for malformed, corrupt or unsupported bundles"""
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _to_plain(value):
+    """JSON-safe form of metadata; dicts with non-string keys keep their key types"""
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: _to_plain(item) for key, item in value.items()}
+        return {'__items__': [[_to_plain(key), _to_plain(item)] for key, item in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [_to_plain(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _from_plain(value):
+    if isinstance(value, dict):
+        if set(value) == {'__items__'}:
+            return {_from_plain(key): _from_plain(item) for key, item in value['__items__']}
+        return {key: _from_plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_from_plain(item) for item in value]
+    return value
+
+
+def _plain_roundtrips(value):
+    """True when metadata survives the JSON encoding unchanged"""
+    try:
+        return _from_plain(json.loads(json.dumps(_to_plain(value)))) == value
+    except (TypeError, ValueError):
+        return False
+
+
+class BundleWriter:
+    """Accumulates entries and writes them as one bundle file"""
+
+    def __init__(self, family):
+        self.family = family
+        self.entries = {}
+        self._sections = []
+        self._size = 0
+
+    def _add_section(self, data):
+        """Queue a data section; returns its offset relative to the data start"""
+        padding = -self._size % SECTION_ALIGNMENT
+        if padding:
+            self._sections.append(b'\0' * padding)
+            self._size += padding
+        offset = self._size
+        self._sections.append(data)
+        self._size += len(data)
+        return {'offset': offset, 'length': len(data), 'sha256': _sha256(data)}
+
+    def _add_array(self, array):
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            # Object arrays (e.g. string classes) are stored as JSON lists
+            return {'kind': 'list', 'values': _to_plain(array.tolist())}
+        section = self._add_section(array.tobytes())
+        section.update({'kind': 'ndarray', 'dtype': array.dtype.str, 'shape': list(array.shape)})
+        return section
+
+    def add(self, name, obj, source_version=None):
+        """Add one artifact, choosing the most direct storage for its type"""
+        from sklearn.preprocessing import LabelEncoder, StandardScaler
+        from tree_compiler import CompiledStandardScaler, CompiledTreeModel, compile_model
+
+        entry = {'source_version': source_version}
+
+        compiled = compile_model(obj) if hasattr(obj, 'predict') else obj
+        if isinstance(compiled, CompiledTreeModel):
+            meta, arrays = compiled.to_arrays()
+            entry.update({'kind': 'tree_model', 'meta': meta,
+                          'arrays': {key: self._add_array(array) for key, array in arrays.items()}})
+        elif isinstance(obj, (StandardScaler, CompiledStandardScaler)):
+            scaler = obj if isinstance(obj, CompiledStandardScaler) else CompiledStandardScaler(obj)
+            entry.update({'kind': 'standard_scaler',
+                          'arrays': {key: self._add_array(array) for key, array in scaler.to_arrays().items()}})
+        elif isinstance(obj, LabelEncoder):
+            entry.update({'kind': 'label_encoder', 'classes': _to_plain(obj.classes_.tolist())})
+        elif isinstance(obj, dict) and obj and all(isinstance(value, LabelEncoder) for value in obj.values()):
+            entry.update({'kind': 'label_encoders',
+                          'classes': {key: _to_plain(value.classes_.tolist()) for key, value in obj.items()}})
+        elif isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+            entry.update({'kind': 'array', 'array': self._add_array(obj)})
+        elif _plain_roundtrips(obj):
+            entry.update({'kind': 'json', 'value': _to_plain(obj)})
+        else:
+            buffer = io.BytesIO()
+            pickle.dump(obj, buffer, protocol=pickle.HIGHEST_PROTOCOL)
+            entry.update({'kind': 'pickle', 'section': self._add_section(buffer.getvalue())})
+
+        self.entries[name] = entry
+        return entry['kind']
+
+    def write(self, path, bundle_version=None):
+        """Write the bundle atomically; returns its manifest"""
+        data = b''.join(self._sections)
+        content_hash = _sha256(data)
+        manifest = {
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'family': self.family,
+            'bundle_version': bundle_version or content_hash[:12],
+            'content_hash': content_hash,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'entries': self.entries
+        }
+        manifest_bytes = json.dumps(manifest, sort_keys=True).encode('utf-8')
+        # Manifest hash covers everything except itself
+        manifest_hash = _sha256(manifest_bytes)
+
+        header_length = _HEADER.size + len(manifest_bytes) + 64
+        data_start = header_length + (-header_length % SECTION_ALIGNMENT)
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, len(manifest_bytes)))
+            f.write(manifest_bytes)
+            f.write(manifest_hash.encode('ascii'))
+            f.write(b'\0' * (data_start - header_length))
+            f.write(data)
+        os.replace(tmp_path, path)
+        return manifest
+
+
+class ModelBundle:
+    """Memory-mapped bundle whose entries are built lazily on first use"""
+
+    def __init__(self, path, allow_pickle=True):
+        self.path = path
+        self.allow_pickle = allow_pickle
+        self._lock = threading.Lock()
+        self._objects = {}
+
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < _HEADER.size:
+            raise BundleError(f"{path} is too short to be a bundle")
+        magic, format_version, manifest_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != BUNDLE_MAGIC:
+            raise BundleError(f"{path} is not a model bundle")
+        if format_version > BUNDLE_FORMAT_VERSION:
+            raise BundleError(f"{path} uses bundle format {format_version}, newer than supported {BUNDLE_FORMAT_VERSION}")
+
+        manifest_end = _HEADER.size + manifest_length
+        self._manifest_bytes = bytes(self._mmap[_HEADER.size:manifest_end])
+        self._manifest_hash = bytes(self._mmap[manifest_end:manifest_end + 64]).decode('ascii')
+        header_length = manifest_end + 64
+        self._data_start = header_length + (-header_length % SECTION_ALIGNMENT)
+
+        self.manifest = json.loads(self._manifest_bytes.decode('utf-8'))
+        self.family = self.manifest['family']
+        self.version = self.manifest['bundle_version']
+        self.content_hash = self.manifest['content_hash']
+        self.entries = self.manifest['entries']
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def names(self):
+        return list(self.entries)
+
+    def entry_version(self, name):
+        """Version of one artifact: its source file version, else the bundle version"""
+        return self.entries[name].get('source_version') or self.version
+
+    def _section(self, section):
+        start = self._data_start + section['offset']
+        return memoryview(self._mmap)[start:start + section['length']]
+
+    def _array(self, description):
+        if description['kind'] == 'list':
+            return np.array(_from_plain(description['values']), dtype=object)
+        start = self._data_start + description['offset']
+        dtype = np.dtype(description['dtype'])
+        count = int(np.prod(description['shape'])) if description['shape'] else 1
+        # Read-only view into the mapped file, shared through the page cache
+        return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=start).reshape(description['shape'])
+
+    def _build(self, name):
+        entry = self.entries[name]
+        kind = entry['kind']
+
+        if kind == 'json':
+            return _from_plain(entry['value'])
+        if kind == 'array':
+            return self._array(entry['array'])
+        if kind == 'tree_model':
+            from tree_compiler import CompiledTreeModel
+            arrays = {key: self._array(description) for key, description in entry['arrays'].items()}
+            return CompiledTreeModel.from_arrays(entry['meta'], arrays)
+        if kind == 'standard_scaler':
+            from tree_compiler import CompiledStandardScaler
+            return CompiledStandardScaler.from_arrays(
+                {key: self._array(description) for key, description in entry['arrays'].items()}
+            )
+        if kind in ('label_encoder', 'label_encoders'):
+            from sklearn.preprocessing import LabelEncoder
+
+            def build_encoder(classes):
+                encoder = LabelEncoder()
+                encoder.classes_ = np.array(_from_plain(classes), dtype=object)
+                return encoder
+
+            if kind == 'label_encoder':
+                return build_encoder(entry['classes'])
+            return {key: build_encoder(classes) for key, classes in entry['classes'].items()}
+        if kind == 'pickle':
+            if not self.allow_pickle:
+                raise BundleError(f"Entry '{name}' is pickled and pickle loading is disabled")
+            return pickle.loads(self._section(entry['section']))
+
+        raise BundleError(f"Entry '{name}' has unknown kind '{kind}'")
+
+    def get(self, name):
+        """Build (once) and return an artifact"""
+        with self._lock:
+            if name not in self._objects:
+                if name not in self.entries:
+                    raise KeyError(f"'{name}' is not in bundle {self.path}")
+                self._objects[name] = self._build(name)
+            return self._objects[name]
+
+    def verify(self):
+        """Check the manifest, content and per-section hashes; never unpickles. Returns a list of problems."""
+        problems = []
+        if _sha256(self._manifest_bytes) != self._manifest_hash:
+            problems.append('manifest hash mismatch')
+        if _sha256(self._mmap[self._data_start:]) != self.content_hash:
+            problems.append('content hash mismatch')
+
+        for name, entry in self.entries.items():
+            sections = []
+            if 'section' in entry:
+                sections.append(entry['section'])
+            if 'array' in entry:
+                sections.append(entry['array'])
+            sections.extend((entry.get('arrays') or {}).values())
+            for section in sections:
+                if 'sha256' in section and _sha256(self._section(section)) != section['sha256']:
+                    problems.append(f"section hash mismatch in '{name}'")
+        return problems
+
+    def info(self):
+        return {
+            'path': self.path,
+            'family': self.family,
+            'version': self.version,
+            'format_version': self.manifest['format_version'],
+            'content_hash': self.content_hash,
+            'created_at': self.manifest.get('created_at'),
+            'entries': {name: entry['kind'] for name, entry in self.entries.items()}
+        }
+
+
+def load_bundle(path, verify=False, allow_pickle=True):
+    """Open a bundle, optionally verifying every hash first"""
+    bundle = ModelBundle(path, allow_pickle=allow_pickle)
+    if verify:
+        problems = bundle.verify()
+        if problems:
+            raise BundleError(f"Bundle {path} failed verification: {', '.join(problems)}")
+    return bundle
+
+
+def convert_family(family, registry=None, output_path=None, bundle_version=None):
+    """Convert a model family directory of joblib files into one bundle"""
+    import joblib
+    from model_registry import file_version, get_registry
+
+    registry = registry or get_registry()
+    family_dir = registry.family_dir(family)
+    if not os.path.isdir(family_dir):
+        raise FileNotFoundError(f"Model directory '{family_dir}' not found")
+
+    writer = BundleWriter(family)
+    for filename in sorted(os.listdir(family_dir)):
+        if not filename.endswith('.joblib'):
+            continue
+        path = os.path.join(family_dir, filename)
+        kind = writer.add(filename[:-len('.joblib')], joblib.load(path), source_version=file_version(path))
+        logger.info(f"Added {family}/{filename} as {kind}")
+
+    output_path = output_path or f'{family_dir}{BUNDLE_SUFFIX}'
+    manifest = writer.write(output_path, bundle_version=bundle_version)
+    logger.info(f"Wrote {output_path} (version {manifest['bundle_version']}, {len(manifest['entries'])} entries)")
+    return output_path, manifest
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    command, arguments = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ('', [])
+
+    if command == 'convert':
+        from model_registry import MODEL_FAMILIES
+        for family in arguments or list(MODEL_FAMILIES):
+            try:
+                output_path, manifest = convert_family(family)
+                print(f"✓ {family}: {output_path} (version {manifest['bundle_version']})")
+            except FileNotFoundError as e:
+                print(f"✗ {family}: {e}")
+
+    elif command == 'verify' and arguments:
+        failed = False
+        for path in arguments:
+            problems = ModelBundle(path).verify()
+            if problems:
+                failed = True
+                print(f"✗ {path}: {', '.join(problems)}")
+            else:
+                print(f"✓ {path}: OK")
+        sys.exit(1 if failed else 0)
+
+    elif command == 'inspect' and arguments:
+        print(json.dumps(ModelBundle(arguments[0]).info(), indent=2))
+
+    else:
+        print(__doc__)
+        sys.exit(2)
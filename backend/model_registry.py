@@ -0,0 +1,258 @@
+"""
+Shared model registry.
+
+Loads the joblib artifacts of every model family (students_models/, stress_models/,
+mobile_models/, mental_health_models/) once per process and keys them by name and
+version. Artifacts are loaded with mmap_mode wherever joblib supports it, so the
+NumPy arrays inside them are backed by the page cache and shared read-only by all
+worker processes on a box instead of being copied into each one. Loading the
+registry in a parent process before forking workers shares the rest copy-on-write.
+
+When a family has a <family_dir>.bundle file (see model_bundle.py) its artifacts
+are served from the bundle instead of the individual joblib files.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from fast_start import lazy_import
+
+# joblib (and numpy under it) is only imported when an artifact is first loaded
+joblib = lazy_import('joblib')
+
+logger = logging.getLogger(__name__)
+
+# Model family -> artifact directory, relative to MODEL_DIR
+MODEL_FAMILIES = {
+    'students': 'students_models',
+    'stress': 'stress_models',
+    'mobile': 'mobile_models',
+    'mental_health': 'mental_health_models'
+}
+
+# Artifacts live next to the services by default
+MODEL_DIR = os.getenv('MODEL_DIR', os.path.dirname(os.path.abspath(__file__)))
+
+# 'r' maps arrays read-only; set MODEL_MMAP_MODE=none to load everything into private memory
+MODEL_MMAP_MODE = os.getenv('MODEL_MMAP_MODE', 'r')
+
+# Serve artifacts from <family_dir>.bundle files when present (see model_bundle.py)
+MODEL_BUNDLES_ENABLED = os.getenv('MODEL_BUNDLES', 'true').lower() in ('1', 'true', 'yes')
+MODEL_BUNDLE_VERIFY = os.getenv('MODEL_BUNDLE_VERIFY', 'false').lower() in ('1', 'true', 'yes')
+
+
+class ModelNotFoundError(KeyError):
+    """Raised when a model name/version is not registered"""
+
+
+def file_version(path):
+    """Content-derived version for an artifact: first 12 hex chars of its SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """Process-wide cache of model artifacts keyed by (name, version)"""
+
+    def __init__(self, base_dir=MODEL_DIR, mmap_mode=MODEL_MMAP_MODE, use_bundles=MODEL_BUNDLES_ENABLED):
+        self.base_dir = base_dir
+        self.mmap_mode = None if str(mmap_mode).lower() in ('', 'none', 'off') else mmap_mode
+        self.use_bundles = use_bundles
+        self._lock = threading.RLock()
+        self._entries = {}   # (name, version) -> entry dict
+        self._current = {}   # name -> version served by get(name)
+        self._bundles = {}   # family -> ModelBundle or None
+
+    def family_dir(self, family):
+        """Absolute artifact directory for a model family"""
+        return os.path.join(self.base_dir, MODEL_FAMILIES.get(family, family))
+
+    def artifact_path(self, family, artifact):
+        """Absolute path of an artifact file within a family"""
+        return os.path.join(self.family_dir(family), f'{artifact}.joblib')
+
+    def exists(self, family, artifact=None):
+        """Whether a family (or one of its artifacts) is available from a bundle or a joblib file"""
+        bundle = self.bundle(family)
+        if artifact is None:
+            return bundle is not None or os.path.isdir(self.family_dir(family))
+        return (bundle is not None and artifact in bundle) or os.path.exists(self.artifact_path(family, artifact))
+
+    def _bundle_is_stale(self, family, path):
+        """True when a joblib artifact was written after the bundle was built"""
+        family_dir = self.family_dir(family)
+        if not os.path.isdir(family_dir):
+            return False
+        bundle_mtime = os.path.getmtime(path)
+        return any(
+            os.path.getmtime(os.path.join(family_dir, filename)) > bundle_mtime
+            for filename in os.listdir(family_dir) if filename.endswith('.joblib')
+        )
+
+    def bundle(self, family):
+        """The family's bundle file, opened once (manifest only), or None"""
+        with self._lock:
+            if family not in self._bundles:
+                self._bundles[family] = None
+                path = f'{self.family_dir(family)}.bundle'
+                if self.use_bundles and os.path.exists(path):
+                    if self._bundle_is_stale(family, path):
+                        logger.warning(f"Ignoring model bundle {path}: joblib artifacts are newer, re-run model_bundle.py convert")
+                        return None
+                    from model_bundle import load_bundle
+                    try:
+                        self._bundles[family] = load_bundle(path, verify=MODEL_BUNDLE_VERIFY)
+                        logger.info(f"Using model bundle {path} (version {self._bundles[family].version})")
+                    except Exception as e:
+                        logger.error(f"Ignoring model bundle {path}: {e}")
+            return self._bundles[family]
+
+    def register(self, name, path, version=None, mmap=True, bundle=None, artifact=None):
+        """Register an artifact file under a name; the newest registration becomes current"""
+        with self._lock:
+            version = version or file_version(path)
+            key = (name, version)
+            if key not in self._entries:
+                self._entries[key] = {
+                    'name': name,
+                    'version': version,
+                    'path': path,
+                    'mmap': mmap,
+                    'bundle': bundle,
+                    'artifact': artifact,
+                    'object': None,
+                    'loaded': False,
+                    'mmapped': False,
+                    'load_seconds': None
+                }
+            self._current[name] = version
+            return version
+
+    def register_bundle_artifact(self, family, artifact):
+        """Register one artifact served from the family bundle; returns its version or None"""
+        bundle = self.bundle(family)
+        if bundle is None or artifact not in bundle:
+            return None
+        return self.register(f'{family}/{artifact}', bundle.path, version=bundle.entry_version(artifact),
+                             bundle=bundle, artifact=artifact)
+
+    def register_family(self, family):
+        """Register every artifact of a model family (its bundle, else its .joblib files) as '<family>/<artifact>'"""
+        bundle = self.bundle(family)
+        if bundle is not None:
+            return {f'{family}/{artifact}': self.register_bundle_artifact(family, artifact)
+                    for artifact in bundle.names()}
+
+        family_dir = self.family_dir(family)
+        if not os.path.isdir(family_dir):
+            raise FileNotFoundError(f"Model directory '{family_dir}' not found")
+
+        versions = {}
+        for filename in sorted(os.listdir(family_dir)):
+            if filename.endswith('.joblib'):
+                artifact = filename[:-len('.joblib')]
+                name = f'{family}/{artifact}'
+                versions[name] = self.register(name, os.path.join(family_dir, filename))
+        return versions
+
+    def _load_entry(self, entry):
+        """Load an entry's object, memory-mapping its arrays when possible"""
+        started = time.perf_counter()
+        obj = None
+        if entry['bundle'] is not None:
+            # Bundle arrays are always views into the mapped file
+            obj = entry['bundle'].get(entry['artifact'])
+            entry['mmapped'] = True
+        elif entry['mmap'] and self.mmap_mode:
+            try:
+                obj = joblib.load(entry['path'], mmap_mode=self.mmap_mode)
+                entry['mmapped'] = True
+            except Exception as e:
+                logger.warning(f"Memory-mapped load of {entry['name']} failed, loading normally: {e}")
+        if obj is None:
+            obj = joblib.load(entry['path'])
+            entry['mmapped'] = False
+
+        entry['object'] = obj
+        entry['loaded'] = True
+        entry['load_seconds'] = time.perf_counter() - started
+        logger.info(f"Loaded model {entry['name']}@{entry['version']} in {entry['load_seconds'] * 1000:.1f} ms")
+        return obj
+
+    def get(self, name, version=None):
+        """Return a loaded artifact, loading it on first use"""
+        with self._lock:
+            version = version or self._current.get(name)
+            entry = self._entries.get((name, version))
+            if entry is None:
+                raise ModelNotFoundError(f"Model '{name}' (version {version}) is not registered")
+            if not entry['loaded']:
+                self._load_entry(entry)
+            return entry['object']
+
+    def load(self, family, artifact, version=None):
+        """Return a family artifact, registering its file on first use"""
+        name = f'{family}/{artifact}'
+        with self._lock:
+            if version is None and name not in self._current:
+                if self.register_bundle_artifact(family, artifact) is None:
+                    path = self.artifact_path(family, artifact)
+                    if not os.path.exists(path):
+                        raise FileNotFoundError(f"Model file '{path}' not found")
+                    self.register(name, path)
+            return self.get(name, version)
+
+    def current_version(self, name):
+        """Version currently served for a name"""
+        return self._current.get(name)
+
+    def versions(self, name):
+        """All registered versions of a name"""
+        return [version for (entry_name, version) in self._entries if entry_name == name]
+
+    def preload(self, families=None):
+        """Register and load whole families up front, e.g. in a parent process before forking"""
+        for family in families or MODEL_FAMILIES:
+            try:
+                for name in self.register_family(family):
+                    self.get(name)
+            except FileNotFoundError as e:
+                logger.warning(f"Skipping model family '{family}': {e}")
+
+    def unload(self, name, version=None):
+        """Drop a loaded artifact so the next get reloads it"""
+        with self._lock:
+            entry = self._entries.get((name, version or self._current.get(name)))
+            if entry is not None:
+                entry['object'] = None
+                entry['loaded'] = False
+
+    def info(self):
+        """Summary of registered artifacts for health endpoints"""
+        with self._lock:
+            return [
+                {
+                    'name': entry['name'],
+                    'version': entry['version'],
+                    'source': 'bundle' if entry['bundle'] is not None else 'joblib',
+                    'current': self._current.get(entry['name']) == entry['version'],
+                    'loaded': entry['loaded'],
+                    'mmapped': entry['mmapped'],
+                    'load_ms': round(entry['load_seconds'] * 1000, 2) if entry['load_seconds'] is not None else None
+                }
+                for entry in self._entries.values()
+            ]
+
+
+# One registry per process, shared by every service module imported into it
+registry = ModelRegistry()
+
+
+def get_registry():
+    """Return the process-wide model registry"""
+    return registry
@@ -0,0 +1,208 @@
+"""
+Shared MongoDB connection pool.
+
+Every service gets its client from here, so a process holds exactly one
+MongoClient (and one connection pool per server) no matter how many services
+it runs. Pool sizing and timeouts come from the environment:
+
+    MONGO_URI, DB_NAME
+    MONGO_MAX_POOL_SIZE             connections per server (default 100)
+    MONGO_MIN_POOL_SIZE             kept open even when idle (default 0)
+    MONGO_MAX_IDLE_TIME_MS          idle connections are closed after this (default 60000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS     max wait for a free connection (default 2000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS  (default 5000)
+    MONGO_CONNECT_TIMEOUT_MS        (default 5000)
+
+Pool activity is tracked through pymongo's CMAP event listeners and exposed by
+pool_stats() for health endpoints: open / in-use connections, checkout waits
+and checkout failures (e.g. wait-queue timeouts when the pool is exhausted).
+
+Settings are read when this module is first imported, which happens before the
+services call load_dotenv(), so .env is loaded here first.
+
+MONGO_URI=memory:// swaps in the in-process stand-in from memory_mongo.py
+(no server, nothing persisted), e.g. for load tests.
+"""
+
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from pymongo import MongoClient, monitoring
+from memory_mongo import MemoryClient, is_memory_uri
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+DB_NAME = os.getenv('DB_NAME', 'mentoradb')
+
+POOL_OPTIONS = {
+    'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', 100)),
+    'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+    'maxIdleTimeMS': int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 60000)),
+    'waitQueueTimeoutMS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000)),
+    'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+    'connectTimeoutMS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000))
+}
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts CMAP events; checkout waits are timed on the requesting thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.pools_created = 0
+            self.pools_cleared = 0
+            self.connections_created = 0
+            self.connections_closed = 0
+            self.closed_reasons = {}
+            self.checkouts_started = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.checkout_failures = {}
+            self.in_use = 0
+            self.peak_in_use = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    # Pool lifecycle
+    def pool_created(self, event):
+        with self._lock:
+            self.pools_created += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    # Connection lifecycle
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+            self.closed_reasons[event.reason] = self.closed_reasons.get(event.reason, 0) + 1
+
+    # Checkouts
+    def connection_check_out_started(self, event):
+        self._waits.started = time.perf_counter()
+        with self._lock:
+            self.checkouts_started += 1
+
+    def _waited(self):
+        started = getattr(self._waits, 'started', None)
+        self._waits.started = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_check_out_failed(self, event):
+        self._waited()
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        waited = self._waited()
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(0, self.in_use - 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'open_connections': self.connections_created - self.connections_closed,
+                'in_use': self.in_use,
+                'peak_in_use': self.peak_in_use,
+                'connections_created': self.connections_created,
+                'connections_closed': self.connections_closed,
+                'closed_reasons': dict(self.closed_reasons),
+                'checkouts': self.checkouts,
+                'checkout_failures': dict(self.checkout_failures),
+                'avg_checkout_wait_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_checkout_wait_ms': round(self.wait_max * 1000, 3),
+                'pools_created': self.pools_created,
+                'pools_cleared': self.pools_cleared
+            }
+
+
+pool_listener = PoolStatsListener()
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide MongoClient, created on first use (and again after a fork)"""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None and is_memory_uri(MONGO_URI):
+            # Process-local data; a forked child keeps its copy
+            _client = MemoryClient(MONGO_URI)
+            _client_pid = os.getpid()
+            logger.info("Using the in-memory MongoDB stand-in")
+        elif _client is None or (_client_pid != os.getpid() and not isinstance(_client, MemoryClient)):
+            if _client is not None:
+                # A client inherited across fork() must not be reused by the child
+                pool_listener.reset()
+            _client = MongoClient(MONGO_URI, event_listeners=[pool_listener], **POOL_OPTIONS)
+            _client_pid = os.getpid()
+            logger.info(f"Created MongoDB client for {MONGO_URI} "
+                        f"(maxPoolSize={POOL_OPTIONS['maxPoolSize']}, minPoolSize={POOL_OPTIONS['minPoolSize']})")
+        return _client
+
+
+def get_database(name=None):
+    """A database handle on the shared client"""
+    return get_client()[name or DB_NAME]
+
+
+def connect(ping=True):
+    """Shared client and default database; pings first so callers fail fast when MongoDB is down"""
+    client = get_client()
+    if ping:
+        client.admin.command('ping')
+    return client, client[DB_NAME]
+
+
+def close_client():
+    """Close the shared client, e.g. at shutdown"""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+            _client_pid = None
+
+
+def pool_stats():
+    """Pool configuration and CMAP counters for health endpoints"""
+    return {
+        'options': dict(POOL_OPTIONS),
+        'client_created': _client is not None,
+        **pool_listener.stats()
+    }
@@ -0,0 +1,158 @@
+"""
+Keyset (cursor-based) pagination for history endpoints.
+
+Pages are sorted on (sort_field, _id) and each page ends with an opaque
+next_cursor encoding those two values for its last row. The next page asks for
+rows strictly after that key, which an index on (user_id, sort_field, _id) can
+seek to directly, so page N costs the same as page 1 (unlike skip, which walks
+and discards every earlier row).
+
+A cursor also carries a fingerprint of the filters and sort it was issued for;
+reusing it with different filters raises InvalidCursorError instead of
+silently returning the wrong page.
+"""
+
+import base64
+import hashlib
+import json
+from datetime import datetime
+from bson import ObjectId
+
+DEFAULT_PAGE_LIMIT = 10
+MAX_PAGE_LIMIT = 500
+
+
+class InvalidCursorError(ValueError):
+    """Raised for malformed cursors or cursors issued for a different query"""
+
+
+def _fingerprint(query_filter, sort_field, direction):
+    canonical = json.dumps([query_filter, sort_field, direction], sort_keys=True, default=str)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=6).hexdigest()
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return {'v': value}
+
+
+def _decode_value(value):
+    if 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value['v']
+
+
+def encode_cursor(doc, query_filter, sort_field, direction):
+    """Opaque continuation token for the row after doc"""
+    payload = {
+        'k': _encode_value(doc.get(sort_field)),
+        'id': str(doc['_id']),
+        'q': _fingerprint(query_filter, sort_field, direction)
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, query_filter, sort_field, direction):
+    """(sort value, _id) a cursor points after; raises InvalidCursorError"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        sort_value = _decode_value(payload['k'])
+        last_id = payload['id']
+        fingerprint = payload['q']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursorError('Malformed cursor')
+
+    if fingerprint != _fingerprint(query_filter, sort_field, direction):
+        raise InvalidCursorError('Cursor does not match the current filters or sort order')
+    if ObjectId.is_valid(last_id):
+        last_id = ObjectId(last_id)
+    return sort_value, last_id
+
+
+def after_cursor(query_filter, sort_value, last_id, sort_field, direction):
+    """query_filter restricted to rows strictly after (sort_value, last_id) in sort order"""
+    operator = '$lt' if direction < 0 else '$gt'
+    seek = {'$or': [
+        {sort_field: {operator: sort_value}},
+        {sort_field: sort_value, '_id': {operator: last_id}}
+    ]}
+    return {'$and': [query_filter, seek]} if query_filter else seek
+
+
+def parse_limit(value, default=DEFAULT_PAGE_LIMIT):
+    """Page size from a query-string value, clamped to 1..MAX_PAGE_LIMIT; raises ValueError"""
+    if value is None or value == '':
+        return default
+    return max(1, min(int(value), MAX_PAGE_LIMIT))
+
+
+def page_query(query_filter, sort_field, direction, cursor=None, projection=None):
+    """
+    (find filter, projection, sort) for rows of query_filter after cursor, sorted
+    on (sort_field, _id). Shared by the sync helpers below and async data layers.
+    """
+    find_filter = query_filter
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, query_filter, sort_field, direction)
+        find_filter = after_cursor(query_filter, sort_value, last_id, sort_field, direction)
+
+    if projection is not None:
+        # The cursor needs the sort key and _id of the last row
+        projection = {field: value for field, value in projection.items() if field not in (sort_field, '_id') or value}
+        if any(projection.values()):
+            projection.update({sort_field: 1, '_id': 1})
+
+    return find_filter, projection, [(sort_field, direction), ('_id', direction)]
+
+
+def finish_page(docs, limit, query_filter, sort_field, direction):
+    """(page, next_cursor) from up to limit + 1 fetched rows"""
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1], query_filter, sort_field, direction)
+
+
+def _find(collection, query_filter, sort_field, direction, cursor, projection):
+    """pymongo cursor over query_filter sorted on (sort_field, _id), starting after cursor"""
+    find_filter, projection, sort = page_query(query_filter, sort_field, direction, cursor, projection)
+    return collection.find(find_filter, projection).sort(sort)
+
+
+def fetch_page(collection, query_filter, sort_field, direction=-1, limit=DEFAULT_PAGE_LIMIT,
+               cursor=None, projection=None, skip=0):
+    """
+    One page of query_filter sorted on (sort_field, _id).
+    Returns (docs, next_cursor); next_cursor is None on the last page. A cursor
+    takes precedence over skip, which is kept for older clients.
+    limit=None returns every remaining row.
+    """
+    direction = -1 if direction < 0 else 1
+    query = _find(collection, query_filter, sort_field, direction, cursor, projection)
+    if skip and not cursor:
+        query = query.skip(skip)
+    if limit is None:
+        return list(query), None
+
+    return finish_page(list(query.limit(limit + 1)), limit, query_filter, sort_field, direction)
+
+
+def iter_rows(collection, query_filter, sort_field, direction=-1, cursor=None, projection=None,
+              batch_size=None, limit=None, skip=0):
+    """
+    Lazily iterated rows in the same order as fetch_page, starting after cursor.
+    Documents are fetched from the server batch_size at a time, so memory stays
+    flat however many rows there are.
+    """
+    direction = -1 if direction < 0 else 1
+    query = _find(collection, query_filter, sort_field, direction, cursor, projection)
+    if skip and not cursor:
+        query = query.skip(skip)
+    if batch_size:
+        query = query.batch_size(batch_size)
+    if limit:
+        query = query.limit(limit)
+    return query
@@ -0,0 +1,184 @@
+"""
+Bounded password-hashing worker pool.
+
+Password hashing is deliberately slow (werkzeug's PBKDF2 runs hundreds of
+thousands of iterations), so it runs on a small dedicated thread pool instead
+of on Flask request threads. hashlib releases the GIL while it hashes, so the
+pool size sets how many cores hashing can use and the rest stay free for
+lightweight endpoints during a login storm.
+
+Admission control: at most PASSWORD_HASH_WORKERS hashes run and at most
+PASSWORD_HASH_MAX_QUEUE wait. A request that would exceed that, or that waits
+longer than PASSWORD_HASH_TIMEOUT_S, gets HashingBusyError, which endpoints
+turn into 503 with a Retry-After header.
+
+Hash parameters come from PASSWORD_HASH_METHOD (e.g. pbkdf2:sha256:600000 or
+scrypt:32768:8:1; default werkzeug's) and PASSWORD_HASH_SALT_LENGTH. Stored
+hashes made with other parameters still verify; needs_rehash() tells login to
+replace them.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2')
+PASSWORD_HASH_SALT_LENGTH = int(os.getenv('PASSWORD_HASH_SALT_LENGTH', 16))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', 32))
+PASSWORD_HASH_TIMEOUT_S = float(os.getenv('PASSWORD_HASH_TIMEOUT_S', 10))
+PASSWORD_HASH_RETRY_AFTER_S = int(os.getenv('PASSWORD_HASH_RETRY_AFTER_S', 2))
+
+# Latency samples kept per operation for percentiles
+LATENCY_WINDOW = 1000
+
+
+class HashingBusyError(RuntimeError):
+    """Raised when the hashing pool can't take (or finish) a request in time"""
+
+    def __init__(self, message, retry_after=PASSWORD_HASH_RETRY_AFTER_S):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _method_of(pwhash):
+    """Parameter prefix of a werkzeug hash, e.g. pbkdf2:sha256:600000"""
+    return (pwhash or '').split('$', 1)[0]
+
+
+class _LatencyStats:
+    """Count, mean, max and recent percentiles of one operation"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self):
+        recent = sorted(self.recent)
+
+        def percentile(fraction):
+            return round(recent[min(len(recent) - 1, int(len(recent) * fraction))] * 1000, 3) if recent else 0.0
+
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(self.max * 1000, 3)
+        }
+
+
+class PasswordHasher:
+    """Runs hash / verify on a size-limited executor with a bounded wait queue"""
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, salt_length=PASSWORD_HASH_SALT_LENGTH,
+                 workers=PASSWORD_HASH_WORKERS, max_queue=PASSWORD_HASH_MAX_QUEUE,
+                 timeout=PASSWORD_HASH_TIMEOUT_S, retry_after=PASSWORD_HASH_RETRY_AFTER_S, name='password-hash'):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._canonical_method = None
+
+        # Counters for health endpoints
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.rehashed = 0
+        self.latency = {'hash': _LatencyStats(), 'verify': _LatencyStats()}
+        self.queue_wait = _LatencyStats()
+
+    def _run(self, operation, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingBusyError(f"{self.name} queue is full", self.retry_after)
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.queue_wait.add(started - submitted)
+                    self.latency[operation].add(finished - started)
+                    self.in_flight -= 1
+                self._slots.release()
+
+        future = self._executor.submit(task)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            # The task still finishes (and frees its slot); only this request gives up
+            with self._lock:
+                self.timed_out += 1
+            raise HashingBusyError(f"{self.name} timed out after {self.timeout:g}s", self.retry_after)
+
+    def hash(self, password):
+        """Hash a password with the configured parameters"""
+        return self._run('hash', generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        """Check a password against a stored hash (whatever parameters it was made with)"""
+        return self._run('verify', check_password_hash, pwhash, password)
+
+    def rehash(self, password):
+        """New hash for a password whose stored hash has outdated parameters"""
+        pwhash = self.hash(password)
+        with self._lock:
+            self.rehashed += 1
+        return pwhash
+
+    def needs_rehash(self, pwhash):
+        """Whether a stored hash was made with different parameters than the configured ones"""
+        if self._canonical_method is None:
+            # werkzeug fills in defaults (e.g. pbkdf2 -> pbkdf2:sha256:600000); hash once to learn them
+            self._canonical_method = _method_of(self._run('hash', generate_password_hash, '', self.method, 1))
+        return _method_of(pwhash) != self._canonical_method
+
+    def stats(self):
+        """Pool counters and latencies for health endpoints"""
+        with self._lock:
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'queue_depth': max(0, self.in_flight - self.workers),
+                'peak_in_flight': self.peak_in_flight,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'rehashed': self.rehashed,
+                'queue_wait': self.queue_wait.summary(),
+                'hash': self.latency['hash'].summary(),
+                'verify': self.latency['verify'].summary()
+            }
+
+
+password_hasher = PasswordHasher()
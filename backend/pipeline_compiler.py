@@ -0,0 +1,243 @@
+"""
+DataFrame-free inference for fitted sklearn classification pipelines.
+
+A Pipeline of the form ColumnTransformer -> classifier is compiled into plain
+NumPy lookup tables (scaler means/scales and one-hot column maps), so a record
+dict can be encoded straight into a preallocated feature row and scored with a
+single predict_proba call; tree-ensemble estimators are further compiled by
+tree_compiler. Pipelines the compiler doesn't understand keep working through
+sklearn, one predict_proba call per model.
+"""
+
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from tree_compiler import compile_model
+
+logger = logging.getLogger(__name__)
+
+
+class UnsupportedPipelineError(Exception):
+    """Raised when a fitted transformer can't be compiled"""
+
+
+class CompiledColumnTransformer:
+    """Lookup-table replacement for a fitted, dense ColumnTransformer"""
+
+    def __init__(self, column_transformer):
+        if not isinstance(column_transformer, ColumnTransformer):
+            raise UnsupportedPipelineError(f"Expected ColumnTransformer, got {type(column_transformer).__name__}")
+        if getattr(column_transformer, 'sparse_output_', False):
+            raise UnsupportedPipelineError("Sparse ColumnTransformer output is not supported")
+
+        self.input_columns = list(column_transformer.feature_names_in_)
+
+        # Numeric block: one scatter of (x - mean) / scale into the output row
+        self.numeric_columns = []
+        self.numeric_outputs = []
+        numeric_means = []
+        numeric_scales = []
+
+        # Categorical blocks: per input column, a dict of category -> output column (-1 when dropped)
+        self.categorical_blocks = []
+
+        offset = 0
+        for name, transformer, columns in column_transformer.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            columns = self._column_names(columns)
+
+            if transformer == 'passthrough':
+                self.numeric_columns.extend(columns)
+                self.numeric_outputs.extend(range(offset, offset + len(columns)))
+                numeric_means.extend([0.0] * len(columns))
+                numeric_scales.extend([1.0] * len(columns))
+                offset += len(columns)
+
+            elif isinstance(transformer, StandardScaler):
+                mean = transformer.mean_ if transformer.with_mean else None
+                scale = transformer.scale_ if transformer.with_std else None
+                self.numeric_columns.extend(columns)
+                self.numeric_outputs.extend(range(offset, offset + len(columns)))
+                numeric_means.extend(np.zeros(len(columns)) if mean is None else mean)
+                numeric_scales.extend(np.ones(len(columns)) if scale is None else scale)
+                offset += len(columns)
+
+            elif isinstance(transformer, OneHotEncoder):
+                if getattr(transformer, '_infrequent_enabled', False):
+                    raise UnsupportedPipelineError("OneHotEncoder with infrequent categories is not supported")
+                if transformer.handle_unknown not in ('error', 'ignore'):
+                    raise UnsupportedPipelineError(f"OneHotEncoder handle_unknown='{transformer.handle_unknown}' is not supported")
+
+                drop_idx = transformer.drop_idx_
+                for position, (column, categories) in enumerate(zip(columns, transformer.categories_)):
+                    dropped = None if drop_idx is None else drop_idx[position]
+                    lookup = {}
+                    for index, category in enumerate(categories.tolist()):
+                        if dropped is not None and index == dropped:
+                            lookup[category] = -1
+                        else:
+                            lookup[category] = offset
+                            offset += 1
+                    self.categorical_blocks.append((column, lookup, transformer.handle_unknown))
+
+            else:
+                raise UnsupportedPipelineError(f"Transformer '{name}' ({type(transformer).__name__}) is not supported")
+
+        self.n_features_out = offset
+        self.numeric_outputs = np.asarray(self.numeric_outputs, dtype=np.intp)
+        self.numeric_means = np.asarray(numeric_means, dtype=float)
+        self.numeric_scales = np.asarray(numeric_scales, dtype=float)
+        # StandardScaler stores a scale of 1.0 for constant features already; guard anyway
+        self.numeric_scales[self.numeric_scales == 0] = 1.0
+
+        self.fingerprint = self._fingerprint()
+
+    def _column_names(self, columns):
+        """Normalise a ColumnTransformer column selector to a list of names"""
+        columns = np.asarray(columns)
+        if columns.dtype.kind in 'iu':
+            return [self.input_columns[index] for index in columns]
+        if columns.dtype.kind == 'b':
+            return [name for name, keep in zip(self.input_columns, columns) if keep]
+        return columns.tolist()
+
+    def _fingerprint(self):
+        """Digest of the compiled tables, equal for transformers fitted to the same data"""
+        digest = hashlib.sha1()
+        digest.update(repr(self.numeric_columns).encode())
+        digest.update(self.numeric_outputs.tobytes())
+        digest.update(self.numeric_means.tobytes())
+        digest.update(self.numeric_scales.tobytes())
+        digest.update(repr([(column, sorted(lookup.items(), key=repr), unknown)
+                            for column, lookup, unknown in self.categorical_blocks]).encode())
+        return digest.hexdigest()
+
+    def transform_records(self, records, out=None):
+        """Encode a list of record dicts into an (N, n_features_out) float matrix"""
+        n_rows = len(records)
+        if out is None:
+            out = np.zeros((n_rows, self.n_features_out), dtype=float)
+        else:
+            out[:] = 0.0
+
+        if self.numeric_columns:
+            numeric = np.array([[record[column] for column in self.numeric_columns] for record in records], dtype=float)
+            out[:, self.numeric_outputs] = (numeric - self.numeric_means) / self.numeric_scales
+
+        for column, lookup, handle_unknown in self.categorical_blocks:
+            for row, record in enumerate(records):
+                position = lookup.get(record[column])
+                if position is None:
+                    if handle_unknown == 'error':
+                        raise ValueError(f"Found unknown category '{record[column]}' in column '{column}'")
+                elif position >= 0:
+                    out[row, position] = 1.0
+
+        return out
+
+    def transform_record(self, record, out=None):
+        """Encode one record dict into a (1, n_features_out) row"""
+        return self.transform_records([record], out=out)
+
+    def probe_records(self):
+        """Synthetic records covering every known category, for verifying the compiled tables"""
+        n_rows = max([len(lookup) for _, lookup, _ in self.categorical_blocks] + [2])
+        records = []
+        for row in range(n_rows):
+            record = {column: float(row) + 0.5 for column in self.numeric_columns}
+            for column, lookup, _ in self.categorical_blocks:
+                categories = list(lookup)
+                record[column] = categories[row % len(categories)]
+            records.append(record)
+        return records
+
+
+class CompiledClassifier:
+    """A classifier pipeline split into a compiled encoder and its final estimator"""
+
+    def __init__(self, pipeline, name=None):
+        self.name = name
+        self.pipeline = pipeline
+        self.preprocessor = None
+        self.estimator = pipeline
+
+        if isinstance(pipeline, Pipeline) and len(pipeline.steps) == 2:
+            try:
+                self.preprocessor = CompiledColumnTransformer(pipeline.steps[0][1])
+                self.estimator = compile_model(pipeline.steps[-1][1])
+            except UnsupportedPipelineError as e:
+                logger.info(f"Using sklearn pipeline for {name}: {e}")
+
+        if self.preprocessor is not None and not self.verify():
+            logger.warning(f"Compiled encoding for {name} does not match sklearn; using sklearn pipeline")
+            self.preprocessor = None
+            self.estimator = pipeline
+
+        self.classes_ = np.asarray(self.estimator.classes_)
+        self.class_list = self.classes_.tolist()
+
+    @property
+    def compiled(self):
+        return self.preprocessor is not None
+
+    def encode(self, records):
+        """Encode records into the estimator's input matrix (compiled pipelines only)"""
+        return self.preprocessor.transform_records(records)
+
+    def predict_proba_encoded(self, encoded):
+        """Class probabilities for an already encoded matrix"""
+        return self.estimator.predict_proba(encoded)
+
+    def predict_proba_records(self, records, feature_names):
+        """Class probabilities for raw records, falling back to the sklearn pipeline"""
+        if self.compiled:
+            return self.predict_proba_encoded(self.encode(records))
+        return self.pipeline.predict_proba(pd.DataFrame(records, columns=feature_names))
+
+    def verify(self, records=None):
+        """Check the compiled encoding against the sklearn preprocessor on sample records"""
+        if not self.compiled:
+            return True
+        if records is None:
+            records = self.preprocessor.probe_records()
+        try:
+            frame = pd.DataFrame(records, columns=self.preprocessor.input_columns)
+            expected = self.pipeline.steps[0][1].transform(frame)
+            return np.allclose(self.encode(records), expected)
+        except Exception as e:
+            logger.warning(f"Verification of compiled encoding for {self.name} failed: {e}")
+            return False
+
+    def labels_from_proba(self, probabilities):
+        """Labels and confidences from a probability matrix (argmax over classes_)"""
+        best = probabilities.argmax(axis=1)
+        labels = [self.class_list[index] for index in best]
+        confidences = probabilities[np.arange(len(best)), best].tolist()
+        return labels, confidences
+
+
+def predict_classifiers(classifiers, records, feature_names):
+    """
+    Score records with several compiled classifiers, encoding once per distinct preprocessor.
+    Returns {name: (labels, confidences)} with lists in record order.
+    """
+    encoded_by_fingerprint = {}
+    results = {}
+
+    for name, classifier in classifiers.items():
+        if classifier.compiled:
+            fingerprint = classifier.preprocessor.fingerprint
+            if fingerprint not in encoded_by_fingerprint:
+                encoded_by_fingerprint[fingerprint] = classifier.encode(records)
+            probabilities = classifier.predict_proba_encoded(encoded_by_fingerprint[fingerprint])
+        else:
+            probabilities = classifier.predict_proba_records(records, feature_names)
+
+        results[name] = classifier.labels_from_proba(np.asarray(probabilities))
+
+    return results
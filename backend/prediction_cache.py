@@ -0,0 +1,101 @@
+"""
+Bounded prediction cache with LRU eviction and a TTL.
+
+Keys are a canonical hash of the ordered feature vector plus the model version,
+so identical submissions reuse the model output and a swapped model never serves
+results computed by its predecessor.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from fast_start import lazy_import
+
+np = lazy_import('numpy')
+
+
+class PredictionCache:
+    """Thread-safe LRU + TTL cache of model outputs"""
+
+    def __init__(self, max_size=4096, ttl_seconds=3600):
+        self.max_size = max(0, int(max_size))
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    @staticmethod
+    def make_key(feature_vector, model_version):
+        """Canonical key: ints and equal floats hash the same, order matters"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(model_version).encode())
+        digest.update(b'\0')
+        digest.update(np.asarray(feature_vector, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return a cached value or None on a miss"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries when full"""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        """Drop one entry if present; returns whether it was cached"""
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        """Drop every entry, e.g. after a model swap"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for health endpoints"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
@@ -0,0 +1,383 @@
+"""
+Pre-fork production launcher.
+
+Loads a service (or the gateway) and its models once in a parent process,
+then forks worker processes that all accept connections on one shared
+listening socket:
+
+    python prefork.py <service> [workers]
+
+<service> is register, stress, mental, mobile, academic or gateway; it
+listens on the service's usual port unless PREFORK_PORT is set.
+
+The parent freezes everything it loaded (gc.freeze()) before forking, so the
+collector in the workers never writes to those objects' headers and the
+model arrays, imported modules and registry stay shared copy-on-write pages
+instead of being copied into every worker.
+
+Environment:
+    PREFORK_WORKERS               worker processes (default: CPU count)
+    PREFORK_HOST / PREFORK_PORT   listen address (default 0.0.0.0 / service port)
+    PREFORK_MAX_REQUESTS          recycle a worker after this many requests (default 0: never)
+    PREFORK_MAX_REQUESTS_JITTER   random extra requests per worker so they don't all recycle at once
+    PREFORK_GRACEFUL_TIMEOUT_S    how long a stopping worker may finish in-flight requests (default 30)
+    PREFORK_MEMORY_REPORT_S       log per-worker memory every N seconds (default 300, 0: off)
+
+Signals to the parent:
+    SIGHUP     graceful reload: the parent re-executes itself (new code and
+               models) on the same socket, starts fresh workers, then stops
+               the old ones once they finish their requests
+    SIGUSR1    log the shared / private memory of every worker now
+    SIGTERM / SIGINT   stop the workers gracefully and exit
+
+Worker connections to MongoDB are made after the fork (pymongo clients must
+not be shared across processes); models are never loaded in the workers
+unless the parent's load failed.
+"""
+
+import gc
+import importlib
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+import fast_start
+import write_behind
+
+logger = logging.getLogger(__name__)
+
+PREFORK_WORKERS = int(os.getenv('PREFORK_WORKERS', os.cpu_count() or 2))
+PREFORK_HOST = os.getenv('PREFORK_HOST', '0.0.0.0')
+PREFORK_PORT = int(os.getenv('PREFORK_PORT', 0))
+PREFORK_MAX_REQUESTS = int(os.getenv('PREFORK_MAX_REQUESTS', 0))
+PREFORK_MAX_REQUESTS_JITTER = int(os.getenv('PREFORK_MAX_REQUESTS_JITTER', PREFORK_MAX_REQUESTS // 10))
+PREFORK_GRACEFUL_TIMEOUT_S = float(os.getenv('PREFORK_GRACEFUL_TIMEOUT_S', 30))
+PREFORK_MEMORY_REPORT_S = float(os.getenv('PREFORK_MEMORY_REPORT_S', 300))
+
+# Service -> standalone port
+SERVICE_PORTS = {
+    'register': 5000,
+    'stress': 5001,
+    'mental': 5002,
+    'mobile': 5003,
+    'academic': 5004,
+    'gateway': 8000
+}
+
+# Handed across the SIGHUP re-exec
+_LISTEN_FD_ENV = 'PREFORK_LISTEN_FD'
+_RETIRING_ENV = 'PREFORK_RETIRING_PIDS'
+
+# A worker that dies this soon after starting is respawned after a pause
+_CRASH_WINDOW_S = 2.0
+
+
+def load_target(name):
+    """(WSGI app, service modules) for a service name or 'gateway'"""
+    if name not in SERVICE_PORTS:
+        raise ValueError(f"Unknown service {name!r}. Known: {', '.join(SERVICE_PORTS)}")
+    module = importlib.import_module(name)
+    if name == 'gateway':
+        return module.app, list(module.services.values())
+    return module.app, [module]
+
+
+def preload(services):
+    """Load every service's models in the parent; returns the services whose load failed"""
+    failed = []
+    for module in services:
+        loader = getattr(module, 'model_loader', None)
+        if loader is not None and not loader.ensure(trigger='preload'):
+            failed.append(module.__name__)
+    return failed
+
+
+def memory_usage(pid):
+    """Memory of a process in bytes (rss, pss, shared, private) from /proc, or None where unavailable"""
+    fields = {}
+    for path in (f'/proc/{pid}/smaps_rollup', f'/proc/{pid}/smaps'):
+        try:
+            with open(path) as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 3 and parts[2] == 'kB':
+                        key = parts[0].rstrip(':')
+                        fields[key] = fields.get(key, 0) + int(parts[1]) * 1024
+            break
+        except OSError:
+            continue
+    if not fields:
+        return None
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    }
+
+
+def _mb(value):
+    return f'{value / (1 << 20):.1f} MB'
+
+
+class _RequestCounter:
+    """WSGI middleware counting requests (recycling) and tracking in-flight ones (graceful stop)"""
+
+    def __init__(self, app, max_requests, on_limit):
+        self.app = app
+        self.max_requests = max_requests
+        self.on_limit = on_limit
+        self.handled = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.handled += 1
+            self.in_flight += 1
+            limit_reached = self.max_requests and self.handled == self.max_requests
+        if limit_reached:
+            self.on_limit('request limit reached')
+        try:
+            return ClosingIterator(self.app(environ, start_response), self._finished)
+        except Exception:
+            self._finished()
+            raise
+
+    def _finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class PreforkServer:
+    """Parent process: owns the listening socket and keeps PREFORK_WORKERS workers running"""
+
+    def __init__(self, name, workers=PREFORK_WORKERS, host=PREFORK_HOST, port=PREFORK_PORT,
+                 max_requests=PREFORK_MAX_REQUESTS, max_requests_jitter=PREFORK_MAX_REQUESTS_JITTER,
+                 graceful_timeout=PREFORK_GRACEFUL_TIMEOUT_S, memory_report_interval=PREFORK_MEMORY_REPORT_S):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.host = host
+        self.port = port or SERVICE_PORTS.get(name, 8000)
+        self.max_requests = max_requests
+        self.max_requests_jitter = max(0, max_requests_jitter)
+        self.graceful_timeout = graceful_timeout
+        self.memory_report_interval = memory_report_interval
+        self.app = None
+        self.services = []
+        self.sock = None
+        self.children = {}
+        self.retiring = set()
+        self._signals = []
+
+    # Parent
+
+    def run(self):
+        self.app, self.services = load_target(self.name)
+
+        failed = preload(self.services)
+        if failed:
+            logger.warning(f"⚠️ Models failed to load for {', '.join(failed)}; each worker retries in the background")
+        # Boot is over; don't carry the import-timing hook into the workers
+        fast_start.stop_import_timing()
+
+        # Everything loaded so far stays put; the workers' collectors never touch (and dirty) it
+        gc.collect()
+        gc.freeze()
+        logger.info(f"Froze {gc.get_freeze_count()} objects before forking")
+
+        self.sock = self._listen()
+        for signum in (signal.SIGHUP, signal.SIGUSR1, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._queue_signal)
+
+        for _ in range(self.workers):
+            self.spawn_worker()
+        logger.info(f"✓ {self.name}: {self.workers} workers on http://{self.host}:{self.port} (parent pid {os.getpid()})")
+
+        # After a SIGHUP re-exec: the previous generation stops once the new one is serving
+        for pid in self._inherited_workers():
+            self.retire(pid)
+
+        self._supervise()
+
+    def _listen(self):
+        inherited = os.environ.pop(_LISTEN_FD_ENV, None)
+        if inherited is not None:
+            sock = socket.socket(fileno=int(inherited))
+        else:
+            sock = socket.create_server((self.host, self.port), backlog=2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _inherited_workers(self):
+        pids = os.environ.pop(_RETIRING_ENV, '')
+        return [int(pid) for pid in pids.split(',') if pid]
+
+    def _queue_signal(self, signum, frame):
+        self._signals.append(signum)
+
+    def _supervise(self):
+        next_report = time.monotonic() + self.memory_report_interval
+        stopping = False
+        while True:
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self.reexec()
+                elif signum == signal.SIGUSR1:
+                    self.log_memory()
+                elif not stopping:
+                    stopping = True
+                    logger.info("Stopping workers...")
+                    deadline = time.monotonic() + self.graceful_timeout + 5
+                    for pid in list(self.children):
+                        self.retire(pid)
+
+            self._reap(respawn=not stopping)
+            if stopping:
+                if not self.retiring:
+                    logger.info("✓ All workers stopped")
+                    return
+                if time.monotonic() > deadline:
+                    for pid in self.retiring:
+                        self._kill(pid, signal.SIGKILL)
+
+            if self.memory_report_interval and time.monotonic() >= next_report:
+                self.log_memory()
+                next_report = time.monotonic() + self.memory_report_interval
+            time.sleep(0.2)
+
+    def _reap(self, respawn=True):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.retiring.discard(pid)
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0:
+                logger.warning(f"Worker {pid} exited with {code}")
+            if respawn:
+                if code != 0 and time.monotonic() - started < _CRASH_WINDOW_S:
+                    time.sleep(1)
+                self.spawn_worker()
+
+    def _kill(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def retire(self, pid):
+        """Ask a worker to finish its in-flight requests and exit (it isn't replaced)"""
+        self.children.pop(pid, None)
+        self.retiring.add(pid)
+        self._kill(pid, signal.SIGTERM)
+
+    def reexec(self):
+        """SIGHUP: replace this process with a fresh launcher that takes over the socket and workers"""
+        logger.info("SIGHUP: reloading (new workers start before the current ones stop)")
+        os.environ[_LISTEN_FD_ENV] = str(self.sock.fileno())
+        os.environ[_RETIRING_ENV] = ','.join(str(pid) for pid in list(self.children) + list(self.retiring))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    def log_memory(self):
+        """Log shared vs private memory of the parent and every worker"""
+        total_private = 0
+        for label, pid in [('parent', os.getpid())] + [('worker', pid) for pid in sorted(self.children)]:
+            usage = memory_usage(pid)
+            if usage is None:
+                logger.info(f"Memory report unavailable for {label} {pid} (needs /proc)")
+                continue
+            total_private += usage['private'] if label == 'worker' else 0
+            logger.info(f"{label} {pid}: rss {_mb(usage['rss'])}, pss {_mb(usage['pss'])}, "
+                        f"shared {_mb(usage['shared'])}, private {_mb(usage['private'])}")
+        logger.info(f"Workers' private memory in total: {_mb(total_private)}")
+
+    # Worker
+
+    def spawn_worker(self):
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            max_requests += random.randint(0, self.max_requests_jitter)
+
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return pid
+
+        # Child: never return into the parent's loop
+        code = 1
+        try:
+            code = self._worker_main(max_requests)
+        except Exception as e:
+            logger.exception(f"Worker {os.getpid()} failed: {e}")
+        finally:
+            os._exit(code)
+
+    def _worker_main(self, max_requests):
+        self.children.clear()
+        self.retiring.clear()
+        self._signals.clear()
+        random.seed()
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        # Ctrl+C reaches the whole process group; the parent turns it into SIGTERM per worker
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        server = None
+        stop_reason = []
+
+        def stop(reason):
+            if not stop_reason:
+                stop_reason.append(reason)
+                # shutdown() waits for serve_forever(), so it can't run on the serving thread
+                threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop('SIGTERM'))
+
+        counter = _RequestCounter(self.app, max_requests, stop)
+        server = make_server(self.host, self.port, counter, threaded=True, fd=self.sock.fileno())
+
+        for module in self.services:
+            supervisor = module.supervisor
+            # Collections a service bound at import time belong to the parent's client; rebind them
+            if supervisor.is_connected():
+                supervisor.connect_fn()
+            supervisor.start()
+        write_queue = write_behind.get_write_queue()
+
+        logger.info(f"Worker {os.getpid()} serving" + (f" (recycled after {max_requests} requests)" if max_requests else ''))
+        server.serve_forever()
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while counter.in_flight > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if write_queue is not None:
+            write_queue.stop()
+        logger.info(f"Worker {os.getpid()} exiting ({stop_reason[0] if stop_reason else 'stopped'}; "
+                    f"{counter.handled} requests handled, {counter.in_flight} unfinished)")
+        return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s')
+    if len(sys.argv) < 2 or sys.argv[1] not in SERVICE_PORTS:
+        print(__doc__)
+        sys.exit(2)
+
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else PREFORK_WORKERS
+    PreforkServer(sys.argv[1], workers=workers).run()
@@ -0,0 +1,197 @@
+"""
+Read-through cache of the user profile fields predictions need.
+
+Stress and mental predictions only need a user's age, gender and occupation.
+get() serves them from an in-process LRU + TTL cache (PROFILE_CACHE_SIZE,
+PROFILE_CACHE_TTL) and on a miss fetches just those fields by _id, never the
+full user document with its password hash.
+
+Invalidation:
+
+- invalidate() drops one user in this process; PUT /profile in register.py
+  calls it, which covers services sharing a process with register
+- watch() follows a change stream on users in a background thread and drops
+  users whose profile fields change, whichever process wrote them. Change
+  streams need a replica set; on a standalone server the watcher logs that and
+  stops, and PROFILE_CACHE_TTL bounds how stale a cached profile can get.
+
+A fetch racing an invalidation must not put the old profile back: every
+invalidation bumps a generation, a fill remembers the generation it started
+at, and remember() skips caching when that user (or the whole cache) was
+invalidated since.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+from prediction_cache import PredictionCache
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 10000))
+PROFILE_CACHE_TTL = float(os.getenv('PROFILE_CACHE_TTL', 300))
+PROFILE_CACHE_CHANGE_STREAM = os.getenv('PROFILE_CACHE_CHANGE_STREAM', 'true').lower() in ('1', 'true', 'yes')
+
+# User fields the prediction services read
+PROFILE_FIELDS = ('age', 'gender', 'occupation_or_academic_level')
+PROFILE_PROJECTION = {field: 1 for field in PROFILE_FIELDS}
+
+# Change events that can make a cached profile stale
+_CHANGE_STREAM_PIPELINE = [{'$match': {'$or': [
+    {'operationType': {'$in': ['replace', 'delete', 'drop', 'rename', 'dropDatabase', 'invalidate']}},
+    *[{f'updateDescription.updatedFields.{field}': {'$exists': True}} for field in PROFILE_FIELDS],
+    *[{'updateDescription.removedFields': field} for field in PROFILE_FIELDS]
+]}}]
+
+_RECONNECT_MAX_SECONDS = 60
+
+# Per-user invalidation generations kept for racing fills; older ones fold into one cutoff
+_INVALIDATION_HISTORY = 4096
+
+
+class UserProfileCache:
+    """LRU + TTL cache of projected user profiles with change-stream invalidation"""
+
+    def __init__(self, max_size=PROFILE_CACHE_SIZE, ttl_seconds=PROFILE_CACHE_TTL):
+        self._cache = PredictionCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._watch_thread = None
+        self._watching = False
+        self._watch_lock = threading.Lock()
+        self.watch_status = 'not started'
+
+        # Invalidation generations: per user, and the cutoff below which every fill is stale
+        self._generation_lock = threading.Lock()
+        self._generation = 0
+        self._invalidated = OrderedDict()
+        self._stale_before = 0
+
+        # Counters for health endpoints
+        self.fetches = 0
+        self.invalidations = 0
+
+    def get(self, users_collection, user_id):
+        """A user's profile fields (cached), or None for unknown or malformed ids"""
+        if not ObjectId.is_valid(user_id):
+            return None
+        profile = self.cached(user_id)
+        if profile is not None:
+            return profile
+
+        self.fetches += 1
+        generation = self.generation()
+        profile = users_collection.find_one({'_id': ObjectId(user_id)}, PROFILE_PROJECTION)
+        if profile is None:
+            return None
+        return self.remember(user_id, profile, generation)
+
+    def cached(self, user_id):
+        """A cached profile or None, without fetching (for data layers that fetch themselves)"""
+        profile = self._cache.get(str(user_id))
+        return dict(profile) if profile is not None else None
+
+    def generation(self):
+        """Token to take before fetching a profile and pass to remember()"""
+        return self._generation
+
+    def remember(self, user_id, user, generation=None):
+        """
+        Cache the profile fields of a fetched user document; returns them. With the
+        generation taken before the fetch, nothing is cached if the user was
+        invalidated while it ran.
+        """
+        key = str(user_id)
+        profile = {field: user[field] for field in PROFILE_FIELDS if field in user}
+        with self._generation_lock:
+            if generation is None or max(self._stale_before, self._invalidated.get(key, 0)) <= generation:
+                self._cache.put(key, profile)
+        return dict(profile)
+
+    def _bump(self, key=None):
+        # Called with _generation_lock held
+        self._generation += 1
+        if key is None:
+            self._stale_before = self._generation
+            self._invalidated.clear()
+            return
+        self._invalidated[key] = self._generation
+        self._invalidated.move_to_end(key)
+        if len(self._invalidated) > _INVALIDATION_HISTORY:
+            _, oldest = self._invalidated.popitem(last=False)
+            self._stale_before = max(self._stale_before, oldest)
+
+    def invalidate(self, user_id):
+        """Drop a user's cached profile in this process"""
+        key = str(user_id)
+        with self._generation_lock:
+            self._bump(key)
+            discarded = self._cache.discard(key)
+        if discarded:
+            self.invalidations += 1
+
+    def clear(self):
+        with self._generation_lock:
+            self._bump()
+            self._cache.clear()
+
+    def watch(self, users_collection):
+        """Start the change-stream invalidation thread (once per process)"""
+        if not PROFILE_CACHE_CHANGE_STREAM:
+            self.watch_status = 'disabled'
+            return
+        with self._watch_lock:
+            if self._watching:
+                return
+            self._watching = True
+            self._watch_thread = threading.Thread(target=self._watch, args=(users_collection,),
+                                                  name='profile-cache-watch', daemon=True)
+            self._watch_thread.start()
+
+    def stop(self):
+        self._watching = False
+
+    def _watch(self, users_collection):
+        backoff = 1.0
+        while self._watching:
+            try:
+                with users_collection.watch(_CHANGE_STREAM_PIPELINE) as stream:
+                    # Changes made while (re)connecting were missed
+                    self.clear()
+                    self.watch_status = 'watching'
+                    backoff = 1.0
+                    logger.info("Profile cache following users change stream")
+                    for change in stream:
+                        if 'documentKey' in change:
+                            self.invalidate(change['documentKey']['_id'])
+                        else:
+                            # drop / rename / invalidate: every cached profile may be stale
+                            self.clear()
+                        if not self._watching:
+                            break
+            except OperationFailure as e:
+                # e.g. a standalone server (change streams need a replica set)
+                logger.info(f"Profile cache change stream unavailable, relying on TTL: {e}")
+                self.watch_status = 'unavailable'
+                self._watching = False
+                return
+            except PyMongoError as e:
+                self.watch_status = 'reconnecting'
+                logger.warning(f"Profile cache change stream interrupted, retrying in {backoff:g}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, _RECONNECT_MAX_SECONDS)
+        self.watch_status = 'stopped'
+
+    def stats(self):
+        """Cache counters and invalidation state for health endpoints"""
+        return {
+            **self._cache.stats(),
+            'fetches': self.fetches,
+            'invalidations': self.invalidations,
+            'change_stream': self.watch_status
+        }
+
+
+profile_cache = UserProfileCache()
@@ -1,14 +1,21 @@
 ## register.py
+# Imported first so the startup report times every other import
+from fast_start import StartupReport
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from pymongo import MongoClient
-from werkzeug.security import generate_password_hash, check_password_hash
-import os
 from dotenv import load_dotenv
 import re
 from datetime import datetime, timedelta
 import logging
 from bson import ObjectId
+from pymongo import ReturnDocument
+import db_indexes
+import json_provider
+import metrics
+import mongo_pool
+import service_supervisor
+from password_hashing import HashingBusyError, password_hasher
+from profile_cache import PROFILE_FIELDS, profile_cache
 
 
 load_dotenv()
@@ -19,6 +26,10 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000"])  
+json_provider.init_app(app)
+
+# Boot timeline (see fast_start.py); this service has no models
+startup_report = StartupReport('register')
 
 
 client = None
@@ -31,21 +42,16 @@ def initialize_database():
     
     try:
        
-        mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
-        db_name = os.getenv('DB_NAME', 'mentoradb')
-        
-        logger.info(f"Connecting to MongoDB: {mongo_uri}")
-        logger.info(f"Database Name: {db_name}")
+        logger.info(f"Connecting to MongoDB: {mongo_pool.MONGO_URI}")
+        logger.info(f"Database Name: {mongo_pool.DB_NAME}")
         
-        client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+        # Shared, pooled client; pings so a down server fails fast
+        client, db = mongo_pool.connect()
         
-        # Test the connection
-        client.admin.command('ping')
-        
-        db = client[db_name]
         users_collection = db['users']
+        db_indexes.bootstrap_indexes(db, ['users'])
         
-        logger.info(f"Successfully connected to MongoDB: {db_name}")
+        logger.info(f"Successfully connected to MongoDB: {mongo_pool.DB_NAME}")
         return True
         
     except Exception as e:
@@ -95,38 +101,91 @@ def validate_signup_data(data):
     
     return errors
 
-def calculate_streak_update(last_login_date):
+MAX_STREAK_RESETS_PER_MONTH = 3
+
+# Fields the login response needs from the updated user
+LOGIN_PROJECTION = {'full_name': 1, 'email': 1, 'current_streak': 1, 'max_streak': 1}
+
+def login_streak_update():
     """
-    Calculate streak updates based on last login date
-    Returns tuple: (should_increment_streak, should_reset_streak)
+    Update pipeline applying a login to the streak, evaluated by MongoDB in one
+    atomic write (no read-modify-write race between concurrent logins):
+    same UTC day keeps the streak, the next day increments it, anything else
+    (including a first login) resets it to 1.
     """
-    if not last_login_date:
-        # First time login
-        return False, True
-    
-    today = datetime.utcnow().date()
-    last_login = last_login_date.date() if isinstance(last_login_date, datetime) else last_login_date
-    
-    # Calculate days difference
-    days_diff = (today - last_login).days
-    
-    if days_diff == 0:
-        # Same day login - no streak update needed
-        return False, False
-    elif days_diff == 1:
-        # Consecutive day login - increment streak
-        return True, False
-    else:
-        # Missed days - reset streak to 1
-        return False, True
+    days_since_login = {'$dateDiff': {'startDate': '$last_login_date', 'endDate': '$$NOW', 'unit': 'day'}}
+    current_streak = {'$ifNull': ['$current_streak', 0]}
+    return [
+        {'$set': {'current_streak': {'$switch': {
+            'branches': [
+                {'case': {'$eq': [days_since_login, 0]}, 'then': current_streak},
+                {'case': {'$eq': [days_since_login, 1]}, 'then': {'$add': [current_streak, 1]}}
+            ],
+            'default': 1
+        }}}},
+        # Separate stage so these see the new current_streak
+        {'$set': {
+            'max_streak': {'$max': [{'$ifNull': ['$max_streak', 0]}, '$current_streak']},
+            'last_login_date': '$$NOW'
+        }}
+    ]
+
+def streak_reset_update(new_streak, current_month, update_data):
+    """
+    Conditional filter and update pipeline for a manual streak change in
+    PUT /profile. The monthly reset counter is checked and incremented by the
+    same atomic write, so concurrent requests can't exceed the limit. Setting
+    the streak to its current value doesn't use a reset. Returns (filter, pipeline).
+    """
+    changed = {'$ne': [{'$ifNull': ['$current_streak', 0]}, new_streak]}
+    resets_used = {'$cond': [
+        {'$eq': ['$streak_reset_month', current_month]},
+        {'$ifNull': ['$streak_resets_this_month', 0]},
+        0
+    ]}
+    query_filter = {'$expr': {'$or': [
+        {'$not': [changed]},
+        {'$lt': [resets_used, MAX_STREAK_RESETS_PER_MONTH]}
+    ]}}
+    pipeline = [{'$set': {
+        **{field: {'$literal': value} for field, value in update_data.items()},
+        'streak_resets_this_month': {'$cond': [changed, {'$add': [resets_used, 1]}, '$streak_resets_this_month']},
+        'streak_reset_month': {'$cond': [changed, current_month, '$streak_reset_month']},
+        'max_streak': {'$max': [{'$ifNull': ['$max_streak', 0]}, new_streak]},
+        'current_streak': new_streak
+    }}]
+    return query_filter, pipeline
+
+def hashing_busy_response(error):
+    """503 with Retry-After when the password-hashing pool is saturated"""
+    logger.warning(f"Password hashing busy: {error}")
+    response = jsonify({'message': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+def remaining_streak_resets(user, current_month):
+    """Streak resets left this month for a user document"""
+    if user.get('streak_reset_month') != current_month:
+        return MAX_STREAK_RESETS_PER_MONTH
+    return max(0, MAX_STREAK_RESETS_PER_MONTH - user.get('streak_resets_this_month', 0))
+
+# Background probe of the database (see service_supervisor.py); this service has no models
+supervisor = service_supervisor.ServiceSupervisor('register', initialize_database, lambda: users_collection is not None)
+service_supervisor.add_probe_routes(app, supervisor)
+metrics.add_metrics_route(app, 'register')
+
+# Endpoints served even while the database is down
+UNGATED_ENDPOINTS = {'home', 'health_check'} | service_supervisor.PROBE_ENDPOINTS | metrics.METRICS_ENDPOINTS
 
 @app.before_request
 def check_database_connection():
-    """Check database connection before each request"""
-    global users_collection
-    if users_collection is None:
-        if not initialize_database():
-            return jsonify({'message': 'Database connection error'}), 500
+    """Fail fast with 503 while the supervisor reports the database unavailable"""
+    if request.endpoint is None or request.endpoint in UNGATED_ENDPOINTS or request.method == 'OPTIONS':
+        return None
+    
+    problem = supervisor.check()
+    if problem:
+        return jsonify({'message': problem}), 503, {'Retry-After': str(supervisor.retry_after())}
 
 @app.route('/')
 def home():
@@ -168,8 +227,8 @@ def signup():
             logger.warning(f"Signup attempt with existing email: {email}")
             return jsonify({'errors': {'email': 'Email already exists. Please use a different email.'}}), 400
         
-        # Hash the password securely
-        hashed_password = generate_password_hash(data['password'])
+        # Hash the password securely (on the bounded hashing pool)
+        hashed_password = password_hasher.hash(data['password'])
         
         # Prepare user document for MongoDB
         user_document = {
@@ -201,6 +260,8 @@ def signup():
             logger.error("Failed to insert user into database")
             return jsonify({'message': 'Failed to create account. Please try again.'}), 500
             
+    except HashingBusyError as e:
+        return hashing_busy_response(e)
     except Exception as e:
         logger.error(f"Signup error: {str(e)}")
         return jsonify({'message': 'Internal server error'}), 500
@@ -225,48 +286,41 @@ def login():
             logger.warning("Missing email or password in login request")
             return jsonify({'message': 'Email and password are required'}), 400
         
-        # Find user in database
-        user = users_collection.find_one({'email': email})
+        # Only the hash is needed to verify the password
+        credentials = users_collection.find_one({'email': email}, {'password': 1})
         
-        if not user:
+        if not credentials:
             logger.warning(f"Login attempt with non-existent email: {email}")
             return jsonify({'message': 'Invalid email or password'}), 401
         
-        # Verify password using secure comparison
-        if not check_password_hash(user['password'], password):
+        # Verify password using secure comparison (on the bounded hashing pool)
+        if not password_hasher.verify(credentials['password'], password):
             logger.warning(f"Invalid password attempt for email: {email}")
             return jsonify({'message': 'Invalid email or password'}), 401
         
-        # Password is correct - proceed with login logic
-        current_streak = user.get('current_streak', 0)
-        max_streak = user.get('max_streak', 0)
-        last_login_date = user.get('last_login_date')
-        
-        # Calculate streak updates
-        should_increment, should_reset = calculate_streak_update(last_login_date)
-        
-        if should_increment:
-            current_streak += 1
-        elif should_reset:
-            current_streak = 1
-        
-        # Update max_streak if current streak exceeds it
-        if current_streak > max_streak:
-            max_streak = current_streak
-        
-        # Prepare update document
-        update_data = {
-            'current_streak': current_streak,
-            'max_streak': max_streak,
-            'last_login_date': datetime.utcnow()
-        }
-        
-        # Update user document in MongoDB
-        result = users_collection.update_one(
-            {'_id': user['_id']},
-            {'$set': update_data}
+        # Password is correct - update the streak server-side in one atomic write.
+        # Matching on the verified hash guards against a concurrent password change.
+        update_pipeline = login_streak_update()
+        # If the hash parameters changed since this hash was made, upgrade it in the same write.
+        # needs_rehash() hashes once on first use, so a busy pool skips the check as well as the
+        # rehash: the password is already verified and the login must not fail now
+        try:
+            if password_hasher.needs_rehash(credentials['password']):
+                update_pipeline.append({'$set': {'password': {'$literal': password_hasher.rehash(password)}}})
+        except HashingBusyError:
+            logger.info(f"Skipping password rehash for {email}; hashing pool busy")
+        
+        user = users_collection.find_one_and_update(
+            {'_id': credentials['_id'], 'password': credentials['password']},
+            update_pipeline,
+            projection=LOGIN_PROJECTION,
+            return_document=ReturnDocument.AFTER
         )
         
+        if not user:
+            logger.warning(f"Credentials changed during login for email: {email}")
+            return jsonify({'message': 'Invalid email or password'}), 401
+        
         logger.info(f"Successful login for user: {email}")
         
         # Return successful login response with user_id
@@ -276,12 +330,14 @@ def login():
             'user': {
                 'full_name': user['full_name'],
                 'email': user['email'],
-                'current_streak': current_streak,
-                'max_streak': max_streak
+                'current_streak': user.get('current_streak', 0),
+                'max_streak': user.get('max_streak', 0)
             },
             'redirect': f'/dashboard/{str(user["_id"])}'
         }), 200
         
+    except HashingBusyError as e:
+        return hashing_busy_response(e)
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return jsonify({'message': 'Internal server error'}), 500
@@ -339,11 +395,7 @@ def user_profile(user_id):
 
         # GET: Return profile data
         if request.method == 'GET':
-            # Calculate remaining streak resets
             current_month = datetime.utcnow().strftime("%Y-%m")
-            streak_reset_month = user.get('streak_reset_month', "")
-            streak_resets_this_month = user.get('streak_resets_this_month', 0)
-            remaining_resets = 3 - streak_resets_this_month if streak_reset_month == current_month else 3
 
             profile_data = {
                 'user_id': str(user['_id']),
@@ -357,7 +409,7 @@ def user_profile(user_id):
                 'max_streak': user.get('max_streak', 0),
                 'last_login_date': user.get('last_login_date'),
                 'created_at': user.get('created_at'),
-                'remaining_streak_resets': max(0, remaining_resets)
+                'remaining_streak_resets': remaining_streak_resets(user, current_month)
             }
             return jsonify(profile_data), 200
 
@@ -375,39 +427,17 @@ def user_profile(user_id):
             # Handle password update
             if 'password' in data:
                 if len(data['password']) >= 6:
-                    update_data['password'] = generate_password_hash(data['password'])
+                    update_data['password'] = password_hasher.hash(data['password'])
                 else:
                     errors['password'] = 'Password must be at least 6 characters'
 
-            # Handle streak reset with monthly limits
+            # Streak changes are checked against the monthly reset limit by the update itself
+            new_streak = None
             if 'current_streak' in data:
                 try:
                     new_streak = int(data['current_streak'])
                     if new_streak < 0:
                         errors['current_streak'] = 'Streak cannot be negative'
-                    
-                    # Check if streak is actually being changed
-                    elif new_streak != user.get('current_streak', 0):
-                        # Check reset limits
-                        streak_reset_month = user.get('streak_reset_month', "")
-                        streak_resets = user.get('streak_resets_this_month', 0)
-                        
-                        # Reset monthly counter if month changed
-                        if streak_reset_month != current_month:
-                            streak_resets = 0
-                            update_data['streak_reset_month'] = current_month
-                        
-                        # Check available resets
-                        if streak_resets >= 3:
-                            errors['current_streak'] = 'Monthly streak reset limit (3) reached'
-                        else:
-                            # Apply streak update
-                            update_data['current_streak'] = new_streak
-                            update_data['streak_resets_this_month'] = streak_resets + 1
-                            
-                            # Update max streak if needed
-                            if new_streak > user.get('max_streak', 0):
-                                update_data['max_streak'] = new_streak
                 except (TypeError, ValueError):
                     errors['current_streak'] = 'Streak must be a positive integer'
 
@@ -441,7 +471,20 @@ def user_profile(user_id):
                 return jsonify({'errors': errors}), 400
                 
             # Update database if valid changes
-            if update_data:
+            updated_user = user
+            if new_streak is not None:
+                query_filter, pipeline = streak_reset_update(new_streak, current_month, update_data)
+                updated_user = users_collection.find_one_and_update(
+                    {'_id': user['_id'], **query_filter},
+                    pipeline,
+                    return_document=ReturnDocument.AFTER
+                )
+                if not updated_user:
+                    limit = MAX_STREAK_RESETS_PER_MONTH
+                    return jsonify({'errors': {'current_streak': f'Monthly streak reset limit ({limit}) reached'}}), 400
+                if all(updated_user.get(field) == user.get(field) for field in updated_user):
+                    return jsonify({'message': 'No changes detected'}), 200
+            elif update_data:
                 result = users_collection.update_one(
                     {'_id': user['_id']},
                     {'$set': update_data}
@@ -449,16 +492,18 @@ def user_profile(user_id):
                 
                 if result.modified_count == 0:
                     return jsonify({'message': 'No changes detected'}), 200
-
-            # Calculate remaining streak resets for response
-            updated_resets = update_data.get('streak_resets_this_month', user.get('streak_resets_this_month', 0))
-            remaining_resets = 3 - updated_resets
+            
+            # Cached profiles in this process; other processes follow the change stream
+            if any(field in update_data for field in PROFILE_FIELDS):
+                profile_cache.invalidate(user_id)
             
             return jsonify({
                 'message': 'Profile updated successfully',
-                'remaining_streak_resets': max(0, remaining_resets)
+                'remaining_streak_resets': remaining_streak_resets(updated_user, current_month)
             }), 200
 
+    except HashingBusyError as e:
+        return hashing_busy_response(e)
     except Exception as e:
         logger.error(f"Profile error: {str(e)}")
         return jsonify({'message': 'Internal server error'}), 500
@@ -467,16 +512,16 @@ def user_profile(user_id):
 def health_check():
     """Health check endpoint"""
     try:
-        # Test database connection
-        if users_collection is not None:
-            users_collection.find_one()
-            db_status = 'Connected'
-        else:
-            db_status = 'Disconnected'
+        # Database state as last probed by the supervisor (no query per health check)
+        db_status = 'Connected' if supervisor.database_up else 'Disconnected'
             
         return jsonify({
             'status': 'Server is running',
             'database': db_status,
+            'supervisor': supervisor.status(),
+            'startup': startup_report.summary(),
+            'mongo_pool': mongo_pool.pool_stats(),
+            'password_hashing': password_hasher.stats(),
             'timestamp': datetime.utcnow().isoformat()
         }), 200
     except Exception as e:
@@ -502,12 +547,19 @@ if __name__ == '__main__':
     print("="*50)
     
 
-    if initialize_database():
+    with startup_report.phase('database'):
+        database_ready = initialize_database()
+    if database_ready:
         print(f"✓ Database connection established")
         print(f"✓ Server will run on: http://localhost:5000")
         print(f"✓ Server will run on: http://127.0.0.1:5000")
         print("="*50)
         
+        # Reconnect in the background from here on
+        supervisor.start()
+        
+        startup_report.ready()
+        startup_report.log()
       
         app.run(
             debug=False, 
@@ -0,0 +1,202 @@
+"""
+Background connection supervisor.
+
+Each service owns one ServiceSupervisor, whose thread keeps its MongoDB
+connection (and, after a failed load, its models) healthy so request threads
+never have to:
+
+- while the database is up it is pinged every SUPERVISOR_INTERVAL_S, each ping
+  bounded by SUPERVISOR_PROBE_TIMEOUT_S so an outage is noticed quickly
+- while it is down the service's connect function is retried with exponential
+  backoff (SUPERVISOR_MIN_BACKOFF_S doubling up to SUPERVISOR_MAX_BACKOFF_S)
+- a failed model load is retried on the same schedule; models that haven't
+  been loaded yet (FAST_START) still load on first use
+
+Requests consult the cached state through check(), which never touches
+MongoDB: while the service is degraded they get 503 with Retry-After at once
+instead of every worker thread stalling for a server-selection timeout.
+/health/live and /health/ready expose the same state to load balancers.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from flask import jsonify
+import pymongo
+import mongo_pool
+
+logger = logging.getLogger(__name__)
+
+SUPERVISOR_INTERVAL_S = float(os.getenv('SUPERVISOR_INTERVAL_S', 2))
+SUPERVISOR_PROBE_TIMEOUT_S = float(os.getenv('SUPERVISOR_PROBE_TIMEOUT_S', 1))
+SUPERVISOR_MIN_BACKOFF_S = float(os.getenv('SUPERVISOR_MIN_BACKOFF_S', 0.5))
+SUPERVISOR_MAX_BACKOFF_S = float(os.getenv('SUPERVISOR_MAX_BACKOFF_S', 30))
+# How long the first requests wait for the very first probe after a (lazy) start
+SUPERVISOR_STARTUP_WAIT_S = float(os.getenv('SUPERVISOR_STARTUP_WAIT_S', 5))
+
+# Endpoint names of the routes added by add_probe_routes
+PROBE_ENDPOINTS = {'liveness', 'readiness'}
+
+
+def _utc_iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+
+
+class ServiceSupervisor:
+    """Owns a service's database / model state and probes it from one background thread"""
+
+    def __init__(self, service, connect_fn, is_connected, model_loader=None, interval=SUPERVISOR_INTERVAL_S,
+                 probe_timeout=SUPERVISOR_PROBE_TIMEOUT_S, min_backoff=SUPERVISOR_MIN_BACKOFF_S,
+                 max_backoff=SUPERVISOR_MAX_BACKOFF_S):
+        self.service = service
+        self.connect_fn = connect_fn
+        self.is_connected = is_connected
+        self.model_loader = model_loader
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._first_probe = threading.Event()
+        self._next_probe_at = 0.0
+
+        # Cached state read by requests and health endpoints
+        self.database_up = False
+        self.probes = 0
+        self.consecutive_failures = 0
+        self.last_ok_at = None
+        self.last_error = None
+        self.outages = 0
+
+    def start(self):
+        """Start the probe thread (again in a forked child); idempotent"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._first_probe.clear()
+            self._thread = threading.Thread(target=self._run, name=f'{self.service}-supervisor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _probe_database(self):
+        try:
+            if not self.is_connected():
+                # The service logs its own connection errors
+                if not self.connect_fn():
+                    raise ConnectionError('connect failed')
+            else:
+                with pymongo.timeout(self.probe_timeout):
+                    mongo_pool.get_client().admin.command('ping')
+        except Exception as e:
+            if self.database_up:
+                self.outages += 1
+                logger.warning(f"{self.service}: database unavailable, requests will get 503: {e}")
+            self.database_up = False
+            self.consecutive_failures += 1
+            self.last_error = str(e)
+            return False
+
+        if not self.database_up and self.probes:
+            logger.info(f"{self.service}: database available again")
+        self.database_up = True
+        self.consecutive_failures = 0
+        self.last_ok_at = time.time()
+        return True
+
+    def _probe_models(self):
+        loader = self.model_loader
+        if loader is None or loader.loaded or not loader.failed:
+            return True
+        return loader.ensure(trigger='supervisor')
+
+    def _run(self):
+        backoff = self.min_backoff
+        while not self._stop.is_set():
+            healthy = self._probe_database() & self._probe_models()
+            self.probes += 1
+            self._first_probe.set()
+            if healthy:
+                delay, backoff = self.interval, self.min_backoff
+            else:
+                delay, backoff = backoff, min(backoff * 2, self.max_backoff)
+            self._next_probe_at = time.monotonic() + delay
+            self._stop.wait(delay)
+
+    def check(self, needs_models=False, needs_database=True):
+        """Why a request can't be served right now, or None; never waits on MongoDB"""
+        self.start()
+        if not self._first_probe.is_set():
+            self._first_probe.wait(SUPERVISOR_STARTUP_WAIT_S)
+        if needs_database and not self.database_up:
+            return 'Database unavailable'
+        loader = self.model_loader
+        if needs_models and loader is not None and not loader.loaded:
+            # A failed load is retried by the probe thread; a never-tried one loads on first use
+            if loader.failed or not loader.ensure():
+                return 'Models unavailable'
+        return None
+
+    def retry_after(self):
+        """Seconds until the next probe, for Retry-After headers"""
+        return max(1, math.ceil(self._next_probe_at - time.monotonic()))
+
+    @property
+    def models_state(self):
+        loader = self.model_loader
+        if loader is None:
+            return 'not required'
+        if loader.loaded:
+            return 'loaded'
+        return 'failed' if loader.failed else 'not loaded'
+
+    @property
+    def live(self):
+        return self._thread is None or self._thread.is_alive()
+
+    @property
+    def ready(self):
+        return self.database_up and self.models_state != 'failed'
+
+    def status(self):
+        """Cached liveness / readiness state for health endpoints"""
+        return {
+            'live': self.live,
+            'ready': self.ready,
+            'database': {
+                'up': self.database_up,
+                'last_ok_at': _utc_iso(self.last_ok_at),
+                'last_error': self.last_error,
+                'consecutive_failures': self.consecutive_failures,
+                'outages': self.outages
+            },
+            'models': self.models_state,
+            'probes': self.probes,
+            'next_probe_in_s': round(max(0.0, self._next_probe_at - time.monotonic()), 3)
+        }
+
+
+def add_probe_routes(app, supervisor):
+    """/health/live and /health/ready answered from the supervisor's cached state"""
+
+    @app.route('/health/live', methods=['GET'], endpoint='liveness')
+    def liveness():
+        supervisor.start()
+        return jsonify({'live': supervisor.live}), 200 if supervisor.live else 503
+
+    @app.route('/health/ready', methods=['GET'], endpoint='readiness')
+    def readiness():
+        supervisor.start()
+        status = supervisor.status()
+        return jsonify(status), 200 if status['ready'] else 503
@@ -0,0 +1,58 @@
+"""
+Streaming (NDJSON) responses for history endpoints.
+
+A history request asks for a stream with ?stream=1 or
+Accept: application/x-ndjson. Instead of building the whole result list, the
+endpoint hands a lazily iterated MongoDB cursor (pagination.iter_rows) to
+ndjson_response(), which renders and serializes one row at a time, one JSON
+object per line.
+
+Rows are fetched HISTORY_STREAM_BATCH_SIZE at a time (default 200), so memory
+stays flat however long a user's history is. A stream has no envelope, so
+counts and next_cursor aren't sent; a cursor query parameter still works to
+resume after a row of an earlier page.
+
+The status line is sent before the first row, so a failure mid-stream can't
+change it: the stream then ends with an {"error": ...} line (also carrying
+the number of rows sent) instead of looking like a complete history.
+"""
+
+import logging
+import os
+from flask import Response, current_app, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+HISTORY_STREAM_BATCH_SIZE = int(os.getenv('HISTORY_STREAM_BATCH_SIZE', 200))
+
+
+def wants_stream(request):
+    """Whether a request asked for an NDJSON stream"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    # Only an explicit NDJSON Accept counts; */* keeps the JSON response
+    return any(mimetype == NDJSON_MIMETYPE and quality > 0 for mimetype, quality in request.accept_mimetypes)
+
+
+def iter_ndjson(rows, render):
+    """One serialized line per rendered row"""
+    dumps = current_app.json.dumps
+    count = 0
+    try:
+        for row in rows:
+            yield dumps(render(row)) + '\n'
+            count += 1
+    except Exception as e:
+        # Headers are already sent; end with an error line so the client can tell it's truncated
+        logger.error(f"History stream aborted after {count} rows: {e}")
+        yield dumps({'error': 'History stream aborted', 'rows_sent': count}) + '\n'
+    finally:
+        close = getattr(rows, 'close', None)
+        if close is not None:
+            close()
+
+
+def ndjson_response(rows, render, status=200):
+    """Streaming response rendering each row lazily as it is read from the cursor"""
+    return Response(stream_with_context(iter_ndjson(rows, render)), status=status, mimetype=NDJSON_MIMETYPE)
@@ -1,14 +1,27 @@
+# Imported first so the startup report times every other import
+from fast_start import ModelLoader, StartupReport, lazy_import
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from pymongo import MongoClient
 from bson import ObjectId
-from datetime import datetime, timezone
-import joblib
-import numpy as np
-import pandas as pd
+import db_indexes
+import json_provider
+import metrics
+import mongo_pool
+import service_supervisor
+import write_behind
+import stress_rollups
+from profile_cache import profile_cache
+from pagination import InvalidCursorError, fetch_page, iter_rows, parse_limit
+from streaming import HISTORY_STREAM_BATCH_SIZE, ndjson_response, wants_stream
+from datetime import datetime, timedelta, timezone
 import os
 from dotenv import load_dotenv
 import logging
+from model_registry import registry
+from micro_batcher import MicroBatcher, MicroBatcherBusyError
+
+# sklearn / the tree compiler are only imported when the model loads
+tree_compiler = lazy_import('tree_compiler')
 
 # Load environment variables
 load_dotenv()
@@ -16,34 +29,43 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000"])  # Added CORS configuration
+json_provider.init_app(app)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MongoDB configuration
-MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
-DB_NAME = os.getenv('DB_NAME', 'mentoradb')
+# Micro-batching of /predict inference (opt-in)
+MICROBATCH_ENABLED = os.getenv('STRESS_MICROBATCH', 'false').lower() in ('1', 'true', 'yes')
+MICROBATCH_MAX_ROWS = int(os.getenv('STRESS_MICROBATCH_MAX_ROWS', 64))
+MICROBATCH_WINDOW_MS = float(os.getenv('STRESS_MICROBATCH_WINDOW_MS', 2))
+MICROBATCH_SUBMIT_TIMEOUT_MS = float(os.getenv('STRESS_MICROBATCH_SUBMIT_TIMEOUT_MS', 100))
+MICROBATCH_RESULT_TIMEOUT_MS = float(os.getenv('STRESS_MICROBATCH_RESULT_TIMEOUT_MS', 2000))
 
 # Global variables for model artifacts
 model = None
 scaler = None
 metadata = None
+micro_batcher = None
 
 # Initialize MongoDB client globally
 client = None
 db = None
 users_collection = None
 predictions_collection = None
+stats_collection = None
 
 def initialize_db():
     """Initialize MongoDB connection"""
-    global client, db, users_collection, predictions_collection
+    global client, db, users_collection, predictions_collection, stats_collection
     try:
-        client = MongoClient(MONGO_URI)
-        db = client[DB_NAME]
+        # Shared, pooled client; pings so a down server fails fast instead of on the first write
+        client, db = mongo_pool.connect()
         users_collection = db['users']
         predictions_collection = db['stress_predictions']
+        stats_collection = db[stress_rollups.STATS_COLLECTION]
+        db_indexes.bootstrap_indexes(db, ['stress_predictions'])
+        profile_cache.watch(users_collection)
         logger.info("✅ Connected to MongoDB successfully")
         return True
     except Exception as e:
@@ -55,15 +77,12 @@ def load_model_artifacts():
     global model, scaler, metadata
     
     try:
-        model_dir = 'stress_models'
-        model_path = os.path.join(model_dir, 'stress_prediction_model.joblib')
-        scaler_path = os.path.join(model_dir, 'feature_scaler.joblib')
-        metadata_path = os.path.join(model_dir, 'model_metadata.joblib')
-        
-        if os.path.exists(model_path):
-            model = joblib.load(model_path)
-            scaler = joblib.load(scaler_path)
-            metadata = joblib.load(metadata_path)
+        model_dir = registry.family_dir('stress')
+        
+        if registry.exists('stress', 'stress_prediction_model'):
+            model = tree_compiler.compile_model(registry.load('stress', 'stress_prediction_model'))
+            scaler = tree_compiler.compile_scaler(registry.load('stress', 'feature_scaler'))
+            metadata = registry.load('stress', 'model_metadata')
             logger.info("✅ Model artifacts loaded successfully")
             return True
         else:
@@ -74,7 +93,7 @@ def load_model_artifacts():
         return False
 
 def get_user_profile(user_id):
-    """Get user profile data from users collection"""
+    """Get user profile data (age, gender, occupation) through the shared profile cache"""
     try:
         if users_collection is None:
             logger.warning("⚠️ Users collection not available")
@@ -85,20 +104,24 @@ def get_user_profile(user_id):
             logger.warning(f"⚠️ Invalid user ID format: {user_id}")
             return None
             
-        user = users_collection.find_one({'_id': ObjectId(user_id)})
+        user = profile_cache.get(users_collection, user_id)
         if not user:
             logger.warning(f"⚠️ User not found: {user_id}")
             return None
             
-        return {
-            'age': user.get('age', 30),
-            'gender': user.get('gender', 'Unknown'),
-            'occupation': user.get('occupation_or_academic_level', 'Student')
-        }
+        return profile_from_user(user)
     except Exception as e:
         logger.error(f"❌ Error fetching user profile: {e}")
         return None
 
+def profile_from_user(user):
+    """The profile preprocess_input needs, from a (projected) user document"""
+    return {
+        'age': user.get('age', 30),
+        'gender': user.get('gender', 'Unknown'),
+        'occupation': user.get('occupation_or_academic_level', 'Student')
+    }
+
 def estimate_bmi_category(height_cm, weight_kg):
     """Estimate BMI category based on height and weight"""
     try:
@@ -143,6 +166,7 @@ def estimate_bp(age, bmi_category):
     
     return round(systolic), round(diastolic)
 
+@metrics.timed('stress', 'preprocess')
 def preprocess_input(input_data, user_profile):
     """Preprocess input data for prediction"""
     try:
@@ -243,6 +267,64 @@ def preprocess_input(input_data, user_profile):
         logger.error(f"Error in preprocessing: {e}")
         raise
 
+def predict_feature_matrix(feature_matrix):
+    """Scale and score a stack of feature vectors with one call each"""
+    scaled_features = scaler.transform(feature_matrix)
+    return model.predict(scaled_features)
+
+@metrics.timed('stress', 'inference')
+def predict_stress_level(feature_vector):
+    """Predict one stress level, through the micro-batcher when it is running"""
+    if micro_batcher is not None and micro_batcher.running:
+        try:
+            return round(float(micro_batcher.predict(feature_vector)), 2)
+        except MicroBatcherBusyError as e:
+            # Don't let a full queue or a stuck batch hold the request; score the row here
+            logger.warning(f"{e}, predicting directly")
+    prediction = predict_feature_matrix([feature_vector])[0]
+    return round(float(prediction), 2)
+
+def start_micro_batcher():
+    """Start the /predict micro-batcher if enabled and the model is loaded"""
+    global micro_batcher
+    
+    if not MICROBATCH_ENABLED or model is None or micro_batcher is not None:
+        return micro_batcher
+    
+    micro_batcher = MicroBatcher(
+        predict_feature_matrix,
+        max_batch_size=MICROBATCH_MAX_ROWS,
+        max_wait_ms=MICROBATCH_WINDOW_MS,
+        submit_timeout_ms=MICROBATCH_SUBMIT_TIMEOUT_MS,
+        result_timeout_ms=MICROBATCH_RESULT_TIMEOUT_MS,
+        name='stress-micro-batcher'
+    )
+    micro_batcher.start()
+    return micro_batcher
+
+def load_inference():
+    """Load the model artifacts and start the micro-batcher"""
+    if not load_model_artifacts():
+        return False
+    start_micro_batcher()
+    return True
+
+# Boot timeline and on-demand model loading (see fast_start.py)
+startup_report = StartupReport('stress', families=('stress',))
+model_loader = ModelLoader(load_inference, startup_report, name='stress model')
+
+# Background probe of the database / model (see service_supervisor.py)
+supervisor = service_supervisor.ServiceSupervisor(
+    'stress', initialize_db, lambda: predictions_collection is not None, model_loader
+)
+service_supervisor.add_probe_routes(app, supervisor)
+metrics.add_metrics_route(app, 'stress')
+
+# Endpoints served even while the database is down
+UNGATED_ENDPOINTS = {'home', 'health_check'} | service_supervisor.PROBE_ENDPOINTS | metrics.METRICS_ENDPOINTS
+MODEL_ENDPOINTS = {'predict_stress'}
+
+@metrics.timed('stress', 'db_write')
 def save_prediction_to_db(user_id, input_data, prediction, prediction_id=None):
     """Save prediction data to MongoDB"""
     if predictions_collection is None:
@@ -250,25 +332,45 @@ def save_prediction_to_db(user_id, input_data, prediction, prediction_id=None):
         return None
     
     try:
-        # Create document to save
-        prediction_doc = {
-            'user_id': user_id,
-            'prediction_id': prediction_id or datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S_%f')[:-3],
-            'timestamp': datetime.now(timezone.utc),
-            'input_data': input_data,
-            'predicted_stress_level': prediction,
-            'stress_category': get_stress_category(prediction)
-        }
-        
-        # Insert into MongoDB
-        result = predictions_collection.insert_one(prediction_doc)
-        logger.info(f"✅ Prediction saved to MongoDB with ID: {result.inserted_id}")
-        return str(result.inserted_id)
+        prediction_doc = build_prediction_doc(user_id, input_data, prediction, prediction_id)
+        
+        # Insert into MongoDB (queued when write-behind is on); the per-user /stats
+        # rollup is updated once the document is stored, and a failure there only
+        # skews stats until a rebuild
+        inserted_id = write_behind.insert_document(
+            predictions_collection, prediction_doc,
+            after_write=lambda doc: stress_rollups.update_user_stats(predictions_collection, stats_collection, doc)
+        )
+        logger.info(f"✅ Prediction saved to MongoDB with ID: {inserted_id}")
+        return str(inserted_id)
         
     except Exception as e:
         logger.error(f"❌ Error saving to MongoDB: {e}")
         return None
 
+def build_prediction_doc(user_id, input_data, prediction, prediction_id=None):
+    """The stress_predictions document saved for one prediction"""
+    return {
+        'user_id': user_id,
+        'prediction_id': prediction_id or datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S_%f')[:-3],
+        'timestamp': datetime.now(timezone.utc),
+        'input_data': input_data,
+        'predicted_stress_level': prediction,
+        'stress_category': get_stress_category(prediction)
+    }
+
+def format_prediction(doc):
+    """A stored prediction as returned by /predictions/history and /predictions/<prediction_id>"""
+    # The JSON provider writes the ObjectId as a string and the (UTC) timestamp as ISO 8601
+    return {
+        'id': doc['_id'],
+        'prediction_id': doc.get('prediction_id', doc['_id']),
+        'timestamp': doc['timestamp'],
+        'predicted_stress_level': doc['predicted_stress_level'],
+        'stress_category': doc['stress_category'],
+        'input_data': doc['input_data']
+    }
+
 def get_stress_category(stress_level):
     """Categorize stress level"""
     if stress_level <= 3:
@@ -278,6 +380,19 @@ def get_stress_category(stress_level):
     else:
         return "High Stress"
 
+@app.before_request
+def check_connections():
+    """Fail fast with 503 while the supervisor reports the database or model unavailable"""
+    if request.endpoint is None or request.endpoint in UNGATED_ENDPOINTS or request.method == 'OPTIONS':
+        return None
+    
+    problem = supervisor.check(needs_models=request.endpoint in MODEL_ENDPOINTS)
+    if problem:
+        return jsonify({
+            'success': False,
+            'error': problem
+        }), 503, {'Retry-After': str(supervisor.retry_after())}
+
 # API Routes
 
 @app.route('/')
@@ -301,20 +416,19 @@ def health_check():
         'status': 'healthy',
         'timestamp': datetime.now(timezone.utc).isoformat(),
         'model_loaded': model is not None,
-        'database_connected': predictions_collection is not None
+        'database_connected': supervisor.database_up,
+        'supervisor': supervisor.status(),
+        'micro_batching': micro_batcher.stats() if micro_batcher is not None else {'running': False},
+        'startup': startup_report.summary(),
+        'mongo_pool': mongo_pool.pool_stats(),
+        'profile_cache': profile_cache.stats(),
+        'write_behind': write_behind.write_behind_stats()
     })
 
 @app.route('/predict', methods=['POST'])
 def predict_stress():
     """Main prediction endpoint"""
     try:
-        # Check if model is loaded
-        if model is None or scaler is None or metadata is None:
-            return jsonify({
-                'success': False,
-                'error': 'Model not loaded. Please ensure model files are available.'
-            }), 500
-        
         # Get JSON data from request
         data = request.get_json()
         
@@ -343,12 +457,8 @@ def predict_stress():
         # Preprocess input data
         feature_vector = preprocess_input(data, user_profile)
         
-        # Scale features
-        scaled_features = scaler.transform([feature_vector])
-        
-        # Make prediction
-        prediction = model.predict(scaled_features)[0]
-        prediction = round(float(prediction), 2)
+        # Scale features and make prediction
+        prediction = predict_stress_level(feature_vector)
         
         # Save to database
         db_id = save_prediction_to_db(user_id, data, prediction)
@@ -404,7 +514,7 @@ def get_prediction_history():
         
         # Get query parameters
         try:
-            limit = int(request.args.get('limit', 10))
+            limit = parse_limit(request.args.get('limit'))
             skip = int(request.args.get('skip', 0))
         except ValueError:
             return jsonify({
@@ -412,29 +522,29 @@ def get_prediction_history():
                 'error': 'Invalid limit or skip value'
             }), 400
         
-        # Query database for user's predictions
-        cursor = predictions_collection.find({'user_id': user_id}).sort('timestamp', -1).skip(skip).limit(limit)
-        predictions = []
-        
-        for doc in cursor:
-            predictions.append({
-                'id': str(doc['_id']),
-                'prediction_id': doc.get('prediction_id', str(doc['_id'])),
-                'timestamp': doc['timestamp'].replace(tzinfo=timezone.utc).isoformat(),
-                'predicted_stress_level': doc['predicted_stress_level'],
-                'stress_category': doc['stress_category'],
-                'input_data': doc['input_data']
-            })
+        # Query database for user's predictions, seeking past the cursor when given
+        query_filter = {'user_id': user_id}
+        docs, next_cursor = fetch_page(
+            predictions_collection, query_filter, 'timestamp', -1, limit,
+            cursor=request.args.get('cursor'), skip=skip
+        )
+        predictions = [format_prediction(doc) for doc in docs]
         
-        total_count = predictions_collection.count_documents({'user_id': user_id})
+        total_count = predictions_collection.count_documents(query_filter)
         
         return jsonify({
             'success': True,
             'predictions': predictions,
             'total_count': total_count,
-            'returned_count': len(predictions)
+            'returned_count': len(predictions),
+            'next_cursor': next_cursor
         })
         
+    except InvalidCursorError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         logger.error(f"❌ Error fetching history: {e}")
         return jsonify({
@@ -468,18 +578,9 @@ def get_prediction_by_id(prediction_id):
                 'error': 'Prediction not found'
             }), 404
         
-        prediction = {
-            'id': str(doc['_id']),
-            'prediction_id': doc.get('prediction_id', str(doc['_id'])),
-            'timestamp': doc['timestamp'].replace(tzinfo=timezone.utc).isoformat(),
-            'predicted_stress_level': doc['predicted_stress_level'],
-            'stress_category': doc['stress_category'],
-            'input_data': doc['input_data']
-        }
-        
         return jsonify({
             'success': True,
-            'prediction': prediction
+            'prediction': format_prediction(doc)
         })
         
     except Exception as e:
@@ -507,54 +608,8 @@ def get_prediction_stats():
                 'error': 'User ID is required'
             }), 400
         
-        # Aggregate statistics for user
-        pipeline = [
-            {'$match': {'user_id': user_id}},
-            {
-                '$group': {
-                    '_id': None,
-                    'total_predictions': {'$sum': 1},
-                    'avg_stress_level': {'$avg': '$predicted_stress_level'},
-                    'min_stress_level': {'$min': '$predicted_stress_level'},
-                    'max_stress_level': {'$max': '$predicted_stress_level'}
-                }
-            }
-        ]
-        
-        result = list(predictions_collection.aggregate(pipeline))
-        
-        if result:
-            stats = result[0]
-            stats.pop('_id', None)
-            stats['avg_stress_level'] = round(stats.get('avg_stress_level', 0), 2)
-            stats['min_stress_level'] = stats.get('min_stress_level', 0)
-            stats['max_stress_level'] = stats.get('max_stress_level', 0)
-        else:
-            stats = {
-                'total_predictions': 0,
-                'avg_stress_level': 0,
-                'min_stress_level': 0,
-                'max_stress_level': 0
-            }
-        
-        # Get stress category distribution for user
-        category_pipeline = [
-            {'$match': {'user_id': user_id}},
-            {
-                '$group': {
-                    '_id': '$stress_category',
-                    'count': {'$sum': 1}
-                }
-            }
-        ]
-        
-        category_result = list(predictions_collection.aggregate(category_pipeline))
-        category_distribution = {item['_id']: item['count'] for item in category_result}
-        
-        # Add missing categories with zero count
-        for category in ["Low Stress", "Medium Stress", "High Stress"]:
-            if category not in category_distribution:
-                category_distribution[category] = 0
+        # Single point read of the incrementally maintained rollup
+        stats, category_distribution = stress_rollups.get_user_stats(predictions_collection, stats_collection, user_id)
         
         return jsonify({
             'success': True,
@@ -569,6 +624,75 @@ def get_prediction_stats():
             'error': f'Failed to fetch stats: {str(e)}'
         }), 500
     
+# Only the fields format_history_entry reads
+HISTORY_PROJECTION = {
+    'timestamp': 1,
+    'predicted_stress_level': 1,
+    'stress_category': 1,
+    'input_data.quality_of_sleep': 1,
+    'input_data.physical_activity_level': 1,
+    'input_data.daily_steps': 1
+}
+
+def format_history_entry(doc):
+    """One /stresshistory row from a stress_predictions document"""
+    return {
+        'id': doc['_id'],
+        'timestamp': doc['timestamp'],
+        'stress_level': doc['predicted_stress_level'],
+        'stress_category': doc['stress_category'],
+        'input_summary': {
+            'sleep_quality': doc['input_data'].get('quality_of_sleep'),
+            'physical_activity': doc['input_data'].get('physical_activity_level'),
+            'daily_steps': doc['input_data'].get('daily_steps')
+        }
+    }
+
+def build_history_filter(user_id, args):
+    """
+    /stresshistory query filter from its query-string arguments; raises ValueError
+    with the client-facing message for invalid values.
+    start_date and end_date are UTC days (YYYY-MM-DD).
+    """
+    query_filter = {'user_id': user_id}
+    
+    # Date range filtering
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    if start_date or end_date:
+        date_filter = {}
+        try:
+            if start_date:
+                date_filter['$gte'] = datetime.strptime(start_date, '%Y-%m-%d')
+            if end_date:
+                date_filter['$lt'] = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+        except ValueError:
+            raise ValueError('Invalid date format. Use YYYY-MM-DD')
+        query_filter['timestamp'] = date_filter
+    
+    # Stress level filtering
+    min_stress = args.get('min_stress')
+    max_stress = args.get('max_stress')
+    if min_stress or max_stress:
+        stress_filter = {}
+        try:
+            if min_stress:
+                stress_filter['$gte'] = float(min_stress)
+            if max_stress:
+                stress_filter['$lte'] = float(max_stress)
+        except ValueError:
+            raise ValueError('Stress levels must be numeric')
+        query_filter['predicted_stress_level'] = stress_filter
+    
+    # Stress category filtering
+    category = args.get('category')
+    if category:
+        if category not in stress_rollups.STRESS_CATEGORIES:
+            raise ValueError('Invalid category. Valid options: Low Stress, Medium Stress, High Stress')
+        query_filter['stress_category'] = category
+    
+    return query_filter
+
 @app.route('/stresshistory', methods=['GET'])
 def get_stress_history():
     """Get stress prediction history with filtering options"""
@@ -588,57 +712,13 @@ def get_stress_history():
             }), 400
         
         # Build query filters
-        query_filter = {'user_id': user_id}
-        
-        # Note: start_date and end_date should be in UTC (YYYY-MM-DD format)
-        # Date range filtering
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        
-        if start_date or end_date:
-            date_filter = {}
-            try:
-                if start_date:
-                    start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                    date_filter['$gte'] = start_dt
-                if end_date:
-                    end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-                    date_filter['$lt'] = end_dt
-                query_filter['timestamp'] = date_filter
-            except ValueError:
-                return jsonify({
-                    'success': False,
-                    'error': 'Invalid date format. Use YYYY-MM-DD'
-                }), 400
-        
-        # Stress level filtering
-        min_stress = request.args.get('min_stress')
-        max_stress = request.args.get('max_stress')
-        
-        if min_stress or max_stress:
-            stress_filter = {}
-            try:
-                if min_stress:
-                    stress_filter['$gte'] = float(min_stress)
-                if max_stress:
-                    stress_filter['$lte'] = float(max_stress)
-                query_filter['predicted_stress_level'] = stress_filter
-            except ValueError:
-                return jsonify({
-                    'success': False,
-                    'error': 'Stress levels must be numeric'
-                }), 400
-        
-        # Stress category filtering
-        category = request.args.get('category')
-        if category:
-            valid_categories = ['Low Stress', 'Medium Stress', 'High Stress']
-            if category not in valid_categories:
-                return jsonify({
-                    'success': False,
-                    'error': 'Invalid category. Valid options: Low Stress, Medium Stress, High Stress'
-                }), 400
-            query_filter['stress_category'] = category
+        try:
+            query_filter = build_history_filter(user_id, request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
         # Sorting options
         sort_order = -1  # Default: newest first
@@ -648,7 +728,7 @@ def get_stress_history():
         
         # Pagination parameters
         try:
-            limit = int(request.args.get('limit', 10))
+            limit = parse_limit(request.args.get('limit'))
             skip = int(request.args.get('skip', 0))
         except ValueError:
             return jsonify({
@@ -656,23 +736,21 @@ def get_stress_history():
                 'error': 'Invalid limit or skip value'
             }), 400
         
-        # Query database with filters
-        cursor = predictions_collection.find(query_filter).sort('timestamp', sort_order).skip(skip).limit(limit)
-        
-        # Format results
-        predictions = []
-        for doc in cursor:
-            predictions.append({
-                'id': str(doc['_id']),
-                'timestamp': doc['timestamp'].replace(tzinfo=timezone.utc).isoformat(),
-                'stress_level': doc['predicted_stress_level'],
-                'stress_category': doc['stress_category'],
-                'input_summary': {
-                    'sleep_quality': doc['input_data'].get('quality_of_sleep'),
-                    'physical_activity': doc['input_data'].get('physical_activity_level'),
-                    'daily_steps': doc['input_data'].get('daily_steps')
-                }
-            })
+        # Stream every matching prediction (or up to an explicit limit) as NDJSON when asked
+        if wants_stream(request):
+            rows = iter_rows(
+                predictions_collection, query_filter, 'timestamp', sort_order,
+                cursor=request.args.get('cursor'), projection=HISTORY_PROJECTION,
+                batch_size=HISTORY_STREAM_BATCH_SIZE, limit=limit if request.args.get('limit') else None, skip=skip
+            )
+            return ndjson_response(rows, format_history_entry)
+        
+        # Query database with filters, seeking past the cursor when given
+        docs, next_cursor = fetch_page(
+            predictions_collection, query_filter, 'timestamp', sort_order, limit,
+            cursor=request.args.get('cursor'), projection=HISTORY_PROJECTION, skip=skip
+        )
+        predictions = [format_history_entry(doc) for doc in docs]
         
         # Get total count for pagination
         total_count = predictions_collection.count_documents(query_filter)
@@ -681,9 +759,15 @@ def get_stress_history():
             'success': True,
             'predictions': predictions,
             'total_count': total_count,
-            'returned_count': len(predictions)
+            'returned_count': len(predictions),
+            'next_cursor': next_cursor
         })
         
+    except InvalidCursorError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         logger.error(f"❌ Error fetching stress history: {e}")
         return jsonify({
@@ -711,22 +795,21 @@ def initialize_app():
     logger.info("🚀 Starting Flask application...")
     
     # Initialize database
-    if not initialize_db():
-        logger.error("❌ Failed to initialize database")
+    with startup_report.phase('database'):
+        if not initialize_db():
+            logger.error("❌ Failed to initialize database")
+    # Start the write-behind flusher (if enabled) on the main thread so SIGTERM flushes it
+    write_behind.get_write_queue()
     
-    # Load model artifacts
-    if not load_model_artifacts():
+    # Load model artifacts (deferred to first use / background warm-up with FAST_START=true)
+    if not model_loader.boot():
         logger.warning("⚠️ Model artifacts not loaded. Prediction endpoint will not work.")
     
-    # Create indexes if database is connected
-    if predictions_collection is not None:
-        try:
-            predictions_collection.create_index([("timestamp", -1)])
-            predictions_collection.create_index([("user_id", 1)])
-            predictions_collection.create_index([("prediction_id", 1)], unique=True, sparse=True)
-            logger.info("✅ Database indexes created/verified")
-        except Exception as e:
-            logger.warning(f"⚠️ Database index creation warning: {e}")
+    # Reconnect / retry failed loads in the background from here on
+    supervisor.start()
+    
+    startup_report.ready()
+    startup_report.log()
 
 if __name__ == '__main__':
     initialize_app()
@@ -0,0 +1,697 @@
+"""
+ASGI entry point for the stress prediction API.
+
+Serves the same routes and response shapes as stress.py with async handlers,
+so one event loop can hold many concurrent requests that are waiting on
+MongoDB. It is a plain ASGI callable (no framework dependency); run it with
+any ASGI server from the backend directory, e.g.
+
+    pip install -r requirements-asgi.txt     (from the repository root: motor + uvicorn)
+    uvicorn stress_asgi:app --port 5001
+
+Data access goes through an async store chosen by STRESS_ASGI_STORE:
+
+- mongo (default): MotorStressStore, MongoDB through motor with the pool
+  settings of mongo_pool.py (motor must be installed)
+- memory: InMemoryStressStore, the same interface over the in-process
+  MongoDB stand-in (memory_mongo.py), for running, testing and benchmarking
+  without a server
+
+Preprocessing and model.predict are CPU-bound, so they run on a bounded thread
+pool (STRESS_ASGI_INFERENCE_WORKERS) instead of the event loop. At most
+STRESS_ASGI_MAX_PENDING more requests wait for it; beyond that /predict gets
+503 with Retry-After. The store is pinged in the background the way
+service_supervisor.py probes the Flask services, and data routes get 503 while
+it is down.
+
+GET /metrics serves the stage and request histograms of metrics.py; stages
+are labelled with the handler name, as the Flask app labels them with its
+endpoint.
+
+Usage:
+    python stress_asgi.py bench [requests] [concurrency]
+
+bench drives the app in-process on the in-memory store and prints throughput
+and latency percentiles for /predict and /stresshistory.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl
+from bson import ObjectId
+import json_provider
+import metrics
+import mongo_pool
+import service_supervisor
+import stress
+import stress_rollups
+from memory_mongo import MemoryClient
+from pagination import InvalidCursorError, fetch_page, finish_page, page_query, parse_limit
+from profile_cache import PROFILE_PROJECTION, profile_cache
+
+logger = logging.getLogger(__name__)
+
+STRESS_ASGI_STORE = os.getenv('STRESS_ASGI_STORE', 'mongo').lower()
+STRESS_ASGI_INFERENCE_WORKERS = int(os.getenv('STRESS_ASGI_INFERENCE_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+STRESS_ASGI_MAX_PENDING = int(os.getenv('STRESS_ASGI_MAX_PENDING', 64))
+STRESS_ASGI_RETRY_AFTER_S = int(os.getenv('STRESS_ASGI_RETRY_AFTER_S', 1))
+
+# Same origins as the Flask app's CORS configuration
+CORS_ORIGINS = {'http://localhost:3000', 'http://127.0.0.1:3000'}
+
+
+class MotorStressStore:
+    """Async access to users / stress_predictions / stress_user_stats through motor"""
+
+    name = 'mongo'
+
+    def __init__(self, uri=None, db_name=None):
+        try:
+            from motor.motor_asyncio import AsyncIOMotorClient
+        except ImportError:
+            raise RuntimeError("STRESS_ASGI_STORE=mongo needs the motor package (pip install -r requirements-asgi.txt); "
+                               "use STRESS_ASGI_STORE=memory to run without MongoDB")
+        # Created inside the running event loop, which motor binds to
+        self.client = AsyncIOMotorClient(uri or mongo_pool.MONGO_URI, **mongo_pool.POOL_OPTIONS)
+        db = self.client[db_name or mongo_pool.DB_NAME]
+        self.users = db['users']
+        self.predictions = db['stress_predictions']
+        self.stats = db[stress_rollups.STATS_COLLECTION]
+
+    async def ping(self):
+        await self.client.admin.command('ping')
+
+    async def find_user(self, user_id):
+        return await self.users.find_one({'_id': ObjectId(user_id)}, PROFILE_PROJECTION)
+
+    async def insert_prediction(self, doc):
+        result = await self.predictions.insert_one(doc)
+        # Same rollup maintenance as stress_rollups.update_user_stats (no rebuild on the write path)
+        update = stress_rollups.rollup_update(doc['predicted_stress_level'], doc['stress_category'], doc['timestamp'])
+        await self.stats.update_one({'_id': doc['user_id']}, update, upsert=True)
+        return result.inserted_id
+
+    async def find_page(self, query_filter, sort_field, direction, limit, cursor=None, projection=None, skip=0):
+        find_filter, projection, sort = page_query(query_filter, sort_field, direction, cursor, projection)
+        query = self.predictions.find(find_filter, projection).sort(sort)
+        if skip and not cursor:
+            query = query.skip(skip)
+        docs = await query.limit(limit + 1).to_list(limit + 1)
+        return finish_page(docs, limit, query_filter, sort_field, direction)
+
+    async def count_predictions(self, query_filter):
+        return await self.predictions.count_documents(query_filter)
+
+    async def find_prediction(self, prediction_id):
+        doc = None
+        if ObjectId.is_valid(prediction_id):
+            doc = await self.predictions.find_one({'_id': ObjectId(prediction_id)})
+        return doc or await self.predictions.find_one({'prediction_id': prediction_id})
+
+    async def get_user_stats(self, user_id):
+        rollup = await self.stats.find_one({'_id': user_id})
+        if rollup is None and await self.predictions.find_one({'user_id': user_id}, {'_id': 1}) is not None:
+            await self._rebuild_stats(user_id)
+            rollup = await self.stats.find_one({'_id': user_id})
+        return stress_rollups.format_stats(rollup)
+
+    async def _rebuild_stats(self, user_id):
+        now = datetime.now(timezone.utc)
+        pipeline = stress_rollups.rollup_pipeline({'user_id': user_id})
+        async for row in self.predictions.aggregate(pipeline):
+            row = stress_rollups.rollup_document(row, now)
+            await self.stats.replace_one({'_id': row['_id']}, row, upsert=True)
+
+    async def close(self):
+        self.client.close()
+
+
+class InMemoryStressStore:
+    """
+    MotorStressStore's coroutines over memory_mongo collections, for tests,
+    benchmarks and running the API without MongoDB. Reads and writes go through
+    the same pagination / stress_rollups helpers as the Flask app. Not shared
+    between processes and not persisted.
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        db = MemoryClient()[mongo_pool.DB_NAME]
+        self.users = db['users']
+        self.predictions = db['stress_predictions']
+        self.stats = db[stress_rollups.STATS_COLLECTION]
+        self.available = True
+
+    def add_user(self, age=30, gender='Unknown', occupation='Student', user_id=None):
+        """Register a user profile; returns its id as a string"""
+        user_id = ObjectId(user_id) if user_id else ObjectId()
+        self.users.insert_one({'_id': user_id, 'age': age, 'gender': gender,
+                               'occupation_or_academic_level': occupation})
+        return str(user_id)
+
+    async def ping(self):
+        if not self.available:
+            raise ConnectionError('in-memory store marked unavailable')
+
+    async def find_user(self, user_id):
+        return self.users.find_one({'_id': ObjectId(user_id)}, PROFILE_PROJECTION)
+
+    async def insert_prediction(self, doc):
+        inserted_id = self.predictions.insert_one(doc).inserted_id
+        stress_rollups.update_user_stats(self.predictions, self.stats, doc)
+        return inserted_id
+
+    async def find_page(self, query_filter, sort_field, direction, limit, cursor=None, projection=None, skip=0):
+        return fetch_page(self.predictions, query_filter, sort_field, direction, limit,
+                          cursor=cursor, projection=projection, skip=skip)
+
+    async def count_predictions(self, query_filter):
+        return self.predictions.count_documents(query_filter)
+
+    async def find_prediction(self, prediction_id):
+        doc = None
+        if ObjectId.is_valid(prediction_id):
+            doc = self.predictions.find_one({'_id': ObjectId(prediction_id)})
+        return doc or self.predictions.find_one({'prediction_id': prediction_id})
+
+    async def get_user_stats(self, user_id):
+        return stress_rollups.get_user_stats(self.predictions, self.stats, user_id)
+
+    async def close(self):
+        pass
+
+
+def create_store(kind=STRESS_ASGI_STORE):
+    if kind == 'memory':
+        return InMemoryStressStore()
+    if kind == 'mongo':
+        return MotorStressStore()
+    raise ValueError(f"Unknown STRESS_ASGI_STORE {kind!r} (expected 'mongo' or 'memory')")
+
+
+class InferenceBusyError(RuntimeError):
+    """Raised when the inference pool already has its maximum of pending requests"""
+
+
+class InferencePool:
+    """Runs CPU-bound prediction work on a size-limited thread pool with bounded admission"""
+
+    def __init__(self, workers=STRESS_ASGI_INFERENCE_WORKERS, max_pending=STRESS_ASGI_MAX_PENDING):
+        self.workers = max(1, int(workers))
+        self.max_pending = max(0, int(max_pending))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='stress-inference')
+        self._slots = None
+
+        # Counters for health endpoints
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers + self.max_pending)
+        if self._slots.locked():
+            self.rejected += 1
+            raise InferenceBusyError('Inference queue is full')
+        async with self._slots:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                # Copy the context so the work is labelled with the caller's endpoint
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._executor, contextvars.copy_context().run, fn, *args
+                )
+            finally:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'in_flight': self.in_flight,
+            'queue_depth': max(0, self.in_flight - self.workers),
+            'peak_in_flight': self.peak_in_flight,
+            'completed': self.completed,
+            'rejected': self.rejected
+        }
+
+
+def infer(data, user_profile):
+    """Preprocess and score one request (runs on the inference pool)"""
+    return stress.predict_stress_level(stress.preprocess_input(data, user_profile))
+
+
+class HTTPError(Exception):
+    def __init__(self, status, error, headers=()):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+        self.headers = headers
+
+
+class StressASGIApp:
+    """The stress API as an ASGI application over an async store"""
+
+    def __init__(self, store=None, inference=None, interval=service_supervisor.SUPERVISOR_INTERVAL_S,
+                 probe_timeout=service_supervisor.SUPERVISOR_PROBE_TIMEOUT_S):
+        self.store = store
+        self.inference = inference or InferencePool()
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.database_up = False
+        self.database_error = None
+        self._started = None
+        self._monitor = None
+        self._next_probe_at = 0.0
+        self._routes = {
+            '/': {'GET': self.home},
+            '/health': {'GET': self.health_check},
+            '/predict': {'POST': self.predict_stress},
+            '/predictions/history': {'GET': self.get_prediction_history},
+            '/stats': {'GET': self.get_prediction_stats},
+            '/stresshistory': {'GET': self.get_stress_history}
+        }
+
+    # Lifecycle
+
+    async def startup(self):
+        """Create the store, load the model and start the store monitor (once)"""
+        if self._started is None:
+            self._started = asyncio.ensure_future(self._startup())
+        await self._started
+
+    async def _startup(self):
+        if self.store is None:
+            self.store = create_store()
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, stress.model_loader.ensure, 'startup'):
+            logger.warning("⚠️ Model artifacts not loaded. Prediction endpoint will not work.")
+        await self._probe()
+        self._monitor = asyncio.ensure_future(self._monitor_store())
+        # Also removes fast_start's import-timing hook
+        stress.startup_report.ready()
+        logger.info(f"✅ Stress ASGI app ready ({self.store.name} store)")
+
+    async def shutdown(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+        if self.store is not None:
+            await self.store.close()
+        self.inference.shutdown()
+
+    async def _probe(self):
+        try:
+            await asyncio.wait_for(self.store.ping(), self.probe_timeout)
+        except Exception as e:
+            if self.database_up:
+                logger.warning(f"stress-asgi: database unavailable, requests will get 503: {e}")
+            self.database_up = False
+            self.database_error = str(e) or type(e).__name__
+            return False
+        if not self.database_up and self.database_error:
+            logger.info("stress-asgi: database available again")
+        self.database_up = True
+        self.database_error = None
+        return True
+
+    async def _monitor_store(self):
+        backoff = service_supervisor.SUPERVISOR_MIN_BACKOFF_S
+        while True:
+            if await self._probe():
+                delay, backoff = self.interval, service_supervisor.SUPERVISOR_MIN_BACKOFF_S
+            else:
+                delay, backoff = backoff, min(backoff * 2, service_supervisor.SUPERVISOR_MAX_BACKOFF_S)
+            self._next_probe_at = time.monotonic() + delay
+            await asyncio.sleep(delay)
+
+    def _unavailable(self, error):
+        retry_after = max(1, math.ceil(self._next_probe_at - time.monotonic()))
+        return HTTPError(503, error, [(b'retry-after', str(retry_after).encode())])
+
+    def _require_database(self):
+        if not self.database_up:
+            raise self._unavailable('Database unavailable')
+
+    # ASGI
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as e:
+                    logger.error(f"❌ Stress ASGI startup failed: {e}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        cors = self._cors_headers(headers.get('origin'))
+        method = scope['method']
+        if method == 'OPTIONS':
+            await _send(send, 200, b'', cors + [
+                (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                (b'access-control-allow-headers', headers.get('access-control-request-headers', '').encode())
+            ])
+            return
+        if scope['path'] == '/metrics' and method == 'GET' and metrics.METRICS_ENABLED:
+            await _send(send, 200, metrics.exposition().encode('utf-8'),
+                        [(b'content-type', metrics.CONTENT_TYPE.encode())] + cors)
+            return
+
+        started = time.perf_counter()
+        endpoint = 'unmatched'
+        try:
+            # Servers without lifespan support start the app on the first request
+            await self.startup()
+            handler, path_args = self._route(scope['path'], method)
+            endpoint = handler.__name__
+            args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+            body = await _read_body(receive) if method == 'POST' else b''
+            with metrics.endpoint_label(endpoint):
+                payload = await handler(args, body, *path_args)
+            status, extra_headers = 200, []
+        except HTTPError as e:
+            status, payload, extra_headers = e.status, {'success': False, 'error': e.error}, list(e.headers)
+        except Exception as e:
+            logger.error(f"❌ Unhandled error on {method} {scope['path']}: {e}")
+            status, payload, extra_headers = 500, {'success': False, 'error': 'Internal server error'}, []
+        await _send(send, status, json_provider.dumps(payload),
+                    [(b'content-type', b'application/json')] + cors + extra_headers)
+        if metrics.METRICS_ENABLED:
+            metrics.REQUEST_SECONDS.observe(('stress', endpoint, str(status)), time.perf_counter() - started)
+
+    def _route(self, path, method):
+        path = path.rstrip('/') or '/'
+        path_args = ()
+        methods = self._routes.get(path)
+        if methods is None and path.startswith('/predictions/') and path.count('/') == 2:
+            methods = {'GET': self.get_prediction_by_id}
+            path_args = (path.rsplit('/', 1)[1],)
+        if methods is None:
+            raise HTTPError(404, 'Endpoint not found')
+        if method not in methods:
+            raise HTTPError(405, 'Method not allowed')
+        return methods[method], path_args
+
+    @staticmethod
+    def _cors_headers(origin):
+        if origin not in CORS_ORIGINS:
+            return []
+        return [(b'access-control-allow-origin', origin.encode()), (b'vary', b'Origin')]
+
+    # Routes (same responses as stress.py)
+
+    async def home(self, args, body):
+        return {
+            'message': 'Welcome to the Stress Prediction API',
+            'endpoints': {
+                'health_check': '/health (GET)',
+                'predict': '/predict (POST)',
+                'history': '/predictions/history?user_id=<user_id> (GET)',
+                'prediction_by_id': '/predictions/<prediction_id> (GET)',
+                'stats': '/stats?user_id=<user_id> (GET)'
+            }
+        }
+
+    async def health_check(self, args, body):
+        return {
+            'status': 'healthy',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'model_loaded': stress.model is not None,
+            'database_connected': self.database_up,
+            'store': {'type': self.store.name, 'up': self.database_up, 'last_error': self.database_error},
+            'inference': self.inference.stats(),
+            'micro_batching': stress.micro_batcher.stats() if stress.micro_batcher is not None else {'running': False},
+            'profile_cache': profile_cache.stats()
+        }
+
+    async def predict_stress(self, args, body):
+        self._require_database()
+        if not stress.model_loader.loaded:
+            raise self._unavailable('Models unavailable')
+
+        try:
+            data = json_provider.loads(body) if body else None
+        except ValueError:
+            raise HTTPError(400, 'Invalid JSON body')
+        if not data:
+            raise HTTPError(400, 'No data provided')
+
+        user_id = data.get('user_id')
+        if not user_id:
+            raise HTTPError(400, 'User ID is required')
+
+        user_profile = await self._get_user_profile(user_id)
+        if not user_profile:
+            raise HTTPError(404, 'User profile not found')
+
+        try:
+            prediction = await self.inference.run(infer, data, user_profile)
+        except InferenceBusyError as e:
+            raise HTTPError(503, str(e), [(b'retry-after', str(STRESS_ASGI_RETRY_AFTER_S).encode())])
+        except Exception as e:
+            logger.error(f"❌ Prediction error: {e}")
+            raise HTTPError(500, f'Prediction failed: {str(e)}')
+
+        db_id = None
+        try:
+            with metrics.stage('stress', 'db_write'):
+                db_id = str(await self.store.insert_prediction(stress.build_prediction_doc(user_id, data, prediction)))
+        except Exception as e:
+            logger.error(f"❌ Error saving prediction: {e}")
+
+        logger.info(f"✅ Prediction successful: {prediction}")
+        return {
+            'success': True,
+            'prediction': {
+                'stress_level': prediction,
+                'stress_category': stress.get_stress_category(prediction),
+                'confidence_interval': {
+                    'lower': max(1.0, prediction - 0.5),
+                    'upper': min(10.0, prediction + 0.5)
+                }
+            },
+            'input_summary': {
+                'age': user_profile['age'],
+                'occupation': user_profile['occupation'],
+                'sleep_quality': data.get('quality_of_sleep', 7.0),
+                'physical_activity': data.get('physical_activity_level', 50)
+            },
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'database_id': db_id
+        }
+
+    async def _get_user_profile(self, user_id):
+        """Profile through the shared profile cache, fetched from the store on a miss"""
+        if not ObjectId.is_valid(user_id):
+            return None
+        user = profile_cache.cached(user_id)
+        if user is None:
+            generation = profile_cache.generation()
+            user = await self.store.find_user(user_id)
+            if user is None:
+                return None
+            user = profile_cache.remember(user_id, user, generation)
+        return stress.profile_from_user(user)
+
+    async def _history_page(self, args, query_filter, sort_order, projection, render):
+        try:
+            limit = parse_limit(args.get('limit'))
+            skip = int(args.get('skip', 0))
+        except ValueError:
+            raise HTTPError(400, 'Invalid limit or skip value')
+
+        try:
+            docs, next_cursor = await self.store.find_page(
+                query_filter, 'timestamp', sort_order, limit,
+                cursor=args.get('cursor'), projection=projection, skip=skip
+            )
+        except InvalidCursorError as e:
+            raise HTTPError(400, str(e))
+        predictions = [render(doc) for doc in docs]
+
+        return {
+            'success': True,
+            'predictions': predictions,
+            'total_count': await self.store.count_predictions(query_filter),
+            'returned_count': len(predictions),
+            'next_cursor': next_cursor
+        }
+
+    async def get_prediction_history(self, args, body):
+        self._require_database()
+        user_id = args.get('user_id')
+        if not user_id:
+            raise HTTPError(400, 'User ID is required')
+        return await self._history_page(args, {'user_id': user_id}, -1, None, stress.format_prediction)
+
+    async def get_prediction_by_id(self, args, body, prediction_id):
+        self._require_database()
+        doc = await self.store.find_prediction(prediction_id)
+        if not doc:
+            raise HTTPError(404, 'Prediction not found')
+        return {'success': True, 'prediction': stress.format_prediction(doc)}
+
+    async def get_prediction_stats(self, args, body):
+        self._require_database()
+        user_id = args.get('user_id')
+        if not user_id:
+            raise HTTPError(400, 'User ID is required')
+        stats, category_distribution = await self.store.get_user_stats(user_id)
+        return {'success': True, 'stats': stats, 'category_distribution': category_distribution}
+
+    async def get_stress_history(self, args, body):
+        self._require_database()
+        user_id = args.get('user_id')
+        if not user_id:
+            raise HTTPError(400, 'User ID is required')
+        try:
+            query_filter = stress.build_history_filter(user_id, args)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        sort_order = 1 if args.get('sort') == 'oldest' else -1
+        return await self._history_page(args, query_filter, sort_order, stress.HISTORY_PROJECTION,
+                                        stress.format_history_entry)
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def _send(send, status, body, headers):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': headers + [(b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def call(app, method, path, query='', body=None):
+    """One in-process request to an ASGI app; returns (status, parsed JSON body)"""
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode('latin-1'),
+             'headers': [(b'content-type', b'application/json')]}
+    sent = []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {'type': 'http.disconnect'}
+        received = True
+        return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    response_body = b''.join(message.get('body', b'') for message in sent if message['type'] == 'http.response.body')
+    return sent[0]['status'], json.loads(response_body) if response_body else None
+
+
+app = StressASGIApp()
+
+
+# Benchmark
+
+SAMPLE_INPUT = {
+    'sleep_duration': 7.0,
+    'quality_of_sleep': 6,
+    'physical_activity_level': 45,
+    'bmi_category': 'Normal',
+    'heart_rate': 72,
+    'daily_steps': 6000,
+    'systolic_bp': 120,
+    'diastolic_bp': 80
+}
+
+
+def _latency_summary(samples):
+    samples = sorted(samples)
+    if not samples:
+        return 'no samples'
+
+    def percentile(fraction):
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+    return f"p50 {percentile(0.5):.2f} ms, p95 {percentile(0.95):.2f} ms, max {samples[-1] * 1000:.2f} ms"
+
+
+async def bench(requests=2000, concurrency=64, users=50):
+    """Drive the app in-process on the in-memory store; prints throughput and latency"""
+    store = InMemoryStressStore()
+    user_ids = [store.add_user(age=20 + i % 40, gender=('Male', 'Female')[i % 2]) for i in range(users)]
+    bench_app = StressASGIApp(store=store)
+    await bench_app.startup()
+    if not stress.model_loader.loaded:
+        print("✗ Stress model not loaded; bench needs the model artifacts")
+        return False
+
+    async def worker(method, path, make_request, latencies, statuses):
+        for i in requests_iter:
+            query, body = make_request(i)
+            started = time.perf_counter()
+            status, _ = await call(bench_app, method, path, query, body)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    cases = [
+        ('POST', '/predict', lambda i: ('', dict(SAMPLE_INPUT, user_id=user_ids[i % users]))),
+        ('GET', '/stresshistory', lambda i: (f'user_id={user_ids[i % users]}&limit=20', None))
+    ]
+    for method, path, make_request in cases:
+        requests_iter = iter(range(requests))
+        latencies, statuses = [], {}
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(method, path, make_request, latencies, statuses) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        print(f"{method} {path}: {requests} requests, concurrency {concurrency}, "
+              f"{requests / elapsed:.0f} req/s, {_latency_summary(latencies)}, statuses {statuses}")
+
+    print(f"inference pool: {bench_app.inference.stats()}")
+    await bench_app.shutdown()
+    return True
+
+
+if __name__ == '__main__':
+    # stress.py configures INFO logging on import; keep per-request logs out of the results
+    logging.getLogger().setLevel(logging.WARNING)
+    if len(sys.argv) < 2 or sys.argv[1] != 'bench':
+        print(__doc__)
+        sys.exit(2)
+
+    numbers = [int(argument) for argument in sys.argv[2:4]]
+    sys.exit(0 if asyncio.run(bench(*numbers)) else 1)
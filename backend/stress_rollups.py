@@ -0,0 +1,162 @@
+"""
+Per-user stress prediction rollups.
+
+One stress_user_stats document per user (keyed by user_id) holds the running
+count, sum, min and max of predicted stress levels and a count per stress
+category. save_prediction_to_db updates it atomically with $inc / $min / $max
+after each insert, so /stats is a single point read however much history a
+user has.
+
+Usage:
+    python stress_rollups.py rebuild [user_id ...]
+
+rebuild recomputes rollups from stress_predictions (all users, or the given
+ones). Predictions saved while a rebuild runs may be missed for the users
+being rebuilt; run it again for them if that matters.
+
+The write path only ever folds in its own prediction: it never rebuilds,
+because a rebuild already counts predictions whose own update hasn't run yet
+(a write-behind batch, concurrent requests) and those would be counted twice.
+History from before rollups existed is backfilled by running rebuild once, and
+by /stats for users that have no rollup yet.
+"""
+
+import logging
+import sys
+from datetime import datetime, timezone
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = 'stress_user_stats'
+STRESS_CATEGORIES = ['Low Stress', 'Medium Stress', 'High Stress']
+
+REBUILD_BATCH_SIZE = 500
+
+
+def rollup_update(stress_level, stress_category, timestamp):
+    """Update document folding one prediction into a rollup (used with upsert=True)"""
+    return {
+        '$inc': {
+            'total_predictions': 1,
+            'sum_stress_level': stress_level,
+            f'category_counts.{stress_category}': 1
+        },
+        '$min': {'min_stress_level': stress_level},
+        '$max': {'max_stress_level': stress_level, 'last_prediction_at': timestamp},
+        '$set': {'updated_at': datetime.now(timezone.utc)}
+    }
+
+
+def record_prediction(stats_collection, user_id, stress_level, stress_category, timestamp):
+    """Fold one saved prediction into the user's rollup (creating it if needed)"""
+    return stats_collection.update_one(
+        {'_id': user_id}, rollup_update(stress_level, stress_category, timestamp), upsert=True
+    )
+
+
+def format_stats(rollup):
+    """(stats, category_distribution) in the shape /stats has always returned"""
+    total = (rollup or {}).get('total_predictions', 0)
+    if total:
+        stats = {
+            'total_predictions': total,
+            'avg_stress_level': round(rollup['sum_stress_level'] / total, 2),
+            'min_stress_level': rollup.get('min_stress_level', 0),
+            'max_stress_level': rollup.get('max_stress_level', 0)
+        }
+    else:
+        stats = {
+            'total_predictions': 0,
+            'avg_stress_level': 0,
+            'min_stress_level': 0,
+            'max_stress_level': 0
+        }
+
+    category_distribution = dict((rollup or {}).get('category_counts', {}))
+    for category in STRESS_CATEGORIES:
+        category_distribution.setdefault(category, 0)
+    return stats, category_distribution
+
+
+def rollup_pipeline(match):
+    return [
+        {'$match': match},
+        {'$group': {
+            '_id': {'user_id': '$user_id', 'category': '$stress_category'},
+            'count': {'$sum': 1},
+            'sum': {'$sum': '$predicted_stress_level'},
+            'min': {'$min': '$predicted_stress_level'},
+            'max': {'$max': '$predicted_stress_level'},
+            'last': {'$max': '$timestamp'}
+        }},
+        {'$group': {
+            '_id': '$_id.user_id',
+            'total_predictions': {'$sum': '$count'},
+            'sum_stress_level': {'$sum': '$sum'},
+            'min_stress_level': {'$min': '$min'},
+            'max_stress_level': {'$max': '$max'},
+            'last_prediction_at': {'$max': '$last'},
+            'categories': {'$push': {'k': '$_id.category', 'v': '$count'}}
+        }}
+    ]
+
+
+def rollup_document(row, now):
+    """A stress_user_stats document from one rollup_pipeline output row"""
+    categories = {item['k']: item['v'] for item in row.pop('categories') if item['k'] is not None}
+    row.update({'category_counts': categories, 'updated_at': now})
+    return row
+
+
+def rebuild_user_stats(predictions_collection, stats_collection, user_ids=None):
+    """Recompute rollups from prediction history; returns the number of users written"""
+    match = {'user_id': {'$in': list(user_ids)}} if user_ids else {}
+    now = datetime.now(timezone.utc)
+
+    written = 0
+    batch = []
+    for row in predictions_collection.aggregate(rollup_pipeline(match), allowDiskUse=True):
+        row = rollup_document(row, now)
+        batch.append(ReplaceOne({'_id': row['_id']}, row, upsert=True))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            stats_collection.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        stats_collection.bulk_write(batch, ordered=False)
+        written += len(batch)
+
+    logger.info(f"Rebuilt stress rollups for {written} user(s)")
+    return written
+
+
+def update_user_stats(predictions_collection, stats_collection, prediction_doc):
+    """Fold a just-inserted prediction into its user's rollup (never rebuilds, see above)"""
+    return record_prediction(stats_collection, prediction_doc['user_id'], prediction_doc['predicted_stress_level'],
+                             prediction_doc['stress_category'], prediction_doc['timestamp'])
+
+
+def get_user_stats(predictions_collection, stats_collection, user_id):
+    """
+    A user's rollup as (stats, category_distribution). Users with history from
+    before rollups existed are backfilled on their first read.
+    """
+    rollup = stats_collection.find_one({'_id': user_id})
+    if rollup is None and predictions_collection.find_one({'user_id': user_id}, {'_id': 1}) is not None:
+        rebuild_user_stats(predictions_collection, stats_collection, [user_id])
+        rollup = stats_collection.find_one({'_id': user_id})
+    return format_stats(rollup)
+
+
+if __name__ == '__main__':
+    import mongo_pool
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild':
+        print(__doc__)
+        sys.exit(2)
+
+    _, db = mongo_pool.connect()
+    count = rebuild_user_stats(db['stress_predictions'], db[STATS_COLLECTION], sys.argv[2:] or None)
+    print(f"✓ Rebuilt stress rollups for {count} user(s)")
@@ -0,0 +1,309 @@
+"""
+Compile fitted sklearn tree ensembles into flat NumPy arrays.
+
+Every tree of a forest or boosted ensemble is concatenated into contiguous
+feature / threshold / left / right / value arrays and evaluated with a vectorized,
+level-by-level traversal over all trees at once. This skips sklearn's Python-level
+input validation and per-estimator dispatch, which dominate single-row latency.
+
+compile_model() verifies the compiled model against sklearn on probe rows and
+returns the original estimator unchanged when the estimator type is unsupported or
+the outputs don't match, so callers can use the result the same way either way.
+"""
+
+import logging
+import os
+import numpy as np
+from sklearn.ensemble import (
+    ExtraTreesClassifier, ExtraTreesRegressor, GradientBoostingClassifier,
+    GradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor
+)
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+
+logger = logging.getLogger(__name__)
+
+# Set TREE_COMPILER=false to serve every model through sklearn
+TREE_COMPILER_ENABLED = os.getenv('TREE_COMPILER', 'true').lower() in ('1', 'true', 'yes')
+
+FOREST_TYPES = (RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor)
+SINGLE_TREE_TYPES = (DecisionTreeClassifier, DecisionTreeRegressor)
+BOOSTING_TYPES = (GradientBoostingClassifier, GradientBoostingRegressor)
+
+
+class UnsupportedModelError(Exception):
+    """Raised when an estimator can't be compiled"""
+
+
+def _as_matrix(X):
+    """2-D float input matching sklearn's float32 tree comparisons"""
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    return X
+
+
+class FlatTrees:
+    """All trees of an ensemble packed into contiguous node arrays"""
+
+    def __init__(self, trees, leaf_values):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree, value in zip(trees, leaf_values):
+            n_nodes = tree.node_count
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            is_leaf = left == -1
+
+            roots.append(offset)
+            # Leaves point at themselves so the traversal can run a fixed number of steps
+            own = np.arange(offset, offset + n_nodes)
+            lefts.append(np.where(is_leaf, own, left + offset))
+            rights.append(np.where(is_leaf, own, right + offset))
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(tree.threshold.astype(np.float64))
+            values.append(value)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        self._set_arrays(
+            np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+            np.concatenate(rights), np.concatenate(values, axis=0), np.asarray(roots, dtype=np.int64),
+            max_depth
+        )
+
+    def _set_arrays(self, feature, threshold, left, right, value, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_trees = len(roots)
+
+    ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+    def to_arrays(self):
+        """Node arrays by name, for storing outside a pickle"""
+        return {name: getattr(self, name) for name in self.ARRAY_NAMES}
+
+    @classmethod
+    def from_arrays(cls, arrays, max_depth):
+        """Rebuild from stored node arrays (which may be read-only memory maps)"""
+        flat = cls.__new__(cls)
+        flat._set_arrays(*(arrays[name] for name in cls.ARRAY_NAMES), max_depth)
+        return flat
+
+    def apply(self, X):
+        """Leaf node index of every row in every tree, shape (n_rows, n_trees)"""
+        n_rows = X.shape[0]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        rows = np.arange(n_rows)[:, None]
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def leaf_values(self, X):
+        """Leaf values of every row in every tree, shape (n_rows, n_trees, n_values)"""
+        return self.value[self.apply(X)]
+
+
+class CompiledTreeModel:
+    """Flat-array replacement for a fitted tree ensemble's predict / predict_proba"""
+
+    def __init__(self, estimator):
+        if not isinstance(estimator, SINGLE_TREE_TYPES + FOREST_TYPES + BOOSTING_TYPES):
+            raise UnsupportedModelError(f"{type(estimator).__name__} is not a supported tree ensemble")
+
+        # The fitted ensemble itself isn't kept: the cached compiled model would hold it
+        # alive next to its flat arrays (compile_model verifies against the caller's copy)
+        self.estimator = None
+        self.estimator_type = type(estimator).__name__
+        self.n_features_in_ = estimator.n_features_in_
+        self.is_classifier = hasattr(estimator, 'classes_')
+        if self.is_classifier:
+            self.classes_ = estimator.classes_
+
+        if getattr(estimator, 'n_outputs_', 1) != 1:
+            raise UnsupportedModelError("Multi-output trees are not supported")
+
+        if isinstance(estimator, SINGLE_TREE_TYPES):
+            self.kind = 'forest'
+            self.trees = FlatTrees([estimator.tree_], [self._leaf_value(estimator.tree_)])
+        elif isinstance(estimator, FOREST_TYPES):
+            self.kind = 'forest'
+            trees = [member.tree_ for member in estimator.estimators_]
+            self.trees = FlatTrees(trees, [self._leaf_value(tree) for tree in trees])
+        else:
+            self.kind = 'boosting'
+            self._compile_boosting(estimator)
+
+    def _leaf_value(self, tree):
+        """Per-node output: class probabilities for classifiers, the mean for regressors"""
+        value = tree.value[:, 0, :].astype(np.float64)
+        if self.is_classifier:
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+        return value
+
+    def _compile_boosting(self, estimator):
+        """Pack stage trees so column k of the leaf values feeds raw score k"""
+        stages = estimator.estimators_
+        n_scores = stages.shape[1]
+        trees, values = [], []
+        for stage in stages:
+            for k, member in enumerate(stage):
+                # Each tree contributes learning_rate * value to a single raw score column
+                value = np.zeros((member.tree_.node_count, n_scores))
+                value[:, k] = estimator.learning_rate * member.tree_.value[:, 0, 0]
+                trees.append(member.tree_)
+                values.append(value)
+        self.trees = FlatTrees(trees, values)
+
+        # Init estimators are constant (prior / mean), so their raw score is computed once
+        try:
+            self.raw_init = np.asarray(estimator._raw_predict_init(np.zeros((1, self.n_features_in_))))[0]
+        except Exception as e:
+            raise UnsupportedModelError(f"Can't evaluate init estimator: {e}")
+
+    def _raw_scores(self, X):
+        return self.raw_init + self.trees.leaf_values(X).sum(axis=1)
+
+    def predict_proba(self, X):
+        if not self.is_classifier:
+            raise AttributeError(f"{self.estimator_type} has no predict_proba")
+        X = _as_matrix(X)
+        if self.kind == 'forest':
+            return self.trees.leaf_values(X).mean(axis=1)
+
+        raw = self._raw_scores(X)
+        if raw.shape[1] == 1:
+            positive = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        raw = raw - raw.max(axis=1, keepdims=True)
+        exp = np.exp(raw)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        if self.is_classifier:
+            return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+        X = _as_matrix(X)
+        if self.kind == 'forest':
+            return self.trees.leaf_values(X)[:, :, 0].mean(axis=1)
+        return self._raw_scores(X)[:, 0]
+
+    def to_arrays(self):
+        """Plain-data description and arrays that fully define the compiled model"""
+        meta = {
+            'estimator_type': self.estimator_type,
+            'kind': self.kind,
+            'n_features_in': int(self.n_features_in_),
+            'is_classifier': self.is_classifier,
+            'max_depth': self.trees.max_depth
+        }
+        arrays = self.trees.to_arrays()
+        if self.is_classifier:
+            arrays['classes'] = np.asarray(self.classes_)
+        if self.kind == 'boosting':
+            arrays['raw_init'] = np.asarray(self.raw_init, dtype=np.float64)
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Rebuild a compiled model without the original sklearn estimator"""
+        compiled = cls.__new__(cls)
+        compiled.estimator = None
+        compiled.estimator_type = meta['estimator_type']
+        compiled.kind = meta['kind']
+        compiled.n_features_in_ = meta['n_features_in']
+        compiled.is_classifier = meta['is_classifier']
+        if compiled.is_classifier:
+            compiled.classes_ = arrays['classes']
+        if compiled.kind == 'boosting':
+            compiled.raw_init = arrays['raw_init']
+        compiled.trees = FlatTrees.from_arrays(arrays, meta['max_depth'])
+        return compiled
+
+    def __repr__(self):
+        return f"CompiledTreeModel({self.estimator_type}, trees={self.trees.n_trees})"
+
+
+class CompiledStandardScaler:
+    """Plain (x - mean) / scale replacement for a fitted StandardScaler"""
+
+    def __init__(self, scaler=None, mean=None, scale=None):
+        self.scaler = scaler
+        if scaler is not None:
+            n_features = scaler.n_features_in_
+            mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else np.zeros(n_features)
+            scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else np.ones(n_features)
+        self.mean = mean
+        self.scale = scale
+        self.n_features_in_ = len(mean)
+
+    def to_arrays(self):
+        return {'mean': self.mean, 'scale': self.scale}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(mean=arrays['mean'], scale=arrays['scale'])
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return (X - self.mean) / self.scale
+
+
+def _probe_rows(n_features, n_rows=64, seed=0):
+    """Random probe rows spanning a wide range of feature values"""
+    rng = np.random.default_rng(seed)
+    return rng.normal(scale=3.0, size=(n_rows, n_features))
+
+
+def compile_model(estimator, probe_rows=None):
+    """
+    Compile a tree ensemble, verified against sklearn on probe rows.
+    Returns the original estimator when it can't be compiled faithfully.
+    """
+    if not TREE_COMPILER_ENABLED or isinstance(estimator, CompiledTreeModel):
+        return estimator
+    try:
+        compiled = CompiledTreeModel(estimator)
+    except UnsupportedModelError as e:
+        logger.info(f"Using sklearn for {type(estimator).__name__}: {e}")
+        return estimator
+
+    X = _probe_rows(compiled.n_features_in_) if probe_rows is None else np.asarray(probe_rows, dtype=float)
+    try:
+        if compiled.is_classifier:
+            matches = (np.allclose(compiled.predict_proba(X), estimator.predict_proba(X), rtol=1e-9, atol=1e-12)
+                       and np.array_equal(compiled.predict(X), estimator.predict(X)))
+        else:
+            matches = np.allclose(compiled.predict(X), estimator.predict(X), rtol=1e-9, atol=1e-12)
+    except Exception as e:
+        logger.warning(f"Verification of compiled {compiled.estimator_type} failed: {e}")
+        matches = False
+
+    if not matches:
+        logger.warning(f"Compiled {compiled.estimator_type} does not match sklearn; using sklearn")
+        return estimator
+
+    logger.info(f"Compiled {compiled!r}")
+    return compiled
+
+
+def compile_scaler(scaler):
+    """Compile a StandardScaler, returning it unchanged for any other transformer"""
+    if not TREE_COMPILER_ENABLED or not isinstance(scaler, StandardScaler):
+        return scaler
+    compiled = CompiledStandardScaler(scaler)
+    X = _probe_rows(compiled.n_features_in_, n_rows=8)
+    if not np.allclose(compiled.transform(X), scaler.transform(X)):
+        logger.warning("Compiled StandardScaler does not match sklearn; using sklearn")
+        return scaler
+    return compiled
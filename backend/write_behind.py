@@ -0,0 +1,302 @@
+"""
+Optional write-behind persistence for prediction documents.
+
+With WRITE_BEHIND=true, insert_document() gives the document a client-side
+ObjectId, queues it and returns immediately, so the request doesn't wait for a
+MongoDB round trip. One flusher thread per process drains the queue in batches
+with insert_many(ordered=False):
+
+- the queue is bounded (WRITE_BEHIND_MAX_QUEUE); when it is full a request waits
+  up to WRITE_BEHIND_ENQUEUE_TIMEOUT_MS for room and then falls back to a
+  synchronous insert, so memory stays bounded and nothing is dropped silently
+- failed batches are retried with exponential backoff (WRITE_BEHIND_MAX_RETRIES);
+  because _ids are assigned up front, a retry of a partially applied batch
+  skips the _id duplicates instead of inserting twice; a duplicate on any
+  other unique index is logged and dropped (its after_write hook is skipped)
+- the queue is flushed on interpreter exit and on SIGTERM
+
+The trade-off: a response can go out before its document is durable, and a
+hard crash loses whatever is still queued. Reads right after a write (e.g.
+today's prediction) may not see it for up to one flush interval.
+
+after_write hooks (e.g. stress rollups) run once the document is stored, on
+the flusher thread in write-behind mode. They are best-effort: errors are
+logged, never raised.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv('WRITE_BEHIND_MAX_QUEUE', 10000))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 500))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv('WRITE_BEHIND_FLUSH_MS', 50))
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv('WRITE_BEHIND_MAX_RETRIES', 5))
+WRITE_BEHIND_RETRY_BACKOFF_MS = float(os.getenv('WRITE_BEHIND_RETRY_BACKOFF_MS', 100))
+WRITE_BEHIND_ENQUEUE_TIMEOUT_MS = float(os.getenv('WRITE_BEHIND_ENQUEUE_TIMEOUT_MS', 100))
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _already_written(error):
+    """Whether a bulk write error is a retry re-inserting a document stored by an earlier attempt"""
+    return error.get('code') == DUPLICATE_KEY_ERROR and error.get('keyPattern') == {'_id': 1}
+
+
+def _run_hook(after_write, document):
+    if after_write is None:
+        return
+    try:
+        after_write(document)
+    except Exception as e:
+        logger.error(f"after_write hook for {document.get('_id')} failed: {e}")
+
+
+class WriteBehindQueue:
+    """Bounded queue of pending inserts drained by one batching flusher thread"""
+
+    def __init__(self, max_queue_size=WRITE_BEHIND_MAX_QUEUE, batch_size=WRITE_BEHIND_BATCH_SIZE,
+                 flush_interval_ms=WRITE_BEHIND_FLUSH_MS, max_retries=WRITE_BEHIND_MAX_RETRIES,
+                 retry_backoff_ms=WRITE_BEHIND_RETRY_BACKOFF_MS, enqueue_timeout_ms=WRITE_BEHIND_ENQUEUE_TIMEOUT_MS,
+                 name='write-behind'):
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval_ms)) / 1000.0
+        self.max_retries = max(0, int(max_retries))
+        self.retry_backoff = max(0.0, float(retry_backoff_ms)) / 1000.0
+        self.enqueue_timeout = max(0.0, float(enqueue_timeout_ms)) / 1000.0
+        self.name = name
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue_size)))
+        self._thread = None
+        self._running = False
+        self._pending = 0
+        self._idle = threading.Condition()
+
+        # Counters for health endpoints
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+        self.backpressure_fallbacks = 0
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        """Start the flusher thread and flush on shutdown"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        _install_sigterm_flush()
+        logger.info(f"{self.name} started (batch_size={self.batch_size}, "
+                    f"flush_ms={self.flush_interval * 1000:g}, max_queue={self._queue.maxsize})")
+
+    def stop(self, timeout=10.0):
+        """Flush everything queued, then stop the flusher thread"""
+        if not self._running:
+            return
+        self.flush(timeout)
+        self._running = False
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        logger.info(f"{self.name} stopped ({self.written} written, {self.dropped} dropped)")
+
+    def submit(self, collection, document, after_write=None):
+        """
+        Queue a document for insertion and return its client-side _id.
+        Waits briefly for room when the queue is full, then inserts synchronously.
+        """
+        document.setdefault('_id', ObjectId())
+        with self._idle:
+            self._pending += 1
+        try:
+            if not self._running:
+                raise queue.Full
+            self._queue.put((collection, document, after_write), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._done(1)
+            self.backpressure_fallbacks += 1
+            collection.insert_one(document)
+            _run_hook(after_write, document)
+            return document['_id']
+        self.enqueued += 1
+        return document['_id']
+
+    def flush(self, timeout=None):
+        """Wait until every queued document has been written (or dropped); returns whether it drained"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _done(self, count):
+        with self._idle:
+            self._pending -= count
+            if self._pending <= 0:
+                self._pending = 0
+                self._idle.notify_all()
+
+    def _collect(self, first):
+        """Gather items until the batch is full or the flush window closes"""
+        batch = [first]
+        deadline = time.perf_counter() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                if not self._running:
+                    break
+                continue
+            batch = self._collect(item)
+            # Group by collection so each gets one insert_many
+            groups = {}
+            for collection, document, after_write in batch:
+                groups.setdefault(collection.full_name, (collection, []))[1].append((document, after_write))
+            for collection, items in groups.values():
+                try:
+                    self._write(collection, items)
+                except Exception as e:
+                    logger.error(f"{self.name} failed writing to {collection.full_name}: {e}")
+                    self.dropped += len(items)
+                finally:
+                    self._done(len(items))
+            if not self._running and self._queue.empty():
+                break
+
+    def _write(self, collection, items):
+        """insert_many with retries; _id duplicates of an earlier partial attempt count as written"""
+        attempt = 0
+        while items:
+            try:
+                collection.insert_many([document for document, _ in items], ordered=False)
+                written, items = items, []
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                # Only an _id clash means the document is already stored; a clash on another
+                # unique index (e.g. stress prediction_id) is a different document being lost
+                failed = [error for error in errors if not _already_written(error)]
+                failed_indexes = {error['index'] for error in failed}
+                written = [item for index, item in enumerate(items) if index not in failed_indexes]
+                if failed:
+                    # Other write errors (validation, duplicate keys) won't succeed on retry
+                    logger.error(f"{self.name} dropped {len(failed)} document(s) for {collection.full_name}: "
+                                 f"{failed[0].get('errmsg')}")
+                    self.dropped += len(failed)
+                items = []
+            except PyMongoError as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    logger.error(f"{self.name} dropped {len(items)} document(s) for {collection.full_name} "
+                                 f"after {self.max_retries} retries: {e}")
+                    self.dropped += len(items)
+                    return
+                self.retries += 1
+                logger.warning(f"{self.name} insert into {collection.full_name} failed (attempt {attempt}), retrying: {e}")
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+                continue
+
+            self.batches += 1
+            self.written += len(written)
+            for document, after_write in written:
+                _run_hook(after_write, document)
+
+    def stats(self):
+        """Queue counters for health endpoints"""
+        return {
+            'enabled': True,
+            'running': self._running,
+            'queued': self._queue.qsize(),
+            'pending': self._pending,
+            'max_queue': self._queue.maxsize,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'batches': self.batches,
+            'retries': self.retries,
+            'dropped': self.dropped,
+            'backpressure_fallbacks': self.backpressure_fallbacks
+        }
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue():
+    """The process-wide write-behind queue (started on first use), or None when disabled"""
+    global _write_queue
+    if not WRITE_BEHIND_ENABLED:
+        return None
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteBehindQueue()
+            _write_queue.start()
+        return _write_queue
+
+
+def _install_sigterm_flush():
+    """Turn SIGTERM into a normal exit so atexit flushes the queue (main thread, default handler only)"""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) is not signal.SIG_DFL:
+        return
+
+    def handle_sigterm(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+
+def insert_document(collection, document, after_write=None):
+    """Insert a document (write-behind when enabled); returns its _id"""
+    write_queue = get_write_queue()
+    if write_queue is not None:
+        return write_queue.submit(collection, document, after_write)
+    inserted_id = collection.insert_one(document).inserted_id
+    _run_hook(after_write, document)
+    return inserted_id
+
+
+def insert_documents(collection, documents):
+    """Insert documents (write-behind when enabled); returns their _ids in order"""
+    write_queue = get_write_queue()
+    if write_queue is not None:
+        return [write_queue.submit(collection, document) for document in documents]
+    # An ordered insert keeps inserted_ids in document order
+    return collection.insert_many(documents, ordered=True).inserted_ids
+
+
+def write_behind_stats():
+    """Queue stats for health endpoints"""
+    if _write_queue is None:
+        return {'enabled': WRITE_BEHIND_ENABLED, 'running': False}
+    return _write_queue.stats()